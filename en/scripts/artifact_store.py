@@ -0,0 +1,297 @@
+"""Persistent, content-addressed store for generated images and videos.
+
+The vlog manifest only skips stages within one vlog directory. When a vlog
+is re-run into a new directory, or after its manifest was invalidated by an
+unrelated change, `generate_image`, `edit_image` and `generate_video` would
+render identical requests again at full cost. The store keeps every
+generated file under a hash of its request (model, prompt, input image and
+config) and brings it back as a file operation instead of a Veo job.
+
+Files are stored once per content hash in `objects/`, indexed by a small
+sqlite database, and the least recently used entries are evicted above a
+size budget. They are placed into the output directory as a reflink (a
+copy-on-write clone on btrfs, XFS or APFS), else as a hardlink, else as a
+copy. Both the store and the pipelines replace files instead of writing into
+them, so linked files never change under each other.
+
+Example:
+    store = ArtifactStore()
+    key = store.key(**request)
+    if not store.materialize(key, "videos/my-vlog/video_0.mp4"):
+        ...  # generate the video
+        store.put_file(key, "videos/my-vlog/video_0.mp4", "video/mp4")
+"""
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join(
+    os.environ.get("GENAI_CACHE_DIR", os.path.expanduser("~/.cache/gemini-samples")),
+    "artifacts",
+)
+
+# ioctl request of Linux's FICLONE, which clones a whole file on btrfs and XFS.
+_FICLONE = 0x40049409
+
+
+def _canonical(value: Any) -> Any:
+    """Converts request arguments into JSON data, with bytes replaced by their hash."""
+    if isinstance(value, bytes):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if hasattr(value, "model_dump"):
+        value = value.model_dump(exclude_none=True)
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def _clone(src: str, dst: str) -> str:
+    """Creates `dst` as a reflink, hardlink or copy of `src` and returns which."""
+    try:
+        import fcntl
+
+        with open(src, "rb") as source, open(dst, "wb") as target:
+            fcntl.ioctl(target.fileno(), _FICLONE, source.fileno())
+        return "reflink"
+    except (ImportError, OSError):
+        if os.path.exists(dst):
+            os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+class ArtifactStore:
+    """An on-disk store of generated files with LRU eviction.
+
+    Args:
+        root: The store directory, holding `index.sqlite` and `objects/`.
+        max_bytes: Size budget of all stored files. The least recently used
+            entries are evicted once it is exceeded.
+        enabled: If False, every lookup is a miss and nothing is stored.
+    """
+
+    def __init__(
+        self,
+        root: str = DEFAULT_STORE_DIR,
+        max_bytes: int = 5 * 1024**3,
+        enabled: bool = True,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(root, "index.sqlite"), check_same_thread=False
+        )
+        self._db.execute("""CREATE TABLE IF NOT EXISTS artifacts (
+                key TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mime_type TEXT,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS artifacts_accessed_at ON artifacts(accessed_at)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(model: str, **inputs: Any) -> str:
+        """Returns the key of a request, e.g. `key(**_generate_video_request(...))`.
+
+        Args:
+            model: The model name.
+            **inputs: Everything else that determines the output: the prompt,
+                input images (hashed, not serialized) and the config.
+        """
+        payload = json.dumps(
+            _canonical({"model": model, **inputs}),
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def get(self, key: str) -> Optional[tuple[str, Optional[str]]]:
+        """Returns the stored file and its mime type for `key`, or None on a miss."""
+        if not self.enabled:
+            self.misses += 1
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest, mime_type FROM artifacts WHERE key = ?", (key,)
+            ).fetchone()
+            path = self._object_path(row[0]) if row is not None else None
+            if path is not None and not os.path.exists(path):
+                # Deleted behind our back, e.g. by clearing the cache directory.
+                self._db.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+                self._db.commit()
+                path = None
+            if path is None:
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE artifacts SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+            self.hits += 1
+            return path, row[1]
+
+    def get_bytes(self, key: str) -> Optional[tuple[bytes, Optional[str]]]:
+        """Returns the stored content and its mime type, or None on a miss."""
+        found = self.get(key)
+        if found is None:
+            return None
+        with open(found[0], "rb") as f:
+            return f.read(), found[1]
+
+    def materialize(self, key: str, path: str) -> bool:
+        """Places the file stored for `key` at `path`, returns False on a miss."""
+        found = self.get(key)
+        if found is None:
+            return False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        method = _clone(found[0], tmp_path)
+        os.replace(tmp_path, path)
+        tracing.annotate(cached=True, materialized=method)
+        logger.info(f"Reused {os.path.basename(path)} from the artifact store")
+        return True
+
+    def put_file(
+        self,
+        key: str,
+        path: str,
+        mime_type: Optional[str] = None,
+        digest: Optional[str] = None,
+    ) -> None:
+        """Stores a copy (or link) of the file at `path` under `key`.
+
+        Args:
+            key: The request key.
+            path: The generated file.
+            mime_type: Its mime type.
+            digest: The sha256 of the file, if it is already known.
+        """
+        if not self.enabled:
+            return
+        if digest is None:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            digest = digest.hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp_path = f"{object_path}.{threading.get_ident()}.tmp"
+            _clone(path, tmp_path)
+            os.replace(tmp_path, object_path)
+        self._index(key, digest, os.path.getsize(object_path), mime_type)
+
+    def put_bytes(self, key: str, data: bytes, mime_type: Optional[str] = None) -> None:
+        """Stores `data` under `key`."""
+        if not self.enabled:
+            return
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp_path = f"{object_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, object_path)
+        self._index(key, digest, len(data), mime_type)
+
+    def _index(self, key: str, digest: str, size: int, mime_type: Optional[str]):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?)",
+                (key, digest, size, mime_type, now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _size(self) -> int:
+        # Entries with the same content share one file.
+        (size,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM"
+            " (SELECT DISTINCT digest, size FROM artifacts)"
+        ).fetchone()
+        return size
+
+    def _evict(self) -> None:
+        size = self._size()
+        if size <= self.max_bytes:
+            return
+        # Drop the least recently used entries until we are below the budget.
+        for key, digest in self._db.execute(
+            "SELECT key, digest FROM artifacts ORDER BY accessed_at"
+        ).fetchall():
+            if size <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+            self.evictions += 1
+            shared = self._db.execute(
+                "SELECT 1 FROM artifacts WHERE digest = ? LIMIT 1", (digest,)
+            ).fetchone()
+            if shared is None:
+                # Links in vlog directories keep their content.
+                object_path = self._object_path(digest)
+                if os.path.exists(object_path):
+                    os.remove(object_path)
+                size = self._size()
+
+    def clear(self) -> None:
+        """Removes every stored file."""
+        with self._lock:
+            self._db.execute("DELETE FROM artifacts")
+            self._db.commit()
+            shutil.rmtree(os.path.join(self.root, "objects"), ignore_errors=True)
+            os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+
+    @property
+    def stats(self) -> dict:
+        """Hit/miss counters of this process and the current size of the store."""
+        with self._lock:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM artifacts").fetchone()
+            size = self._size()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
@@ -0,0 +1,209 @@
+"""Background persistence of generated artifacts.
+
+Generated images are handed from one stage to the next in memory as
+`types.Image` (bytes plus mime type), so nothing needs to be decoded,
+re-encoded or read back from disk on the critical path. Writing the bytes to
+the vlog directory is done by an `ArtifactWriter` on a background thread.
+
+The writer holds at most `max_pending` writes, so a slow disk pushes back on
+the producer instead of buffering images without limit. `write_image` can
+re-encode images as WebP or AVIF on the way, in a process pool, since
+encoding is CPU-bound. With `fsync`, written files are synced to disk in
+batches, one `os.fsync` per file and directory of a batch on a writer thread.
+
+Example:
+    writer = ArtifactWriter()
+    writer.write("images/start_image.png", image.image_bytes)
+    ...
+    writer.flush()
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = {"webp": "WEBP", "avif": "AVIF"}
+
+
+def encode_image(data: bytes, image_format: str, quality: int = 90) -> bytes:
+    """Re-encodes image bytes as "webp" or "avif" with PIL."""
+    buffer = io.BytesIO()
+    with Image.open(io.BytesIO(data)) as image:
+        image.save(buffer, format=IMAGE_FORMATS[image_format], quality=quality)
+    return buffer.getvalue()
+
+
+class ArtifactWriter:
+    """Writes files on background threads, atomically.
+
+    Args:
+        max_workers: The number of writer threads.
+        max_pending: The number of writes that can be scheduled at once.
+            `write` blocks while that many are pending.
+        image_format: "webp" or "avif" to re-encode what is written with
+            `write_image`, None to write images as they are.
+        quality: The encoder quality of `image_format`.
+        encode_workers: The number of encoder processes, defaults to the
+            number of cores.
+        fsync: If True, sync written files and their directories to disk,
+            in batches of `fsync_batch` files and on `flush`.
+        fsync_batch: The number of written files synced together.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_pending: int = 64,
+        image_format: Optional[str] = None,
+        quality: int = 90,
+        encode_workers: Optional[int] = None,
+        fsync: bool = False,
+        fsync_batch: int = 32,
+    ):
+        if image_format is not None and (
+            image_format not in IMAGE_FORMATS or not features.check(image_format)
+        ):
+            raise ValueError(f"Pillow cannot encode {image_format!r} images")
+        self.image_format = image_format
+        self.quality = quality
+        self.fsync = fsync
+        self.fsync_batch = fsync_batch
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="artifact-writer"
+        )
+        self._encode_workers = encode_workers
+        self._encoder: Optional[ProcessPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending: dict[str, Future] = {}
+        self._errors: list[BaseException] = []
+        self._unsynced: list[str] = []
+
+    def write(self, path: str, data: bytes) -> Future:
+        """Schedules writing `data` to `path` and returns the pending write."""
+        return self._schedule(path, self._write, path, data)
+
+    def write_image(self, path: str, data: bytes) -> Future:
+        """Schedules writing an image, re-encoded as `image_format` if set.
+
+        The extension of `path` is replaced by the one of `image_format`.
+
+        Returns:
+            The pending write, its result is the final path.
+        """
+        if self.image_format is None:
+            return self.write(path, data)
+        path = f"{os.path.splitext(path)[0]}.{self.image_format}"
+        return self._schedule(path, self._encode_and_write, path, data)
+
+    def _schedule(self, path: str, fn, *args) -> Future:
+        # Blocks while the queue is full, until a write is done.
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending[path] = future
+        future.add_done_callback(lambda f: self._done(path, f))
+        return future
+
+    def when_written(self, path: str, callback: Callable[[], None]) -> None:
+        """Calls `callback` once `path` is on disk (immediately if it already is).
+
+        The callback is not called if the write fails.
+        """
+        with self._lock:
+            future = self._pending.get(path)
+        if future is None:
+            callback()
+            return
+        future.add_done_callback(lambda f: f.exception() is None and callback())
+
+    def flush(self) -> None:
+        """Blocks until every scheduled write is done and raises the first error.
+
+        With `fsync`, the written files are on disk when it returns.
+        """
+        with self._lock:
+            futures = list(self._pending.values())
+        wait(futures)
+        if self.fsync:
+            self._sync()
+        with self._lock:
+            errors, self._errors = self._errors, []
+        errors += [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        """Flushes pending writes and stops the writer threads."""
+        self.flush()
+        self._executor.shutdown()
+        if self._encoder is not None:
+            self._encoder.shutdown()
+
+    def _write(self, path: str, data: bytes) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Write next to the target and rename, so a crash never leaves a
+        # truncated artifact behind under the final name.
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        if self.fsync:
+            with self._lock:
+                self._unsynced.append(path)
+                full = len(self._unsynced) >= self.fsync_batch
+            if full:
+                self._sync()
+        return path
+
+    def _encode_and_write(self, path: str, data: bytes) -> str:
+        with self._lock:
+            if self._encoder is None:
+                # Spawned, as forking a process with running threads is unsafe.
+                self._encoder = ProcessPoolExecutor(
+                    max_workers=self._encode_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+        encoded = self._encoder.submit(
+            encode_image, data, self.image_format, self.quality
+        ).result()
+        return self._write(path, encoded)
+
+    def _sync(self) -> None:
+        """Syncs the files written since the last sync, and their directories."""
+        with self._lock:
+            paths, self._unsynced = self._unsynced, []
+        for path in paths:
+            try:
+                with open(path, "rb") as f:
+                    os.fsync(f.fileno())
+            except FileNotFoundError:
+                continue  # Replaced or removed since.
+        # The renames are only durable once the directories are synced.
+        for directory in {os.path.dirname(path) or "." for path in paths}:
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _done(self, path: str, future: Future) -> None:
+        self._slots.release()
+        with self._lock:
+            if future.exception() is not None:
+                logger.error(f"Writing {path} failed: {future.exception()}")
+                self._errors.append(future.exception())
+            if self._pending.get(path) is future:
+                del self._pending[path]
@@ -0,0 +1,290 @@
+"""Streaming ingestion of the audio tracks a script attaches to its clips.
+
+`AudioTrack` can carry the audio of a clip inline (`audio_base64`) or as a
+link (`wave_download_url`), in some `format`, to be played at
+`sample_rate_hz` with `channels` channels. Decoding a multi-megabyte base64
+string with one `b64decode` call, loading the whole file into an array and
+resampling it at once needs several times the size of the audio in memory.
+Here every step works on bounded blocks, so memory stays flat however long
+the audio is:
+
+1. `decode_base64_to_file` decodes the string a chunk at a time to disk, and
+   URLs are streamed to disk with `video_download.download`.
+2. `read_blocks` reads the file in blocks of frames, WAV files with the
+   `wave` module and other formats through an ffmpeg pipe.
+3. `StreamingResampler` converts each block to the target rate and channel
+   count with vectorized NumPy (linear interpolation), carrying its position
+   from one block to the next, and the blocks are written as 16-bit WAV.
+4. `mux` puts the audio onto its clip, replacing the clip's own audio.
+
+Example:
+    wav_path = ingest(clip.audio_track, "videos/my-vlog/scene_0_audio")
+    mux("videos/my-vlog/video_0.mp4", wav_path, "videos/my-vlog/video_0_audio.mp4")
+"""
+
+import base64
+import binascii
+import logging
+import os
+import re
+import subprocess
+import wave
+from typing import Iterator, Optional
+
+import numpy as np
+from moviepy.config import FFMPEG_BINARY
+
+import video_merge
+from video_download import download
+
+logger = logging.getLogger(__name__)
+
+# Frames per block read, resampled and written.
+BLOCK_FRAMES = 64 * 1024
+# Base64 characters decoded at once, a multiple of 4.
+BASE64_CHUNK = 1024 * 1024
+
+_AUDIO_STREAM = re.compile(r"Audio: .*?(\d+) Hz, ([^,]+)")
+_LAYOUT_CHANNELS = {"mono": 1, "stereo": 2, "2.1": 3, "quad": 4, "5.1": 6, "7.1": 8}
+
+
+class AudioIngestError(Exception):
+    """Raised when the audio of a clip cannot be decoded or fetched."""
+
+
+def decode_base64_to_file(data: str, path: str, chunk_chars: int = BASE64_CHUNK) -> int:
+    """Decodes a base64 string to a file, `chunk_chars` characters at a time.
+
+    Whitespace and a `data:...;base64,` prefix are ignored, missing padding
+    is tolerated.
+
+    Returns:
+        The number of bytes written.
+
+    Raises:
+        AudioIngestError: If `data` is not valid base64.
+    """
+    if data.startswith("data:"):
+        data = data.partition(",")[2]
+    chunk_chars -= chunk_chars % 4
+    part_path = path + ".part"
+    written, carry = 0, ""
+    try:
+        with open(part_path, "wb") as f:
+            for start in range(0, len(data), chunk_chars):
+                chunk = carry + "".join(data[start : start + chunk_chars].split())
+                # Only whole groups of 4 characters decode on their own.
+                usable = len(chunk) - len(chunk) % 4
+                written += f.write(base64.b64decode(chunk[:usable], validate=True))
+                carry = chunk[usable:]
+            if carry:
+                carry += "=" * (-len(carry) % 4)
+                written += f.write(base64.b64decode(carry, validate=True))
+    except binascii.Error as e:
+        os.remove(part_path)
+        raise AudioIngestError(f"Invalid base64 audio: {e}") from e
+    os.replace(part_path, path)
+    return written
+
+
+class StreamingResampler:
+    """Resamples and remixes audio block by block with linear interpolation.
+
+    Blocks are float32 arrays of shape (frames, channels). The position of
+    the next output frame and the last input frame are carried over, so the
+    output does not depend on how the input is split into blocks.
+
+    Args:
+        source_rate: The sample rate of the input.
+        target_rate: The sample rate of the output.
+        source_channels: The channels of the input.
+        target_channels: The channels of the output. Mono input is copied to
+            every channel, everything else is mixed down to mono first when
+            the counts differ.
+    """
+
+    def __init__(
+        self,
+        source_rate: int,
+        target_rate: int,
+        source_channels: int,
+        target_channels: int,
+    ):
+        self.step = source_rate / target_rate
+        self.source_channels = source_channels
+        self.target_channels = target_channels
+        self._position = 0.0
+        self._previous: Optional[np.ndarray] = None
+
+    def _remix(self, block: np.ndarray) -> np.ndarray:
+        if self.source_channels == self.target_channels:
+            return block
+        if self.source_channels != 1:
+            block = block.mean(axis=1, keepdims=True)
+        return np.repeat(block, self.target_channels, axis=1)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Returns the output frames that `block` completes."""
+        block = self._remix(block)
+        if self.step == 1.0:
+            return block
+        if self._previous is not None:
+            block = np.concatenate([self._previous, block])
+        last = len(block) - 1
+        if last < 1:
+            self._previous = block
+            return block[:0]
+        count = int(np.floor((last - self._position) / self.step)) + 1
+        positions = self._position + self.step * np.arange(max(count, 0))
+        index = positions.astype(np.int64)
+        fraction = (positions - index)[:, None].astype(np.float32)
+        following = np.minimum(index + 1, last)
+        output = block[index] * (1 - fraction) + block[following] * fraction
+        # Continue from the last input frame, which starts the next buffer.
+        self._position = self._position + self.step * max(count, 0) - last
+        self._previous = block[last:]
+        return output
+
+
+def _probe_audio(path: str) -> tuple[int, int]:
+    """The sample rate and channel count of a media file, via `ffmpeg -i`."""
+    result = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-i", path], capture_output=True, text=True
+    )
+    match = _AUDIO_STREAM.search(result.stderr)
+    if match is None:
+        raise AudioIngestError(f"No audio stream found in {path}")
+    layout = match[2].strip()
+    channels = _LAYOUT_CHANNELS.get(layout.split("(")[0])
+    if channels is None:
+        count = re.match(r"(\d+) channels", layout)
+        channels = int(count[1]) if count else 2
+    return int(match[1]), channels
+
+
+def _pcm_to_float(frames: bytes, sample_width: int, channels: int) -> np.ndarray:
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = (raw[:, 0] | raw[:, 1] << 8 | raw[:, 2] << 16) << 8 >> 8
+        samples = samples.astype(np.float32) / 2**23
+    else:
+        dtype = {2: np.int16, 4: np.int32}[sample_width]
+        samples = np.frombuffer(frames, dtype).astype(np.float32)
+        samples /= 2 ** (8 * sample_width - 1)
+    return samples.reshape(-1, channels)
+
+
+def read_blocks(
+    path: str, block_frames: int = BLOCK_FRAMES
+) -> tuple[int, int, Iterator[np.ndarray]]:
+    """Opens an audio file for reading in blocks of float32 frames.
+
+    PCM WAV files are read directly, anything else (or WAV that `wave` cannot
+    read) is decoded by ffmpeg into a pipe.
+
+    Returns:
+        The sample rate, the channel count and an iterator over the blocks.
+    """
+    try:
+        reader = wave.open(path, "rb")
+    except (wave.Error, EOFError):
+        reader = None
+    if reader is not None:
+
+        def wav_blocks() -> Iterator[np.ndarray]:
+            with reader:
+                width, channels = reader.getsampwidth(), reader.getnchannels()
+                while frames := reader.readframes(block_frames):
+                    yield _pcm_to_float(frames, width, channels)
+
+        return reader.getframerate(), reader.getnchannels(), wav_blocks()
+
+    rate, channels = _probe_audio(path)
+
+    def ffmpeg_blocks() -> Iterator[np.ndarray]:
+        process = subprocess.Popen(
+            [FFMPEG_BINARY, "-loglevel", "error", "-i", path]
+            + ["-map", "0:a:0", "-f", "s16le", "-acodec", "pcm_s16le", "-"],
+            stdout=subprocess.PIPE,
+        )
+        try:
+            while frames := process.stdout.read(block_frames * channels * 2):
+                yield _pcm_to_float(frames, 2, channels)
+        finally:
+            process.stdout.close()
+            if process.wait() != 0:
+                raise AudioIngestError(f"ffmpeg could not decode {path}")
+
+    return rate, channels, ffmpeg_blocks()
+
+
+def resample_file(
+    path: str,
+    output_path: str,
+    sample_rate: int,
+    channels: int,
+    block_frames: int = BLOCK_FRAMES,
+) -> str:
+    """Converts an audio file to 16-bit PCM WAV at `sample_rate`/`channels`."""
+    source_rate, source_channels, blocks = read_blocks(path, block_frames)
+    resampler = StreamingResampler(source_rate, sample_rate, source_channels, channels)
+    part_path = output_path + ".part"
+    with wave.open(part_path, "wb") as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        for block in blocks:
+            output = resampler.process(block)
+            pcm = np.clip(output * 32768, -32768, 32767).astype("<i2")
+            writer.writeframes(pcm.tobytes())
+    os.replace(part_path, output_path)
+    return output_path
+
+
+def ingest(track, path_prefix: str) -> Optional[str]:
+    """Fetches the audio of an `AudioTrack` and converts it for its clip.
+
+    Args:
+        track: The clip's `AudioTrack`. `audio_base64` is used if set, else
+            `wave_download_url`.
+        path_prefix: Where to write the files, e.g. `videos/vlog/scene_0_audio`.
+            The source is kept as `<prefix>.source.<format>`, the converted
+            audio is `<prefix>.wav`.
+
+    Returns:
+        The path of the converted WAV file, or None if the track has no audio.
+
+    Raises:
+        AudioIngestError: If the audio cannot be decoded.
+        video_download.DownloadError: If the download fails.
+    """
+    source_path = f"{path_prefix}.source.{track.format or 'wav'}"
+    if track.audio_base64:
+        size = decode_base64_to_file(track.audio_base64, source_path)
+    elif track.wave_download_url:
+        size = download(str(track.wave_download_url), source_path).size
+    else:
+        return None
+    logger.info(f"Ingested {size} bytes of audio into {source_path}")
+    return resample_file(
+        source_path, f"{path_prefix}.wav", track.sample_rate_hz, track.channels
+    )
+
+
+def mux(video_file: str, audio_file: str, output_path: str) -> str:
+    """Replaces the audio of a clip, cut or padded with silence to its length.
+
+    The video stream is copied, the audio is encoded as AAC.
+    """
+    subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y"]
+        + ["-i", video_file, "-i", audio_file]
+        + ["-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-af", "apad"]
+        + ["-c:a", "aac", "-t", f"{video_merge.duration(video_file):.3f}"]
+        + ["-movflags", "+faststart", output_path],
+        check=True,
+        capture_output=True,
+    )
+    return output_path
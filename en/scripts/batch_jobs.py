@@ -0,0 +1,425 @@
+"""Gemini Batch API jobs for bulk prompt expansion.
+
+The Batch API runs many `generate_content` requests as one job at half the
+price of the regular endpoint, with a turnaround of minutes to hours. For
+overnight catalog runs, where cost and throughput matter more than latency,
+`generate_texts` expands hundreds of prompts with one job per model:
+
+1. Requests already in the response cache are answered locally. The others
+   are packed into a batch job under a key each, inline or, for large
+   batches, as a JSONL file uploaded with the File API.
+2. `wait_for_job` polls the job with jittered exponential backoff.
+3. The results are mapped back to their requests by key, validated and
+   stored in the response cache, so the regular pipelines (e.g.
+   `generate_scenes`) find them there.
+4. Only the entries that failed or did not validate are resubmitted, in a
+   new and smaller job, up to `max_attempts` times.
+
+`fake_genai.FakeClient` implements `batches` and `files`, so all of this
+runs offline.
+
+Example:
+    results = generate_texts(
+        client,
+        {idea: _scenes_request(idea, 4) for idea in ideas},
+        cache=response_cache,
+        validate=partial(structured_output.parse, VideoSchema),
+    )
+    texts = {idea: r.text for idea, r in results.items() if r.ok}
+"""
+
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from google.genai import types
+
+import tracing
+from rate_limit import is_retriable
+
+logger = logging.getLogger(__name__)
+
+# Inline requests are limited to 20 MB per job, larger batches go to a file.
+INLINE_LIMIT_BYTES = 10 * 1024 * 1024
+
+FAILED_STATES = {"JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+DONE_STATES = FAILED_STATES | {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_PARTIALLY_SUCCEEDED",
+}
+
+# Fields of GenerateContentConfig that belong to the request itself, not to
+# its `generation_config`, in the JSONL format.
+_REQUEST_FIELDS = (
+    "system_instruction",
+    "safety_settings",
+    "tools",
+    "tool_config",
+    "cached_content",
+)
+
+
+class BatchJobError(Exception):
+    """Raised when a batch job fails as a whole or does not finish in time."""
+
+
+@dataclass
+class BatchResult:
+    """The outcome of one request of a batch.
+
+    Attributes:
+        key: The key the request was submitted under.
+        text: The response text, None if the request failed.
+        error: Why the last attempt failed.
+        attempts: The number of jobs the request was part of.
+        cached: True if the text came from the response cache.
+    """
+
+    key: str
+    text: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.text is not None
+
+
+def _retrying(fn: Callable[[], Any], what: str, max_errors: int = 5) -> Any:
+    """Calls `fn`, retrying retriable API errors with a growing delay."""
+    for attempt in range(1, max_errors + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_errors or not is_retriable(e):
+                raise
+            delay = min(2.0**attempt, 60.0)
+            logger.warning(f"{what} failed ({e}), retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+
+def _content_json(content: Any) -> Any:
+    if isinstance(content, str):
+        return {"role": "user", "parts": [{"text": content}]}
+    if hasattr(content, "model_dump"):
+        return content.model_dump(mode="json", exclude_none=True)
+    return content
+
+
+def _contents_json(contents: Any) -> list:
+    if not isinstance(contents, (list, tuple)):
+        contents = [contents]
+    return [_content_json(content) for content in contents]
+
+
+def file_request(contents: Any, config: Any = None) -> dict:
+    """Converts `generate_content` arguments into a request of a JSONL file."""
+    request = {"contents": _contents_json(contents)}
+    if config is not None:
+        if hasattr(config, "model_dump"):
+            config = config.model_dump(mode="json", exclude_none=True)
+        config = dict(config)
+        for field in _REQUEST_FIELDS:
+            if field in config:
+                request[field] = config.pop(field)
+        if config:
+            request["generation_config"] = config
+    return request
+
+
+def submit(
+    client,
+    model: str,
+    requests: dict[str, dict],
+    source: str = "auto",
+    display_name: Optional[str] = None,
+) -> types.BatchJob:
+    """Creates one batch job for keyed `generate_content` requests.
+
+    Args:
+        client: The genai client.
+        model: The model all requests go to.
+        requests: Per key, the `contents` and optional `config` of a request.
+        source: "inline", "file" (an uploaded JSONL file) or "auto", which
+            uses a file once the requests exceed INLINE_LIMIT_BYTES.
+        display_name: The name of the job in the console.
+
+    Returns:
+        The created job.
+    """
+    lines = [
+        json.dumps(
+            {"key": key, "request": file_request(r["contents"], r.get("config"))}
+        )
+        for key, r in requests.items()
+    ]
+    if source == "auto":
+        size = sum(len(line) for line in lines)
+        source = "file" if size > INLINE_LIMIT_BYTES else "inline"
+    config = types.CreateBatchJobConfig(display_name=display_name)
+
+    if source == "inline":
+        src = [
+            types.InlinedRequest(
+                contents=r["contents"], config=r.get("config"), metadata={"key": key}
+            )
+            for key, r in requests.items()
+        ]
+    elif source == "file":
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".jsonl", delete=False, encoding="utf-8"
+        ) as f:
+            f.write("\n".join(lines) + "\n")
+        try:
+            uploaded = _retrying(
+                lambda: client.files.upload(
+                    file=f.name,
+                    config=types.UploadFileConfig(
+                        display_name=display_name, mime_type="jsonl"
+                    ),
+                ),
+                "Uploading the batch file",
+            )
+        finally:
+            os.remove(f.name)
+        src = uploaded.name
+    else:
+        raise ValueError(f"Unknown batch source {source!r}, use inline, file or auto")
+
+    job = _retrying(
+        lambda: client.batches.create(model=model, src=src, config=config),
+        "Creating the batch job",
+    )
+    logger.info(f"Created batch job {job.name} with {len(requests)} {source} requests")
+    return job
+
+
+def wait_for_job(
+    client,
+    name: str,
+    initial_interval: float = 30.0,
+    max_interval: float = 600.0,
+    multiplier: float = 1.5,
+    jitter: float = 0.2,
+    timeout: Optional[float] = None,
+    max_errors: int = 5,
+) -> types.BatchJob:
+    """Polls a batch job with jittered exponential backoff until it is done.
+
+    Args:
+        client: The genai client.
+        name: The name of the job, e.g. "batches/123".
+        initial_interval: Seconds to wait before the first poll.
+        max_interval: Upper bound for the interval between two polls.
+        multiplier: Factor the interval grows by after every poll.
+        jitter: Relative random jitter applied to every interval.
+        timeout: Seconds after which to give up, None waits as long as the
+            job takes (it expires on the server after 48 hours).
+        max_errors: How many consecutive failed polls are tolerated.
+
+    Returns:
+        The finished job, whatever its final state.
+
+    Raises:
+        BatchJobError: If the job does not finish within `timeout`.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    interval, errors, state = initial_interval, 0, None
+    while True:
+        wait = interval * random.uniform(1 - jitter, 1 + jitter)
+        if deadline is not None:
+            if time.monotonic() + wait > deadline:
+                raise BatchJobError(f"Batch job {name} did not finish in {timeout}s")
+        time.sleep(wait)
+        interval = min(interval * multiplier, max_interval)
+        try:
+            job = client.batches.get(name=name)
+        except Exception as e:
+            errors += 1
+            if errors >= max_errors or not is_retriable(e):
+                raise
+            logger.warning(f"Polling {name} failed ({e}), {errors} in a row")
+            continue
+        errors = 0
+        if job.state.name != state:
+            state = job.state.name
+            logger.info(f"Batch job {name}: {state}")
+        if state in DONE_STATES:
+            return job
+
+
+def _response_text(response: types.GenerateContentResponse) -> Optional[str]:
+    tracing.add_usage(response)
+    return response.text
+
+
+def results(client, job: types.BatchJob, keys: list[str]) -> dict[str, tuple]:
+    """Maps the responses of a finished job back to the keys of its requests.
+
+    Inline responses carry their key in `metadata` (and come in request
+    order, which is used if it does not), lines of a result file have a
+    `key` field.
+
+    Returns:
+        Per key, the response text and an error message, one of them None.
+        Keys without any response are missing.
+    """
+    mapped = {}
+    dest = job.dest
+    if dest is not None and dest.inlined_responses:
+        for n, inlined in enumerate(dest.inlined_responses):
+            key = (inlined.metadata or {}).get("key")
+            if key is None and n < len(keys):
+                key = keys[n]
+            if inlined.error is not None:
+                mapped[key] = (None, f"{inlined.error.code}: {inlined.error.message}")
+            else:
+                mapped[key] = (_response_text(inlined.response), None)
+    elif dest is not None and dest.file_name:
+        data = _retrying(
+            lambda: client.files.download(file=dest.file_name),
+            "Downloading the batch results",
+        )
+        for line in data.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if item.get("error"):
+                error = item["error"]
+                mapped[item["key"]] = (
+                    None,
+                    f"{error.get('code')}: {error.get('message')}",
+                )
+            else:
+                response = types.GenerateContentResponse.model_validate(
+                    item["response"]
+                )
+                mapped[item["key"]] = (_response_text(response), None)
+    return mapped
+
+
+def run(
+    client,
+    model: str,
+    requests: dict[str, dict],
+    validate: Optional[Callable[[str], Any]] = None,
+    max_attempts: int = 3,
+    source: str = "auto",
+    display_name: Optional[str] = None,
+    poll: Optional[dict] = None,
+) -> dict[str, BatchResult]:
+    """Runs keyed requests as batch jobs, resubmitting only failed entries.
+
+    Args:
+        client: The genai client.
+        model: The model all requests go to.
+        requests: Per key, the `contents` and optional `config` of a request.
+        validate: Called with every response text. If it raises, the entry
+            counts as failed and is resubmitted.
+        max_attempts: How many jobs an entry is part of before giving up.
+        source: "inline", "file" or "auto", see `submit`.
+        display_name: The name of the jobs in the console.
+        poll: Keyword arguments of `wait_for_job`, e.g. the intervals.
+
+    Returns:
+        A result for every key of `requests`.
+
+    Raises:
+        BatchJobError: If a job is cancelled or does not finish in time.
+    """
+    outcome = {key: BatchResult(key) for key in requests}
+    pending = list(requests)
+    for attempt in range(1, max_attempts + 1):
+        if not pending:
+            break
+        with tracing.span("batch_job", model=model, attempt=attempt) as span:
+            job = submit(
+                client,
+                model,
+                {key: requests[key] for key in pending},
+                source=source,
+                display_name=display_name and f"{display_name}-{attempt}",
+            )
+            job = wait_for_job(client, job.name, **(poll or {}))
+            state = job.state.name
+            span.set(job=job.name, state=state, entries=len(pending))
+            if state == "JOB_STATE_CANCELLED":
+                raise BatchJobError(f"Batch job {job.name} was cancelled")
+            mapped = {} if state in FAILED_STATES else results(client, job, pending)
+
+            failed = []
+            for key in pending:
+                result = outcome[key]
+                result.attempts = attempt
+                text, error = mapped.get(key, (None, f"no response ({state})"))
+                if text is not None and validate is not None:
+                    try:
+                        validate(text)
+                    except Exception as e:
+                        text, error = None, f"invalid response: {e}"
+                if text is None:
+                    result.error = error
+                    failed.append(key)
+                else:
+                    result.text, result.error = text, None
+            span.set(failed=len(failed))
+
+        logger.info(
+            f"Batch job {job.name}: {len(pending) - len(failed)}/{len(pending)} "
+            f"entries succeeded (attempt {attempt}/{max_attempts})"
+        )
+        pending = failed
+
+    for key in pending:
+        logger.error(f"Batch entry {key} failed: {outcome[key].error}")
+    return outcome
+
+
+def generate_texts(
+    client,
+    requests: dict[str, dict],
+    cache=None,
+    bypass: bool = False,
+    validate: Optional[Callable[[str], Any]] = None,
+    **options: Any,
+) -> dict[str, BatchResult]:
+    """Batch version of `ResponseCache.generate_text` for keyed requests.
+
+    Args:
+        client: The genai client.
+        requests: Per key, the `model`, `contents` and optional `config` of a
+            request, i.e. the arguments of `generate_text`.
+        cache: A `ResponseCache` to answer requests from and to store valid
+            responses in, under the same keys `generate_text` uses.
+        bypass: If True, submit every request, even if it is cached.
+        validate: Called with every response text, see `run`.
+        **options: Passed on to `run`, e.g. `max_attempts` or `source`.
+
+    Returns:
+        A result for every key of `requests`.
+    """
+    outcome: dict[str, BatchResult] = {}
+    by_model: dict[str, dict[str, dict]] = {}
+    for key, request in requests.items():
+        if cache is not None and not bypass:
+            text = cache.get(cache.key(**request))
+            if text is not None:
+                outcome[key] = BatchResult(key, text=text, cached=True)
+                continue
+        by_model.setdefault(request["model"], {})[key] = request
+    if outcome:
+        logger.info(f"{len(outcome)}/{len(requests)} requests answered from cache")
+
+    for model, model_requests in by_model.items():
+        batch = run(client, model, model_requests, validate=validate, **options)
+        for key, result in batch.items():
+            if cache is not None and result.ok:
+                cache.set(cache.key(**model_requests[key]), result.text)
+            outcome[key] = result
+    return {key: outcome[key] for key in requests}
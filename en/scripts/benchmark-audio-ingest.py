@@ -0,0 +1,108 @@
+"""Measures the memory of ingesting `AudioTrack.audio_base64` for a clip.
+
+Compares a naive ingestion, which decodes the whole base64 string with one
+`b64decode`, loads all samples into one array and resamples them at once,
+with `audio_ingest`, which decodes, reads and resamples in bounded blocks.
+For increasing lengths of audio (stereo, 44.1 kHz, resampled to 48 kHz) it
+reports the peak memory allocated on top of the base64 string, which is in
+memory anyway as part of the script, and the time taken.
+
+Run it from your terminal:
+    python en/scripts/benchmark-audio-ingest.py --minutes 1 5 10
+"""
+
+import argparse
+import base64
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+import audio_ingest
+
+
+def make_wav(path: str, minutes: float, rate: int = 44100) -> str:
+    """Writes a stereo 16-bit sine sweep, in blocks."""
+    with wave.open(path, "wb") as writer:
+        writer.setnchannels(2)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        for start in range(0, int(minutes * 60 * rate), rate):
+            t = np.arange(start, start + rate) / rate
+            tone = np.sin(2 * np.pi * (220 + t) * t) * 12000
+            writer.writeframes(np.repeat(tone[:, None], 2, 1).astype("<i2").tobytes())
+    return path
+
+
+def naive_ingest(data: str, output_path: str, rate: int, channels: int) -> None:
+    """Everything in memory at once."""
+    raw = base64.b64decode(data)
+    with wave.open(io.BytesIO(raw)) as r:
+        source_rate, source_channels = r.getframerate(), r.getnchannels()
+        samples = np.frombuffer(r.readframes(r.getnframes()), np.int16)
+    samples = samples.reshape(-1, source_channels).astype(np.float32) / 32768
+    positions = np.arange(0, len(samples) - 1, source_rate / rate)
+    resampled = np.stack(
+        [
+            np.interp(positions, np.arange(len(samples)), samples[:, c])
+            for c in range(channels)
+        ],
+        axis=1,
+    )
+    with wave.open(output_path, "wb") as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes((resampled * 32767).astype("<i2").tobytes())
+
+
+def streaming_ingest(data: str, output_path: str, rate: int, channels: int) -> None:
+    """`audio_ingest`: decode to disk, then read, resample and write in blocks."""
+    source_path = output_path + ".source.wav"
+    audio_ingest.decode_base64_to_file(data, source_path)
+    audio_ingest.resample_file(source_path, output_path, rate, channels)
+
+
+def measure(ingest, data: str, output_path: str) -> tuple[float, float]:
+    """Returns the peak traced memory in MiB and the seconds taken."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    ingest(data, output_path, 48000, 2)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024**2, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5, 10])
+    args = parser.parse_args()
+
+    print(
+        f"{'audio':>8}{'base64 MiB':>12}{'naive MiB':>11}{'s':>7}"
+        f"{'streamed MiB':>14}{'s':>7}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for minutes in args.minutes:
+            wav_path = make_wav(os.path.join(tmp_dir, "source.wav"), minutes)
+            with open(wav_path, "rb") as f:
+                data = base64.b64encode(f.read()).decode("ascii")
+            naive = measure(naive_ingest, data, os.path.join(tmp_dir, "naive.wav"))
+            streamed = measure(
+                streaming_ingest, data, os.path.join(tmp_dir, "streamed.wav")
+            )
+            print(
+                f"{minutes:>6g} m{len(data) / 1024**2:>12.1f}"
+                f"{naive[0]:>11.1f}{naive[1]:>7.2f}"
+                f"{streamed[0]:>14.1f}{streamed[1]:>7.2f}"
+            )
+            del data
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Compares the input tokens of the image prompt template and structured output.
+
+`generate_json_from_idea` of gemini-image-meta.py used to paste the schema
+into every prompt as a commented pseudo-JSON template (SCHEMA_TEMPLATE) and
+received free text. With structured output it sends the ImagePrompt schema
+as `response_json_schema` at a verbosity level of schema_slim instead. For
+the ideas of gemini-image-meta.py, without the response cache, this reports
+per mode:
+
+    schema    tokens of the schema alone (the template without the idea)
+    input     mean input tokens per call, as reported in `usage_metadata`
+    saved     the input tokens saved per call against the template
+    p50 s     median latency
+    valid     share of responses that validated against ImagePrompt
+
+Run it from your terminal (this makes real requests):
+    python en/scripts/benchmark-image-prompt-tokens.py
+or offline, with the fake backend, for the token accounting alone (latencies
+are simulated):
+    python en/scripts/benchmark-image-prompt-tokens.py --fake
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import tempfile
+
+from google import genai
+
+import tracing
+from fake_genai import FakeClient
+from scene_prompt import estimate_tokens
+from schema_slim import VERBOSITY_LEVELS, json_schema
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+MODES = ("template",) + VERBOSITY_LEVELS
+
+
+def load_image_script(fake: bool):
+    """Imports gemini-image-meta.py, with the fake client if `fake` is set."""
+    original_client = genai.Client
+    if fake:
+        genai.Client = lambda *args, **kwargs: FakeClient(latency_scale=0.01)
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "gemini_image_meta", os.path.join(SCRIPTS_DIR, "gemini-image-meta.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        genai.Client = original_client
+    return module
+
+
+def evaluate(images, idea: str, mode: str, output_dir: str) -> dict:
+    """Generates the JSON prompt of one idea in a mode."""
+    with tracing.trace(output_dir, mode="jsonl") as tracer:
+        try:
+            images.generate_json_from_idea(
+                idea,
+                bypass_cache=True,
+                structured=mode != "template",
+                schema_verbosity=None if mode == "template" else mode,
+            )
+            valid = True
+        except Exception:
+            valid = False
+    span = next(s for s in tracer.spans if s["name"] == "generate_json_from_idea")
+    return {
+        "seconds": span["seconds"],
+        "input_tokens": span.get("prompt_tokens", 0),
+        "valid": valid,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument(
+        "--fake", action="store_true", help="use the offline fake backend"
+    )
+    args = parser.parse_args()
+
+    images = load_image_script(args.fake)
+    images.response_cache.enabled = False
+    if args.fake:
+        count = estimate_tokens
+    else:
+
+        def count(text: str) -> int:
+            return images.client.models.count_tokens(
+                model="gemini-2.5-pro", contents=text
+            ).total_tokens
+
+    results = {mode: [] for mode in args.modes}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n, idea in enumerate(images.IDEAS):
+            print(f"Idea {n + 1}/{len(images.IDEAS)}: {idea}")
+            for repeat in range(args.repeat):
+                # Interleave the modes so drifting latency affects all equally.
+                for mode in args.modes:
+                    output_dir = os.path.join(tmp_dir, mode, f"{n}-{repeat}")
+                    results[mode].append(evaluate(images, idea, mode, output_dir))
+
+    def schema_tokens(mode: str) -> int:
+        if mode == "template":
+            return count(images.SCHEMA_TEMPLATE.format(idea=""))
+        return count(json.dumps(json_schema(images.ImagePrompt, mode)))
+
+    baseline = None
+    if "template" in results:
+        baseline = statistics.mean(r["input_tokens"] for r in results["template"])
+    print(
+        f"\n{'mode':<10}{'schema':>8}{'input':>8}{'saved':>8}{'p50 s':>8}{'valid':>7}"
+    )
+    for mode, runs in results.items():
+        tokens = statistics.mean(r["input_tokens"] for r in runs)
+        saved = f"{1 - tokens / baseline:.0%}" if baseline else "-"
+        print(
+            f"{mode:<10}{schema_tokens(mode):>8}{tokens:>8.0f}{saved:>8}"
+            f"{statistics.median(r['seconds'] for r in runs):>8.1f}"
+            f"{statistics.mean(r['valid'] for r in runs):>7.0%}"
+        )
+    print(
+        f"\nStructured output uses the {images.SCHEMA_VERBOSITY!r} schema by default."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmarks how long saving generated images holds up the next request.
+
+`_save_images` of gemini-image-meta.py used to write every image with a
+synchronous PNG save and rewrite the idea's prompt file once per image, on
+the thread that makes the Imagen requests. It now hands both to an
+`ArtifactWriter`. For a number of ideas with a few noisy 1024x1024 PNGs each
+this reports, per way of saving:
+
+    blocked s   time the request thread spent saving (what the next
+                request waits for)
+    total s     time until every file was on disk
+    MiB         size of the images on disk
+
+The ways are the old inline saves, the writer, the writer with fsyncs in
+batches, and the writer re-encoding as WebP (and AVIF, if Pillow supports
+it) in a process pool.
+
+Run it from your terminal:
+    python en/scripts/benchmark-image-writes.py --ideas 10 --images 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from io import BytesIO
+
+from PIL import Image, features
+
+from artifacts import ArtifactWriter
+
+
+def make_image_bytes(size: int) -> bytes:
+    """Returns a noisy PNG, about the size of a generated image."""
+    image = Image.effect_noise((size, size), 32).convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def save_inline(output_dir: str, ideas: int, images: list[bytes]) -> float:
+    """The old way: every image and its prompt written on the request thread."""
+    start = time.perf_counter()
+    for idea in range(ideas):
+        for i, data in enumerate(images):
+            for path, content in (
+                (os.path.join(output_dir, f"idea-{idea}-{i + 1}.png"), data),
+                (os.path.join(output_dir, f"idea-{idea}.json"), b"{}" * 2000),
+            ):
+                with open(path, "wb") as f:
+                    f.write(content)
+    return time.perf_counter() - start
+
+
+def save_with_writer(
+    output_dir: str, ideas: int, images: list[bytes], writer: ArtifactWriter
+) -> float:
+    """The new way: one prompt write per idea, everything in the background."""
+    start = time.perf_counter()
+    for idea in range(ideas):
+        writer.write(os.path.join(output_dir, f"idea-{idea}.json"), b"{}" * 2000)
+        for i, data in enumerate(images):
+            writer.write_image(
+                os.path.join(output_dir, f"idea-{idea}-{i + 1}.png"), data
+            )
+    return time.perf_counter() - start
+
+
+def image_bytes(output_dir: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(output_dir, name))
+        for name in os.listdir(output_dir)
+        if not name.endswith(".json")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ideas", type=int, default=10)
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--size", type=int, default=1024)
+    args = parser.parse_args()
+
+    images = [make_image_bytes(args.size) for _ in range(args.images)]
+    writers = {
+        "writer": dict(),
+        "writer + batched fsync": dict(fsync=True),
+        "writer + webp": dict(image_format="webp"),
+    }
+    if features.check("avif"):
+        writers["writer + avif"] = dict(image_format="avif")
+
+    print(f"{'method':<24}{'blocked s':>11}{'total s':>10}{'MiB':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_dir = os.path.join(tmp_dir, "inline")
+        os.makedirs(output_dir)
+        seconds = save_inline(output_dir, args.ideas, images)
+        print(
+            f"{'inline':<24}{seconds:>11.2f}{seconds:>10.2f}"
+            f"{image_bytes(output_dir) / 1024**2:>8.1f}"
+        )
+        for name, options in writers.items():
+            output_dir = os.path.join(tmp_dir, name.replace(" ", ""))
+            os.makedirs(output_dir)
+            writer = ArtifactWriter(max_workers=4, **options)
+            start = time.perf_counter()
+            blocked = save_with_writer(output_dir, args.ideas, images, writer)
+            writer.close()
+            total = time.perf_counter() - start
+            print(
+                f"{name:<24}{blocked:>11.2f}{total:>10.2f}"
+                f"{image_bytes(output_dir) / 1024**2:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Benchmarks the stream-copy merge against the MoviePy re-encode.
+
+Creates synthetic clips that look like Veo output (h264/aac, same resolution
+and frame rate), merges them with the paths of `video_merge` and checks that
+the merged video has exactly as many frames as the clips together.
+
+With `--mixed`, every other clip is portrait (9:16) with 44.1 kHz audio, so
+the clips cannot be stream copied as they are. The MoviePy re-encode is then
+compared with `merge`, which normalizes the clips in parallel, one ffmpeg
+process per clip, and stream copies the normalized clips.
+
+Last, the low-resolution proxy preview of `video_preview` is rendered from
+the same clips and its time is compared with the full re-encode.
+
+Run it from your terminal:
+    python en/scripts/benchmark-merge-videos.py --clips 4 --duration 8
+    python en/scripts/benchmark-merge-videos.py --clips 8 --mixed
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import tempfile
+import time
+
+import video_merge
+import video_preview
+from moviepy.config import FFMPEG_BINARY
+
+
+def make_clip(
+    path: str,
+    duration: float,
+    size: str,
+    fps: int,
+    hue: int,
+    sample_rate: int = 48000,
+) -> str:
+    """Renders a synthetic test clip with a sine tone as audio."""
+    subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc2=size={size}:rate={fps},hue=h={hue}",
+            "-f",
+            "lavfi",
+            "-i",
+            f"sine=frequency={220 + hue}:sample_rate={sample_rate}",
+            "-t",
+            str(duration),
+            "-c:v",
+            "libx264",
+            "-pix_fmt",
+            "yuv420p",
+            "-c:a",
+            "aac",
+            "-ac",
+            "2",
+            path,
+        ],
+        check=True,
+    )
+    return path
+
+
+def count_frames(path: str) -> int:
+    """Counts the video frames of a file by decoding it."""
+    result = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-i", path, "-map", "0:v:0", "-f", "null", "-"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return int(re.findall(r"frame=\s*(\d+)", result.stderr)[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=8)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--fps", type=int, default=24)
+    parser.add_argument(
+        "--mixed",
+        action="store_true",
+        help="alternate landscape and portrait clips with different sample rates",
+    )
+    args = parser.parse_args()
+    portrait = "x".join(reversed(args.size.split("x")))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        kind = f"{args.size} and {portrait}" if args.mixed else args.size
+        print(f"Rendering {args.clips} synthetic {kind} clips...")
+        clips = [
+            make_clip(
+                os.path.join(tmp_dir, f"video_{n}.mp4"),
+                args.duration,
+                portrait if args.mixed and n % 2 else args.size,
+                args.fps,
+                hue=n * 40,
+                sample_rate=44100 if args.mixed and n % 2 else 48000,
+            )
+            for n in range(args.clips)
+        ]
+        input_frames = sum(count_frames(clip) for clip in clips)
+
+        if args.mixed:
+            methods = [("normalize + copy", video_merge.merge)]
+        else:
+            methods = [("stream copy", video_merge.concat_stream_copy)]
+        methods.append(("moviepy re-encode", video_merge.concat_reencode))
+        results = []
+        for name, merge in methods:
+            output_path = os.path.join(tmp_dir, f"{name.split()[0]}.mp4")
+            start = time.perf_counter()
+            merge(clips, output_path)
+            elapsed = time.perf_counter() - start
+            results.append((name, elapsed, count_frames(output_path)))
+
+        start = time.perf_counter()
+        preview = video_preview.render_preview(tmp_dir, clips)
+        preview_seconds = time.perf_counter() - start
+        preview_bytes = os.path.getsize(preview.path)
+
+    print(f"\nInput frames: {input_frames}, cores: {os.cpu_count()}")
+    print(f"{'method':<20}{'seconds':>10}{'frames':>10}{'frames ok':>12}")
+    for name, elapsed, frames in results:
+        print(
+            f"{name:<20}{elapsed:>10.2f}{frames:>10}{str(frames == input_frames):>12}"
+        )
+    print(f"\nSpeedup: {results[1][1] / results[0][1]:.1f}x")
+    print(
+        f"Proxy preview with {len(preview.scenes)} contact sheets: "
+        f"{preview_seconds:.2f}s ({preview_seconds / results[-1][1]:.0%} of the "
+        f"MoviePy re-encode), {preview_bytes / 1024:.0f} KiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""Benchmarks the pipelines end to end against the offline fake genai backend.
+
+Every scenario runs a script's entry point in a fresh process with
+`genai.Client` replaced by a `fake_genai.FakeClient`, so no API key or network
+is needed and the numbers only reflect the orchestration around the model
+calls: wall time, CPU time (including ffmpeg), peak RSS, the requests made and
+the time from the first request until the first Veo request was sent. The
+straggler scenarios also report the p95 of the completion time of a vlog.
+All waiting in the pipelines (fake latencies, polling intervals, retry
+backoff) is scaled by `--latency-scale`; rate limits are turned off, the fake
+has no quota.
+
+Scenarios:
+    vlog, vlog_concurrent   gemini-veo-meta.py generate_vlog, 4 scenes
+    vlog_streaming          the same, rendering scenes while the script streams
+    vlog_rerun              the same vlog twice into two directories, the
+                            second one from the response cache and artifact store
+    vlog_stragglers         17 vlogs of 4 scenes, concurrent, while one Veo job
+                            in 20 takes five times as long; the first 5 only
+                            warm up the latency histogram
+    vlog_hedged             the same with hedged requests (see hedging.py)
+    viral_vlog              veo3-generate-viral-vlogs.py generate_vlog, 4 scenes
+    images                  gemini-image-meta.py generate, 3 ideas
+    images_all              the same for all 10 ideas of the script, in turn
+    images_async            all 10 ideas at once with generate_all_async
+    mcp_deepwiki            gemini-mcp-deepwiki-agent.py chat loop, 3 turns
+    mcp_pipedream           gemini-mcp-pipedream.py streaming chat loop, 3 turns
+The MCP scenarios are skipped when `mcp` or `fastmcp` is not installed.
+gemini-mcp-agent.py uses LangChain instead of google-genai and is not covered.
+
+Results can be stored as a baseline; later runs are compared against it and
+the script exits with status 1 when a scenario got slower, used more memory
+or made more requests than the baseline allows.
+
+Run it from your terminal:
+    python en/scripts/benchmark-pipelines.py --save-baseline
+    python en/scripts/benchmark-pipelines.py --scenarios vlog images --repeat 3
+"""
+
+import argparse
+import asyncio
+import builtins
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(
+    os.environ.get("GENAI_CACHE_DIR", os.path.expanduser("~/.cache/gemini-samples")),
+    "benchmark-pipelines.json",
+)
+METRICS = ("wall_seconds", "cpu_seconds", "peak_rss_mib")
+# Vlogs of the straggler scenarios, only the measured ones count for the p95.
+WARMUP_VLOGS = 5
+MEASURED_VLOGS = 12
+CHAT_TURNS = [
+    "What is the transformers library about?",
+    "How do I load a model in 8 bit?",
+    "Summarize that in one sentence.",
+]
+
+
+def load_script(fname: str, latency_scale: float):
+    """Imports a sample script and scales its client's waiting times."""
+    path = os.path.join(SCRIPTS_DIR, fname)
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(fname)[0].replace("-", "_"), path
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    client = getattr(module, "client", None)
+    if hasattr(client, "rpm"):
+        client.rpm = {}
+        client.base_delay *= latency_scale
+        client.max_delay *= latency_scale
+    poller = getattr(module, "poller", None)
+    if poller is not None:
+        poller.initial_interval *= latency_scale
+        poller.max_interval *= latency_scale
+    return module
+
+
+def run_chat(run, turns: list[str]) -> None:
+    """Runs an interactive chat loop with scripted user input."""
+    inputs = iter(turns + ["exit"])
+    original_input = builtins.input
+    builtins.input = lambda prompt="": next(inputs)
+    try:
+        asyncio.run(run())
+    finally:
+        builtins.input = original_input
+
+
+def vlog(fake, output_dir: str, latency_scale: float, **kwargs):
+    module = load_script("gemini-veo-meta.py", latency_scale)
+    module.generate_vlog(
+        "A cartoon for kids about how addition works",
+        number_of_scenes=4,
+        output_dir=output_dir,
+        **kwargs,
+    )
+
+
+def vlog_concurrent(fake, output_dir: str, latency_scale: float):
+    vlog(fake, output_dir, latency_scale, concurrent=True)
+
+
+def vlog_streaming(fake, output_dir: str, latency_scale: float):
+    vlog(fake, output_dir, latency_scale, stream_script=True)
+
+
+def vlog_rerun(fake, output_dir: str, latency_scale: float):
+    for subdir in ("first", "second"):
+        vlog(fake, os.path.join(output_dir, subdir), latency_scale)
+
+
+def vlog_stragglers(fake, output_dir: str, latency_scale: float, hedge=False):
+    from fake_genai import Latency
+
+    fake.latency["video_render"] = Latency(60.0, sigma=0.3, straggler_rate=0.05)
+    module = load_script("gemini-veo-meta.py", latency_scale)
+    # The fake writes the same script for every idea, every clip must render.
+    module.artifact_store.enabled = False
+    seconds = []
+    for n in range(WARMUP_VLOGS + MEASURED_VLOGS):
+        # The warm-up fills the latency histogram, as earlier runs would have.
+        module.hedge_policy.enabled = hedge and n >= WARMUP_VLOGS
+        start = time.perf_counter()
+        module.generate_vlog(
+            "A cartoon for kids about how addition works",
+            number_of_scenes=4,
+            output_dir=os.path.join(output_dir, str(n)),
+            concurrent=True,
+        )
+        if n >= WARMUP_VLOGS:
+            seconds.append(time.perf_counter() - start)
+    return {
+        "vlog_p95_seconds": statistics.quantiles(seconds, n=20)[-1],
+        "hedges": module.hedge_policy.hedges,
+    }
+
+
+def vlog_hedged(fake, output_dir: str, latency_scale: float):
+    return vlog_stragglers(fake, output_dir, latency_scale, hedge=True)
+
+
+def viral_vlog(fake, output_dir: str, latency_scale: float):
+    module = load_script("veo3-generate-viral-vlogs.py", latency_scale)
+    module.generate_vlog(
+        idea="Tourist in London seeing all of the best places",
+        character_description="Large fluffy white yeti with a black face",
+        number_of_scenes=4,
+        output_dir=output_dir,
+    )
+
+
+def images(fake, output_dir: str, latency_scale: float):
+    module = load_script("gemini-image-meta.py", latency_scale)
+    for idea in (
+        "A energy drink with water drops on it, ultra realistic, for a commercial.",
+        "Graffiti with the text 'JSON Schema' on a brick wall.",
+        "An emotional, close-up portrait of an old fisherman.",
+    ):
+        module.generate(idea=idea, output_dir=output_dir)
+    module.artifact_writer.flush()
+
+
+def images_all(fake, output_dir: str, latency_scale: float):
+    module = load_script("gemini-image-meta.py", latency_scale)
+    for idea in module.IDEAS:
+        module.generate(idea=idea, output_dir=output_dir)
+    module.artifact_writer.flush()
+
+
+def images_async(fake, output_dir: str, latency_scale: float):
+    module = load_script("gemini-image-meta.py", latency_scale)
+    asyncio.run(module.generate_all_async(module.IDEAS, output_dir=output_dir))
+
+
+def mcp_deepwiki(fake, output_dir: str, latency_scale: float):
+    from fake_genai import FakeMCPSession
+
+    module = load_script("gemini-mcp-deepwiki-agent.py", latency_scale)
+    session = FakeMCPSession(fake, "ask_question")
+
+    @contextlib.asynccontextmanager
+    async def transport(url):
+        yield None, None, None
+
+    module.streamablehttp_client = transport
+    module.ClientSession = lambda read, write: session
+    run_chat(module.run, CHAT_TURNS)
+
+
+def mcp_pipedream(fake, output_dir: str, latency_scale: float):
+    from fake_genai import FakeMCPSession
+
+    module = load_script("gemini-mcp-pipedream.py", latency_scale)
+    module.mcp_client = FakeMCPSession(fake, "gmail-find-email")
+    run_chat(module.run, CHAT_TURNS)
+
+
+SCENARIOS = {
+    "vlog": vlog,
+    "vlog_concurrent": vlog_concurrent,
+    "vlog_streaming": vlog_streaming,
+    "vlog_rerun": vlog_rerun,
+    "vlog_stragglers": vlog_stragglers,
+    "vlog_hedged": vlog_hedged,
+    "viral_vlog": viral_vlog,
+    "images": images,
+    "images_all": images_all,
+    "images_async": images_async,
+    "mcp_deepwiki": mcp_deepwiki,
+    "mcp_pipedream": mcp_pipedream,
+}
+
+
+def run_child(name: str, latency_scale: float, failure_rate: float, seed: int):
+    """Runs one scenario in this process and prints its metrics as JSON."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Keep the response cache of the scripts empty and out of the way.
+        os.environ["GENAI_CACHE_DIR"] = os.path.join(tmp_dir, "cache")
+        from google import genai
+
+        from fake_genai import FakeClient
+
+        fake = FakeClient(
+            latency_scale=latency_scale, failure_rate=failure_rate, seed=seed
+        )
+        genai.Client = lambda *args, **kwargs: fake
+
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                extra = SCENARIOS[name](
+                    fake, os.path.join(tmp_dir, "output"), latency_scale
+                )
+        except (ImportError, SyntaxError) as e:
+            print(json.dumps({"skipped": f"{type(e).__name__}: {e}"}))
+            return
+        wall = time.perf_counter() - start
+        # Counted from the first request, leaving out the import of the script.
+        first_veo = fake.first_requests.get("generate_videos")
+        if first_veo is not None:
+            first_veo -= min(fake.first_requests.values())
+
+    cpu = sum(
+        getattr(after, field) - getattr(before, field)
+        for before, after in (
+            (usage, resource.getrusage(resource.RUSAGE_SELF)),
+            (children, resource.getrusage(resource.RUSAGE_CHILDREN)),
+        )
+        for field in ("ru_utime", "ru_stime")
+    )
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mib = rss / 1024**2 if sys.platform == "darwin" else rss / 1024
+    print(
+        json.dumps(
+            {
+                "wall_seconds": wall,
+                "cpu_seconds": cpu,
+                "peak_rss_mib": rss_mib,
+                "simulated_seconds": fake.simulated_seconds,
+                "first_veo_seconds": first_veo,
+                "requests": sum(fake.requests.values()),
+                "failures": sum(fake.failures.values()),
+                "by_call": dict(fake.requests),
+                **(extra or {}),
+            }
+        )
+    )
+
+
+def run_scenario(name: str, args) -> dict:
+    """Runs a scenario `args.repeat` times in fresh processes."""
+    runs = []
+    for n in range(args.repeat):
+        result = subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--child",
+                name,
+                "--latency-scale",
+                str(args.latency_scale),
+                "--failure-rate",
+                str(args.failure_rate),
+                "--seed",
+                str(args.seed + n),
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            return {"error": result.stderr.strip().splitlines()[-1:]}
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        if "skipped" in run:
+            return run
+        runs.append(run)
+    return {
+        "wall_seconds": statistics.median(r["wall_seconds"] for r in runs),
+        "cpu_seconds": statistics.median(r["cpu_seconds"] for r in runs),
+        "peak_rss_mib": max(r["peak_rss_mib"] for r in runs),
+        "simulated_seconds": statistics.median(r["simulated_seconds"] for r in runs),
+        "first_veo_seconds": (
+            statistics.median(r["first_veo_seconds"] for r in runs)
+            if runs[0]["first_veo_seconds"] is not None
+            else None
+        ),
+        "requests": max(r["requests"] for r in runs),
+        "failures": sum(r["failures"] for r in runs),
+        "vlog_p95_seconds": (
+            statistics.median(r["vlog_p95_seconds"] for r in runs)
+            if "vlog_p95_seconds" in runs[0]
+            else None
+        ),
+        "hedges": max(r.get("hedges", 0) for r in runs),
+    }
+
+
+def regressions(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Returns what got worse than the baseline by more than `tolerance`."""
+    flagged = [
+        f"{metric} +{result[metric] / baseline[metric] - 1:.0%}"
+        for metric in METRICS
+        if baseline.get(metric) and result[metric] > baseline[metric] * (1 + tolerance)
+    ]
+    if result["requests"] > baseline.get("requests", result["requests"]):
+        flagged.append(f"requests {baseline['requests']} -> {result['requests']}")
+    return flagged
+
+
+def optional(value: Optional[float], width: int) -> str:
+    """Formats a metric that only some scenarios have."""
+    return f"{value:>{width}.2f}" if value is not None else f"{'-':>{width}}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--latency-scale", type=float, default=0.01)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown/growth before a metric is flagged (0.25 = 25%%)",
+    )
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.latency_scale, args.failure_rate, args.seed)
+        return
+
+    # Baselines are only comparable between runs with the same settings.
+    settings = f"scale={args.latency_scale:g},failures={args.failure_rate:g}"
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    baseline = baselines.get(settings, {})
+
+    print(f"Fake backend: {settings}, {args.repeat} run(s) per scenario")
+    print(
+        f"{'scenario':<17}{'wall s':>8}{'1st veo':>9}{'p95 s':>7}{'cpu s':>8}"
+        f"{'rss MiB':>9}{'requests':>10}{'fail':>6}  vs baseline"
+    )
+    results, flagged_any = {}, False
+    for name in args.scenarios:
+        result = run_scenario(name, args)
+        if "wall_seconds" not in result:
+            print(f"{name:<17}  {result.get('skipped') or result.get('error')}")
+            continue
+        results[name] = result
+        if name in baseline:
+            flagged = regressions(result, baseline[name], args.tolerance)
+            verdict = "REGRESSION: " + ", ".join(flagged) if flagged else "ok"
+            flagged_any = flagged_any or bool(flagged)
+        else:
+            verdict = "-"
+        print(
+            f"{name:<17}{result['wall_seconds']:>8.2f}"
+            f"{optional(result.get('first_veo_seconds'), 9)}"
+            f"{optional(result.get('vlog_p95_seconds'), 7)}"
+            f"{result['cpu_seconds']:>8.2f}"
+            f"{result['peak_rss_mib']:>9.0f}{result['requests']:>10}"
+            f"{result['failures']:>6}  {verdict}"
+        )
+
+    if args.save_baseline:
+        baselines[settings] = {**baseline, **results}
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    if flagged_any:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
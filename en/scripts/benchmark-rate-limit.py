@@ -0,0 +1,110 @@
+"""Checks RateLimitedClient against a fake client that enforces a quota.
+
+The fake `models.generate_content` allows `--quota` requests per minute,
+enforced over a one second sliding window so short runs hit it, and answers every request above it with a 429 that carries a
+`RetryInfo.retryDelay`, like the Gemini API does. Many worker threads then
+send requests through a `RateLimitedClient`, once with the limiter set to the
+quota and once set above it, and the script reports the achieved throughput,
+the 429s seen and the failed jobs.
+
+Run it from your terminal:
+    python en/scripts/benchmark-rate-limit.py --quota 600 --requests 100
+"""
+
+import argparse
+import threading
+import time
+import types
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from google.genai import errors
+
+from rate_limit import RateLimitedClient
+
+
+class QuotaModels:
+    """Fake `client.models` that rejects requests above a per-minute quota."""
+
+    def __init__(self, quota: int, window: float = 1.0):
+        self.window = window
+        self.allowed = quota * window / 60
+        self.accepted = deque()
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model: str, contents: str, config=None):
+        with self._lock:
+            now = time.monotonic()
+            while self.accepted and now - self.accepted[0] >= self.window:
+                self.accepted.popleft()
+            if len(self.accepted) >= self.allowed:
+                self.rejected += 1
+                retry_delay = self.window - (now - self.accepted[0])
+                raise errors.APIError(
+                    429,
+                    {
+                        "error": {
+                            "code": 429,
+                            "status": "RESOURCE_EXHAUSTED",
+                            "details": [
+                                {
+                                    "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                                    "retryDelay": f"{retry_delay:.3f}s",
+                                }
+                            ],
+                        }
+                    },
+                )
+            self.accepted.append(now)
+        return types.SimpleNamespace(text=contents)
+
+
+def run(quota: int, rpm: int, requests: int, workers: int) -> dict:
+    models = QuotaModels(quota)
+    fake = types.SimpleNamespace(
+        models=models,
+        operations=None,
+        aio=types.SimpleNamespace(models=None, operations=None),
+    )
+    client = RateLimitedClient(
+        fake, rpm={"gemini-*": rpm}, max_attempts=10, base_delay=0.05
+    )
+
+    def job(n: int):
+        client.models.generate_content(model="gemini-2.5-pro", contents=str(n))
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = [executor.submit(job, n) for n in range(requests)]
+    failed = sum(1 for r in results if r.exception() is not None)
+    elapsed = time.monotonic() - start
+    # The first request goes out immediately, so n requests span n-1 intervals.
+    return {
+        "rpm": rpm,
+        "achieved_rpm": (requests - failed - 1) / elapsed * 60,
+        "429s": models.rejected,
+        "failed": failed,
+        "stats": client.stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quota", type=int, default=600, help="requests/minute")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"Server quota: {args.quota} requests/minute")
+    print(f"{'limiter rpm':>12}{'achieved rpm':>14}{'429s':>7}{'failed':>8}")
+    for rpm in (args.quota, args.quota * 2):
+        result = run(args.quota, rpm, args.requests, args.workers)
+        print(
+            f"{result['rpm']:>12}{result['achieved_rpm']:>14.0f}"
+            f"{result['429s']:>7}{result['failed']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
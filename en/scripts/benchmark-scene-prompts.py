@@ -0,0 +1,109 @@
+"""Compares the token count of the per-scene prompts in every encoding.
+
+For every scene of the given `script.json` files (written by
+gemini-veo-meta.py into each vlog directory) it builds the prompt that is
+sent to `edit_image` and `generate_video` in each of `scene_prompt.ENCODINGS`
+and reports its size in tokens, and the reduction against the legacy prompt
+(the full script JSON). Without files, a sample script built from the
+examples in `VideoSchema` is used.
+
+Tokens are estimated offline (about four characters per token); with `--api`
+they are counted by the Gemini API with `models.count_tokens`. The latency of
+real requests can be compared with tracing on (GENAI_TRACE=jsonl), whose
+`edit_image` and `generate_video` spans record the prompt size.
+
+Run it from your terminal:
+    python en/scripts/benchmark-scene-prompts.py videos/*/script.json --api
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+
+from google import genai
+
+from fake_genai import FakeClient, sample_json
+from scene_prompt import ENCODINGS, estimate_tokens, scene_prompt
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_vlog_script():
+    """Imports gemini-veo-meta.py for its models, without needing an API key."""
+    original_client = genai.Client
+    genai.Client = lambda *args, **kwargs: FakeClient()
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "gemini_veo_meta", os.path.join(SCRIPTS_DIR, "gemini-veo-meta.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        genai.Client = original_client
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scripts", nargs="*", help="script.json files of vlogs")
+    parser.add_argument("--scenes", type=int, default=4, help="for the sample script")
+    parser.add_argument(
+        "--api", action="store_true", help="count tokens with the Gemini API"
+    )
+    args = parser.parse_args()
+
+    vlog = load_vlog_script()
+    if args.api:
+        client = genai.Client()
+
+        def count(text: str) -> int:
+            return client.models.count_tokens(
+                model="gemini-2.5-pro", contents=text
+            ).total_tokens
+
+    else:
+        count = estimate_tokens
+
+    scripts = {}
+    for path in args.scripts:
+        with open(path) as f:
+            scripts[path] = json.load(f)
+    if not scripts:
+        schema = vlog.VideoSchema.model_json_schema()
+        scripts["sample"] = sample_json(schema, array_length=args.scenes)
+
+    print(f"{'script':<30}{'scene':>6}" + "".join(f"{e:>9}" for e in ENCODINGS))
+    totals = dict.fromkeys(ENCODINGS, 0)
+    for name, script in scripts.items():
+        for n in range(len(script["clips"])):
+            tokens = {
+                encoding: count(
+                    scene_prompt(
+                        script,
+                        n,
+                        encoding=encoding,
+                        clip_model=vlog.Clip,
+                        drop_defaults=(vlog.Clip, vlog.AudioTrack, vlog.Performance),
+                    )
+                )
+                for encoding in ENCODINGS
+            }
+            for encoding, value in tokens.items():
+                totals[encoding] += value
+            print(
+                f"{name[-30:]:<30}{n + 1:>6}"
+                + "".join(f"{tokens[e]:>9}" for e in ENCODINGS)
+            )
+
+    legacy = totals["legacy"]
+    print(f"{'total':<36}" + "".join(f"{totals[e]:>9}" for e in ENCODINGS))
+    print(
+        f"{'vs legacy':<36}"
+        + "".join(f"{totals[e] / legacy - 1:>+9.0%}" for e in ENCODINGS)
+    )
+    print("(tokens counted by the Gemini API)" if args.api else "(tokens estimated)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Evaluates the VideoSchema verbosity levels on a fixed set of ideas.
+
+For every idea and level ("full", "short", "types", see schema_slim) it
+calls `generate_scenes` of gemini-veo-meta.py without the response cache
+and reports per level:
+
+    schema    tokens of the response schema alone
+    input     mean input tokens of the request (prompt + schema)
+    output    mean output tokens
+    p50 s     median latency
+    valid     share of scripts that validated against VideoSchema at the
+              first attempt
+    filled    share of the clip fields the model filled in
+    chars     mean size of a clip in characters, a proxy for detail
+
+The generated scripts are kept in `--output-dir/<level>/<idea>/script.json`
+next to a `trace.jsonl`, to judge their quality side by side.
+
+Run it from your terminal (this makes real requests):
+    python en/scripts/benchmark-schema-verbosity.py --repeat 2
+or offline, with the fake backend, to check the harness itself:
+    python en/scripts/benchmark-schema-verbosity.py --fake
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+
+from google import genai
+from pydantic import BaseModel
+
+import tracing
+from fake_genai import FakeClient
+from scene_prompt import estimate_tokens
+from schema_slim import VERBOSITY_LEVELS, json_schema
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IDEAS = [
+    ("A realistic energy drink commercial for athletes.", 3),
+    (
+        "A stormtrooper being a confused tourist in central London complaining about the weather.",
+        4,
+    ),
+    ("A cartoon for kids about how addition works", 3),
+    ("A cozy cooking vlog of a grandmother baking bread at dawn.", 2),
+]
+
+
+def load_vlog_script(fake: bool):
+    """Imports gemini-veo-meta.py, with the fake client if `fake` is set."""
+    original_client = genai.Client
+    if fake:
+        genai.Client = lambda *args, **kwargs: FakeClient(latency_scale=0.01)
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "gemini_veo_meta", os.path.join(SCRIPTS_DIR, "gemini-veo-meta.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        genai.Client = original_client
+    return module
+
+
+def filled_fields(value, model: type[BaseModel]) -> tuple[int, int]:
+    """Counts the leaf fields of `model` and how many of them `value` fills."""
+    filled, total = 0, 0
+    for name, field in model.model_fields.items():
+        item = value.get(name) if isinstance(value, dict) else None
+        annotation = field.annotation
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            sub_filled, sub_total = filled_fields(item, annotation)
+            filled, total = filled + sub_filled, total + sub_total
+        else:
+            total += 1
+            filled += item not in (None, "", [], {})
+    return filled, total
+
+
+def evaluate(vlog, idea: str, scenes: int, level: str, output_dir: str) -> dict:
+    """Generates one script at a verbosity level and scores it."""
+    with tracing.trace(output_dir, mode="jsonl") as tracer:
+        try:
+            script = vlog.generate_scenes(
+                idea,
+                output_dir=output_dir,
+                number_of_scenes=scenes,
+                bypass_cache=True,
+                schema_verbosity=level,
+            )
+        except Exception as e:
+            print(f"  {level}: generate_scenes failed: {e}")
+            script = None
+    span = next(s for s in tracer.spans if s["name"] == "generate_scenes")
+    result = {
+        "seconds": span["seconds"],
+        "input_tokens": span.get("prompt_tokens", 0),
+        "output_tokens": span.get("output_tokens", 0),
+        "valid": False,
+        "filled": 0.0,
+        "chars": 0.0,
+    }
+    if script is None:
+        return result
+    # generate_scenes validated the script, but may have needed to ask again.
+    result["valid"] = "rejected" not in span
+    clips = [clip.model_dump(mode="json", exclude_unset=True) for clip in script.clips]
+    counts = [filled_fields(clip, vlog.Clip) for clip in clips]
+    result["filled"] = sum(f for f, _ in counts) / sum(t for _, t in counts)
+    result["chars"] = statistics.mean(len(json.dumps(c)) for c in clips)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--levels", nargs="+", choices=VERBOSITY_LEVELS, default=VERBOSITY_LEVELS
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output-dir", default="schema-eval")
+    parser.add_argument(
+        "--fake", action="store_true", help="use the offline fake backend"
+    )
+    args = parser.parse_args()
+
+    vlog = load_vlog_script(args.fake)
+    vlog.response_cache.enabled = False
+    if args.fake:
+        count = estimate_tokens
+    else:
+
+        def count(text: str) -> int:
+            return vlog.client.models.count_tokens(
+                model="gemini-2.5-pro", contents=text
+            ).total_tokens
+
+    results = {level: [] for level in args.levels}
+    for n, (idea, scenes) in enumerate(IDEAS):
+        print(f"Idea {n + 1}/{len(IDEAS)}: {idea}")
+        for repeat in range(args.repeat):
+            # Interleave the levels so drifting latency affects all equally.
+            for level in args.levels:
+                output_dir = os.path.join(args.output_dir, level, f"{n}-{repeat}")
+                results[level].append(evaluate(vlog, idea, scenes, level, output_dir))
+
+    print(
+        f"\n{'level':<7}{'schema':>8}{'input':>8}{'output':>8}{'p50 s':>8}"
+        f"{'valid':>7}{'filled':>8}{'chars':>7}"
+    )
+    for level, runs in results.items():
+        schema_tokens = count(json.dumps(json_schema(vlog.VideoSchema, level)))
+        print(
+            f"{level:<7}{schema_tokens:>8}"
+            f"{statistics.mean(r['input_tokens'] for r in runs):>8.0f}"
+            f"{statistics.mean(r['output_tokens'] for r in runs):>8.0f}"
+            f"{statistics.median(r['seconds'] for r in runs):>8.1f}"
+            f"{statistics.mean(r['valid'] for r in runs):>7.0%}"
+            f"{statistics.mean(r['filled'] for r in runs):>8.0%}"
+            f"{statistics.mean(r['chars'] for r in runs):>7.0f}"
+        )
+    print(f"\nScripts and traces are in {args.output_dir}/<level>/")
+
+
+if __name__ == "__main__":
+    main()
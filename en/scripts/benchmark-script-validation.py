@@ -0,0 +1,171 @@
+"""Measures what validating the VideoSchema script costs and what it saves.
+
+`generate_scenes` of gemini-veo-meta.py used to return `json.loads(text)` and
+leave the checking to whoever indexed the dict. Now the text is parsed
+straight into `VideoSchema` with `model_validate_json`. This benchmark
+reports:
+
+1. The cost per script of each way of parsing a sample script: the plain
+   dict, the dict validated afterwards, `model_validate_json` and
+   `structured_output.parse` on a fenced script that needs a repair. For a
+   type that is not a model, such as the streamed `list[Clip]`, a TypeAdapter
+   built on every call is compared with the cached one.
+2. For typical kinds of malformed output, how many image and video requests
+   the dict path sends with a broken script before it fails (or without ever
+   failing), against what the typed path does with it: accept it, repair it
+   for free, trim it, or reject it before the first downstream request and
+   ask again.
+
+Run it from your terminal:
+    python en/scripts/benchmark-script-validation.py --scenes 4
+"""
+
+import argparse
+import copy
+import importlib.util
+import json
+import os
+import timeit
+from typing import List
+
+from google import genai
+from pydantic import TypeAdapter, ValidationError
+
+import structured_output
+from fake_genai import FakeClient, sample_json
+from scene_prompt import scene_prompt
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_vlog_script():
+    """Imports gemini-veo-meta.py for its models, without needing an API key."""
+    original_client = genai.Client
+    genai.Client = lambda *args, **kwargs: FakeClient()
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "gemini_veo_meta", os.path.join(SCRIPTS_DIR, "gemini-veo-meta.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        genai.Client = original_client
+    return module
+
+
+def malformed_scripts(script: dict) -> dict[str, str]:
+    """The sample script as text, plus broken variants the model produces."""
+    text = json.dumps(script)
+
+    def changed(change) -> str:
+        broken = copy.deepcopy(script)
+        change(broken)
+        return json.dumps(broken)
+
+    return {
+        "valid": text,
+        "fenced": f"```json\n{text}\n```",
+        "prose": f"Here is the script for your video:\n{text}\nEnjoy!",
+        "truncated": text[: len(text) * 4 // 5],
+        "missing field": changed(lambda s: s["clips"][-1].pop("duration_sec")),
+        "wrong type": changed(
+            lambda s: s["clips"][-1].update(duration_sec="eight seconds")
+        ),
+        "no characters": changed(lambda s: s.pop("characters")),
+        "no clips": changed(lambda s: s.update(clips=[])),
+        "extra clips": changed(lambda s: s.update(clips=s["clips"] + s["clips"][:2])),
+    }
+
+
+def dict_path_requests(text: str) -> tuple[int, str]:
+    """Replays the downstream requests of the dict path until it fails.
+
+    Every scene builds its prompt and then requests an image (the start image
+    for the first scene, an edit for the others) and a video, as
+    `generate_vlog` does.
+    """
+    try:
+        script = json.loads(text)
+    except json.JSONDecodeError:
+        return 0, "JSONDecodeError"
+    requests = 0
+    try:
+        for n in range(len(script["clips"])):
+            scene_prompt(script, n, encoding="legacy")
+            requests += 2  # the start image or an edit, plus the video
+    except (KeyError, IndexError, TypeError) as e:
+        return requests, type(e).__name__
+    return requests, "-"
+
+
+def typed_path(vlog, text: str, scenes: int) -> str:
+    """What `generate_scenes` does with a response."""
+    try:
+        script = vlog.VideoSchema.model_validate_json(text)
+        outcome = "ok"
+    except ValidationError:
+        try:
+            script = structured_output.parse(vlog.VideoSchema, text)
+        except ValidationError as e:
+            return f"rejected, asks again ({e.error_count()} errors)"
+        outcome = "repaired"
+    if len(script.clips) > scenes:
+        outcome = f"trimmed to {scenes} clips"
+    return outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenes", type=int, default=4)
+    parser.add_argument("--number", type=int, default=2000, help="timeit loops")
+    args = parser.parse_args()
+
+    vlog = load_vlog_script()
+    VideoSchema = vlog.VideoSchema
+    script = sample_json(VideoSchema.model_json_schema(), array_length=args.scenes)
+    variants = malformed_scripts(script)
+    text, fenced = variants["valid"], variants["fenced"]
+    clips = json.dumps(script["clips"])
+
+    paths = {
+        "json.loads (dict)": lambda: json.loads(text),
+        "json.loads + model_validate": lambda: VideoSchema.model_validate(
+            json.loads(text)
+        ),
+        "model_validate_json": lambda: VideoSchema.model_validate_json(text),
+        "list[Clip], adapter per call": lambda: TypeAdapter(
+            List[vlog.Clip]
+        ).validate_json(clips),
+        "list[Clip], cached adapter": lambda: structured_output.type_adapter(
+            List[vlog.Clip]
+        ).validate_json(clips),
+        "parse, fenced (repair)": lambda: structured_output.parse(VideoSchema, fenced),
+    }
+    print(f"Parsing a {len(text)} character script with {args.scenes} clips")
+    print(f"{'path':<30}{'µs/script':>11}{'vs dict':>9}")
+    baseline = None
+    for name, run in paths.items():
+        micros = timeit.timeit(run, number=args.number) / args.number * 1e6
+        baseline = baseline or micros
+        print(f"{name:<30}{micros:>11.1f}{micros / baseline:>8.1f}x")
+
+    print(f"\n{'output':<15}{'dict path fails with':<22}{'wasted':>9}  typed path")
+    wasted = 0
+    for name, variant in variants.items():
+        requests, error = dict_path_requests(variant)
+        if name == "valid":
+            requests = 0
+        elif name == "extra clips":
+            # Only the requests for the clips nobody asked for are wasted.
+            requests -= 2 * args.scenes
+        wasted += requests
+        outcome = typed_path(vlog, variant, args.scenes)
+        print(f"{name:<15}{error:<22}{requests:>9}  {outcome}")
+    print(
+        f"\nWasted image and video requests of the dict path: {wasted}, "
+        f"for {len(variants) - 1} malformed scripts. The typed path sends none."
+    )
+
+
+if __name__ == "__main__":
+    main()
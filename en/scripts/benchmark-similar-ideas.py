@@ -0,0 +1,176 @@
+"""Measures how often similar ideas reuse or adapt an expanded image prompt.
+
+Runs `generate_json_from_idea` of gemini-image-meta.py over a fixed list of
+concepts, each written a few different ways, one idea after the other and
+without the response cache. The idea index starts out empty. Once with the
+index off, so every idea is expanded, once with it on, and once with it on
+and all ideas at once like `generate_all_async` (rewordings then wait for
+the expansion in flight), it reports:
+
+    expanded  ideas expanded from scratch (gemini-2.5-pro)
+    adapted   ideas adapted from the prompt of a similar one (gemini-2.5-flash)
+    reused    ideas that reused the prompt of a near-identical one
+    hit rate  share of ideas that were not expanded from scratch
+    wrong     reuses or adaptations of the prompt of another concept, like
+              the fisherman's portrait for the ballerina's
+    seconds   wall time of all ideas
+    saved     latency saved as estimated by the index (`idea_index.stats`)
+
+Adaptation is off by default (ADAPT_SIMILARITY of gemini-image-meta.py),
+`--adapt-similarity` turns it on to see what it would adapt.
+
+Run it from your terminal (this makes real requests):
+    python en/scripts/benchmark-similar-ideas.py
+or offline, with the fake backend:
+    python en/scripts/benchmark-similar-ideas.py --fake --latency-scale 0.05
+    python en/scripts/benchmark-similar-ideas.py --fake --adapt-similarity 0.6
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import tempfile
+import time
+
+from google import genai
+
+import tracing
+from fake_genai import FakeClient
+from idea_index import IdeaIndex
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Concepts, each as a few rewordings like in real idea lists.
+CONCEPTS = [
+    [
+        "A energy drink with water drops on it, ultra realistic, for a commercial.",
+        "An energy drink can covered in water droplets, ultra-realistic commercial shot",
+        "Ultra realistic energy drink with water drops, for a commercial",
+    ],
+    [
+        "An emotional, close-up portrait of an old fisherman.",
+        "Close-up emotional portrait of an elderly fisherman",
+        "An emotional close-up portrait of an old fisherman",
+    ],
+    [
+        "A LEGO knight fighting a huge, fire-breathing dragon on a castle wall.",
+        "A LEGO knight fights a giant fire breathing dragon on the castle walls",
+    ],
+    [
+        "A cartoon robot waving happily, with a simple, bold outline and bright, flat colors.",
+        "Cartoon robot happily waving hello, bold simple outlines, bright flat colours",
+        "A cartoon robot waving happily with a simple bold outline and bright flat colors!",
+    ],
+    [
+        # The same sentence about another subject.
+        "A cartoon dragon waving happily, with a simple, bold outline and bright, flat colors.",
+    ],
+    [
+        "A LEGO pirate fighting a huge, fire-breathing dragon on a castle wall.",
+    ],
+    [
+        "A stylish woman sipping coffee at a Parisian cafe, with the Eiffel Tower in the background. Shot in golden hour.",
+        "Stylish woman drinking coffee in a Paris cafe with the Eiffel Tower behind her at golden hour",
+    ],
+    [
+        "A vast, alien landscape on a distant planet with two suns, strange, towering rock formations, and bioluminescent plants.",
+    ],
+    [
+        "An emotional, close-up portrait of a young ballerina.",
+    ],
+    [
+        "Graffiti with the text 'JSON Schema' on a brick wall.",
+        "Graffiti on a brick wall with the text 'JSON Schema'",
+    ],
+]
+
+
+def load_image_script(fake: bool, latency_scale: float):
+    """Imports gemini-image-meta.py, with the fake client if `fake` is set."""
+    original_client = genai.Client
+    if fake:
+        genai.Client = lambda *args, **kwargs: FakeClient(latency_scale=latency_scale)
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "gemini_image_meta", os.path.join(SCRIPTS_DIR, "gemini-image-meta.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        genai.Client = original_client
+    return module
+
+
+async def generate_all(images, ideas: list[str]) -> None:
+    await asyncio.gather(*(images.generate_json_from_idea_async(i) for i in ideas))
+
+
+def run(images, enabled: bool, output_dir: str, at_once: bool = False) -> dict:
+    """Generates the prompts of all ideas with the index on or off."""
+    images.idea_index = IdeaIndex(path=None, enabled=enabled)
+    concept_of = {idea: n for n, ideas in enumerate(CONCEPTS) for idea in ideas}
+    ideas = [idea for ideas in CONCEPTS for idea in ideas]
+    wrong = 0
+    start = time.perf_counter()
+    with tracing.trace(output_dir, mode="jsonl") as tracer:
+        if at_once:
+            asyncio.run(generate_all(images, ideas))
+        else:
+            for idea in ideas:
+                images.generate_json_from_idea(idea)
+    seconds = time.perf_counter() - start
+    # The ideas start in order, also at once.
+    spans = sorted(
+        (s for s in tracer.spans if s["name"] == "generate_json_from_idea"),
+        key=lambda s: s["start"],
+    )
+    for idea, span in zip(ideas, spans):
+        similar = span.get("reused") or span.get("adapted")
+        if similar is not None and concept_of[similar] != concept_of[idea]:
+            wrong += 1
+    return {**images.idea_index.stats, "wrong": wrong, "seconds": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--fake", action="store_true", help="use the offline fake backend"
+    )
+    parser.add_argument("--latency-scale", type=float, default=0.05)
+    parser.add_argument(
+        "--adapt-similarity",
+        type=float,
+        default=None,
+        help="adapt the prompts of ideas at least this similar",
+    )
+    args = parser.parse_args()
+
+    images = load_image_script(args.fake, args.latency_scale)
+    images.response_cache.enabled = False
+    images.ADAPT_SIMILARITY = args.adapt_similarity
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = {
+            "index off": run(images, False, os.path.join(tmp_dir, "off")),
+            "index on": run(images, True, os.path.join(tmp_dir, "on")),
+            "at once": run(images, True, os.path.join(tmp_dir, "at-once"), True),
+        }
+
+    print(
+        f"\n{'':<11}{'expanded':>9}{'adapted':>9}{'reused':>8}{'hit rate':>10}"
+        f"{'wrong':>7}{'seconds':>9}{'saved':>7}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<11}{r['expanded']:>9}{r['adapted']:>9}{r['reused']:>8}"
+            f"{r['hit_rate']:>10.0%}{r['wrong']:>7}{r['seconds']:>9.1f}"
+            f"{r['seconds_saved']:>7.1f}"
+        )
+    print(
+        f"\nThresholds: reuse >= {images.REUSE_SIMILARITY}, "
+        f"adapt >= {images.ADAPT_SIMILARITY}"
+    )
+
+
+if __name__ == "__main__":
+    main()
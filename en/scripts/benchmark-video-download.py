@@ -0,0 +1,120 @@
+"""Checks the streaming video download against a local HTTP stand-in server.
+
+Serves files of different sizes from a local server that supports range
+requests and drops the connection partway through a configurable number of
+transfers. For every size it downloads the file with `video_download.download`
+and reports whether the hash matches, how many attempts were needed and the
+peak memory allocated by the download, which should stay flat regardless of
+the file size. Each download starts next to a partial file left over from a
+different URL, which must not be resumed.
+
+Run it from your terminal:
+    python en/scripts/benchmark-video-download.py --sizes 16 64 256 --drops 2
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from video_download import download
+
+BLOCK = hashlib.sha256(b"veo").digest() * 2048  # 64 KiB of repeatable content
+
+
+def content(offset: int, end: int):
+    """Yields bytes [offset, end) of the served file, without holding it in memory."""
+    while offset < end:
+        start = offset % len(BLOCK)
+        chunk = BLOCK[start : start + min(len(BLOCK) - start, end - offset)]
+        yield chunk
+        offset += len(chunk)
+
+
+def expected_sha256(size: int) -> str:
+    digest = hashlib.sha256()
+    for chunk in content(0, size):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves /<size>.mp4 and drops the first `drops` transfers halfway."""
+
+    drops = 0
+
+    def do_GET(self):
+        size = int(re.match(r"/(\d+)\.mp4", self.path)[1])
+        etag = f'"{size}"'
+        start = 0
+        match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if self.headers.get("If-Range", etag) != etag:
+            match = None
+        if match:
+            start = int(match[1])
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(size - start))
+        self.end_headers()
+
+        end = size
+        if StandInHandler.drops > 0:
+            StandInHandler.drops -= 1
+            end = start + (size - start) // 2
+        for chunk in content(start, end):
+            self.wfile.write(chunk)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--drops", type=int, default=2)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    print(f"{'MiB':>6}{'seconds':>10}{'attempts':>10}{'peak KiB':>10}{'sha256 ok':>11}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mib in args.sizes:
+            size = mib * 1024 * 1024
+            StandInHandler.drops = args.drops
+            path = os.path.join(tmp_dir, f"video_{mib}.mp4")
+            # Left over from an interrupted download of another clip.
+            with open(path + ".part", "wb") as f:
+                f.write(os.urandom(40_000))
+            with open(path + ".part.json", "w") as f:
+                json.dump({"url": f"{base_url}/other.mp4", "validator": '"1"'}, f)
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = download(f"{base_url}/{size}.mp4", path, backoff=0.01)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            ok = result.sha256 == expected_sha256(size) and result.size == size
+            print(
+                f"{mib:>6}{elapsed:>10.2f}{result.attempts:>10}"
+                f"{peak / 1024:>10.0f}{str(ok):>11}"
+            )
+            os.remove(path)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,793 @@
+"""An offline stand-in for `genai.Client` to exercise and benchmark the scripts.
+
+`FakeClient` implements the parts of the client the scripts use:
+`models.generate_content` (text, structured JSON and image edits) and its
+`generate_content_stream`, `models.generate_images`, `models.generate_videos`
+with `operations.get`, the same methods on `client.aio`, `aio.chats` for
+the MCP chat loops, and `batches` with `files` for Batch API jobs with
+inline or JSONL file requests. Every call sleeps for a latency drawn from a configurable
+log-normal distribution, fails with a retriable 503 at a configurable rate and
+returns deterministic payloads: tiny PNGs, short MP4s rendered once with
+ffmpeg and JSON that is valid against the requested schema (e.g.
+`VideoSchema` or `SceneResponse`), or against the JSON template pasted into
+the prompt.
+
+Example:
+    fake = FakeClient(latency_scale=0.01, failure_rate=0.05)
+    genai.Client = lambda *args, **kwargs: fake  # before loading a script
+    ...
+    print(fake.requests)
+"""
+
+import asyncio
+import functools
+import itertools
+import json
+import math
+import os
+import random
+import re
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import types as pytypes
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+from google.genai import errors, types
+from pydantic import BaseModel
+
+
+@dataclass
+class Latency:
+    """A log-normal latency distribution, optionally with stragglers.
+
+    Args:
+        median: The median latency in seconds.
+        sigma: The standard deviation of the underlying normal distribution,
+            0.5 puts the p95 at roughly 2.3x the median.
+        straggler_rate: The probability that a call is a straggler.
+        straggler_factor: How much longer a straggler takes.
+    """
+
+    median: float
+    sigma: float = 0.5
+    straggler_rate: float = 0.0
+    straggler_factor: float = 5.0
+
+    def sample(self, rng: random.Random) -> float:
+        seconds = self.median * math.exp(rng.gauss(0, self.sigma))
+        if self.straggler_rate and rng.random() < self.straggler_rate:
+            seconds *= self.straggler_factor
+        return seconds
+
+
+# Rough medians of the real services, in seconds. `video_render` is the time
+# a Veo operation takes to finish after `generate_videos` returned. A
+# "call:model" entry overrides the latency of a call for one model.
+DEFAULT_LATENCY = {
+    "generate_content": Latency(8.0),
+    "generate_content:gemini-2.5-flash": Latency(3.0),
+    "generate_images": Latency(6.0),
+    "generate_videos": Latency(1.0),
+    "video_render": Latency(60.0, sigma=0.3),
+    "operations.get": Latency(0.2),
+    "chat": Latency(2.0),
+    "stream_chunk": Latency(0.05),
+    "mcp_tool": Latency(0.5),
+    "batch_job": Latency(600.0, sigma=0.5),
+    "batches.create": Latency(1.0),
+    "batches.get": Latency(0.2),
+    "files.upload": Latency(0.5),
+    "files.download": Latency(0.5),
+}
+
+
+def tiny_png(width: int = 16, height: int = 9, color=(40, 90, 160)) -> bytes:
+    """Encodes a single-color RGB PNG without any imaging library."""
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        crc = zlib.crc32(tag + data) & 0xFFFFFFFF
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", crc)
+
+    rows = b"".join(b"\x00" + bytes(color) * width for _ in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def tiny_mp4(duration: float = 1.0, size: str = "64x36", fps: int = 24) -> bytes:
+    """Renders a short h264/aac clip like a (very small) Veo video."""
+    from moviepy.config import FFMPEG_BINARY
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "clip.mp4")
+        subprocess.run(
+            [
+                FFMPEG_BINARY,
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-y",
+                "-f",
+                "lavfi",
+                "-i",
+                f"testsrc2=size={size}:rate={fps}",
+                "-f",
+                "lavfi",
+                "-i",
+                "sine=frequency=440:sample_rate=48000",
+                "-t",
+                str(duration),
+                "-c:v",
+                "libx264",
+                "-pix_fmt",
+                "yuv420p",
+                "-c:a",
+                "aac",
+                "-ac",
+                "2",
+                path,
+            ],
+            check=True,
+        )
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def _examples(description: str) -> list[str]:
+    """The examples listed in a field description ("Examples: 'a', 'b'.")."""
+    _, _, examples = (description or "").partition("Examples: ")
+    examples = examples.strip().rstrip(".")
+    if examples.startswith("'"):
+        # Quoted examples may contain quotes and be followed by a remark:
+        # '5'8" / 173 cm', '16:9' (standard widescreen), ...
+        return re.findall(r"'(.+?)'(?:\s*\([^)]*\))?(?=,\s|$)", examples)
+    return [e.strip() for e in examples.split(",") if e.strip()]
+
+
+def sample_json(
+    schema: dict,
+    defs: Optional[dict] = None,
+    array_length: int = 3,
+    path: str = "value",
+    variant: int = 0,
+    description: Optional[str] = None,
+) -> Any:
+    """Builds a deterministic value that is valid against a JSON schema.
+
+    Strings and numbers are taken from the "Examples: ..." of the field
+    description where there are any, so payloads have realistic sizes, and
+    every other array item leaves its nullable fields empty.
+
+    Args:
+        schema: The JSON schema, e.g. `VideoSchema.model_json_schema()`.
+        defs: The `$defs` to resolve references with, taken from the root
+            schema by default.
+        array_length: The number of items of arrays without size constraints.
+        path: Used to make string values tell where they are in the document.
+        variant: Which example to use, so array items differ.
+        description: The description of the field, if not in `schema`.
+    """
+    defs = schema.get("$defs", {}) if defs is None else defs
+    description = schema.get("description", description)
+    if "$ref" in schema:
+        target = defs[schema["$ref"].rsplit("/", 1)[-1]]
+        return sample_json(target, defs, array_length, path, variant, description)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") not in ("null", "NULL")]
+            # Like a model would, leave optional fields empty now and then.
+            if len(options) < len(schema[key]) and variant % 2:
+                return None
+            return sample_json(
+                options[0], defs, array_length, path, variant, description
+            )
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return schema["enum"][variant % len(schema["enum"])]
+
+    kind = schema.get("type", "object")
+    if isinstance(kind, list):
+        kind = next(k for k in kind if k != "null")
+    # `types.Schema` spells the types in upper case.
+    kind = kind.lower()
+    examples = _examples(description)
+    example = examples[variant % len(examples)] if examples else None
+    if kind == "object":
+        return {
+            name: sample_json(prop, defs, array_length, name, variant)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        length = max(schema.get("minItems", 0), array_length)
+        length = min(schema.get("maxItems", length), length)
+        return [
+            sample_json(
+                schema.get("items", {}), defs, array_length, f"{path} {n + 1}", n
+            )
+            for n in range(length)
+        ]
+    if kind == "string":
+        if schema.get("format") == "uri":
+            return f"https://example.com/{re.sub(r'[^a-z0-9]+', '-', path.lower())}"
+        return example or f"Fake {path}"
+    if kind in ("integer", "number"):
+        try:
+            number = float(re.match(r"-?[\d.]+", example or "")[0])
+        except TypeError:
+            number = schema.get("minimum", 1)
+        return int(number) if kind == "integer" else float(number)
+    if kind == "boolean":
+        return True
+    return None
+
+
+def template_schema(prompt: str) -> Optional[dict]:
+    """The JSON schema of a commented JSON template pasted into a prompt.
+
+    Prompts without a response schema ask for JSON by showing its structure,
+    with `// comments` that describe the fields and give examples such as
+    `(e.g., "16:9", "1:1")`. Returns None if the prompt shows no template.
+    """
+    match = re.search(r"^\{$.*^\}$", prompt, re.M | re.S)
+    if match is None:
+        return None
+    lines, descriptions = [], {}
+    for line in match[0].splitlines():
+        line, _, comment = line.partition("//")
+        key = re.search(r'"(\w+)"\s*:', line)
+        examples = re.findall(r'"([^"]+)"', comment)
+        if key and examples:
+            descriptions[key[1]] = "Examples: " + ", ".join(f"'{e}'" for e in examples)
+        lines.append(line)
+    try:
+        template = json.loads("\n".join(lines))
+    except json.JSONDecodeError:
+        return None
+    return _schema_of(template, descriptions)
+
+
+def _schema_of(value: Any, descriptions: dict, key: Optional[str] = None) -> dict:
+    if isinstance(value, dict):
+        schema = {
+            "type": "object",
+            "properties": {k: _schema_of(v, descriptions, k) for k, v in value.items()},
+            "required": list(value),
+        }
+    elif isinstance(value, list):
+        schema = {
+            "type": "array",
+            "items": _schema_of(value[0], descriptions) if value else {},
+        }
+    elif isinstance(value, bool):
+        schema = {"type": "boolean"}
+    elif isinstance(value, (int, float)):
+        schema = {"type": "number"}
+    else:
+        schema = {"type": "string"}
+    if key in descriptions:
+        schema["description"] = descriptions[key]
+    return schema
+
+
+def _text(contents: Any) -> str:
+    """Flattens request contents to the text the model would read."""
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return " ".join(_text(c) for c in contents)
+    if isinstance(contents, dict):
+        return " ".join(_text(p.get("text", "")) for p in contents.get("parts", []))
+    return str(getattr(contents, "text", "") or "")
+
+
+def _response_schema(config) -> Optional[dict]:
+    if config is None:
+        return None
+    schema = getattr(config, "response_json_schema", None) or getattr(
+        config, "response_schema", None
+    )
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        return schema.model_json_schema()
+    if isinstance(schema, BaseModel):
+        return schema.model_dump(exclude_none=True)
+    return schema
+
+
+def _usage(prompt: str, output: str) -> types.GenerateContentResponseUsageMetadata:
+    # Roughly four characters per token.
+    prompt_tokens, output_tokens = len(prompt) // 4 + 1, len(output) // 4 + 1
+    return types.GenerateContentResponseUsageMetadata(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=output_tokens,
+        total_token_count=prompt_tokens + output_tokens,
+    )
+
+
+class FakeClient:
+    """A fake `genai.Client` with simulated latency and failures.
+
+    Args:
+        latency: Latency distributions overriding `DEFAULT_LATENCY`, by call
+            ("generate_content", "video_render", ...).
+        latency_scale: Factor applied to every latency, e.g. 0.01 to run a
+            vlog in seconds instead of minutes.
+        failure_rate: The probability that a call fails with a 503.
+        seed: Seed of the random generator, for repeatable runs.
+        array_length: The number of items of schema arrays, used unless the
+            prompt asks for a number of scenes.
+        video_duration: The duration of the generated MP4s in seconds.
+    """
+
+    def __init__(
+        self,
+        latency: Optional[dict[str, Latency]] = None,
+        latency_scale: float = 1.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+        array_length: int = 3,
+        video_duration: float = 1.0,
+    ):
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.latency_scale = latency_scale
+        self.failure_rate = failure_rate
+        self.array_length = array_length
+        self.video_duration = video_duration
+        self.requests = Counter()
+        self.failures = Counter()
+        self.simulated_seconds = 0.0
+        # time.monotonic() of the first request of every call, e.g. to measure
+        # the time to the first Veo submission.
+        self.first_requests: dict[str, float] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._operations: dict[str, float] = {}
+        self._operation_ids = itertools.count(1)
+        self._batches: dict[str, dict] = {}
+        self._files: dict[str, bytes] = {}
+
+        self.models = _Models(self)
+        self.operations = _Operations(self)
+        self.batches = _Batches(self)
+        self.files = _Files(self)
+        self.aio = pytypes.SimpleNamespace(
+            models=_AsyncModels(self),
+            operations=_AsyncOperations(self),
+            chats=pytypes.SimpleNamespace(create=self._create_async_chat),
+        )
+
+    def _begin(self, call: str, model: Optional[str] = None) -> float:
+        """Counts a request and returns how long it takes, or raises a 503."""
+        with self._lock:
+            self.requests[f"{call}:{model}" if model else call] += 1
+            self.first_requests.setdefault(call, time.monotonic())
+            latency = self.latency.get(f"{call}:{model}", self.latency[call])
+            delay = latency.sample(self._rng) * self.latency_scale
+            failed = self._rng.random() < self.failure_rate
+            self.simulated_seconds += delay
+        if failed:
+            with self._lock:
+                self.failures[call] += 1
+            raise errors.APIError(
+                503,
+                {"error": {"code": 503, "status": "UNAVAILABLE", "message": "fake"}},
+            )
+        return delay
+
+    def _call(self, call: str, model: Optional[str] = None) -> None:
+        time.sleep(self._begin(call, model))
+
+    async def _call_async(self, call: str, model: Optional[str] = None) -> None:
+        await asyncio.sleep(self._begin(call, model))
+
+    def _scene_count(self, prompt: str) -> int:
+        match = re.search(r"(\d+)\s+scenes", prompt)
+        return int(match[1]) if match else self.array_length
+
+    def _content_response(
+        self, contents: Any, config=None, history=None
+    ) -> types.GenerateContentResponse:
+        prompt = _text(contents)
+        parts = []
+        schema = _response_schema(config)
+        template = template_schema(prompt) if schema is None else None
+        if config is not None and "IMAGE" in (config.response_modalities or []):
+            parts = [
+                types.Part(text="Here is the edited image."),
+                types.Part(
+                    inline_data=types.Blob(data=tiny_png(), mime_type="image/png")
+                ),
+            ]
+            text = parts[0].text
+        elif schema is not None:
+            text = json.dumps(
+                sample_json(schema, array_length=self._scene_count(prompt))
+            )
+        elif template is not None:
+            # Asked for JSON in the prompt itself, answered without fences.
+            text = json.dumps(sample_json(template), indent=2)
+        else:
+            text = f"Fake answer to: {prompt[:200]}"
+        if not parts:
+            parts = [types.Part(text=text)]
+        return types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(content=types.Content(role="model", parts=parts))
+            ],
+            automatic_function_calling_history=history or [],
+            # The response schema is part of the input, like with the real API.
+            usage_metadata=_usage(
+                prompt + (json.dumps(schema) if schema else ""), text
+            ),
+        )
+
+    def _stream_response(
+        self, model: str, contents: Any, config=None, chunk_chars: int = 200
+    ) -> Iterator[types.GenerateContentResponse]:
+        """Yields the text of a content response in chunks, spread over its latency.
+
+        Like the real API, the first chunk arrives after a fraction of the
+        latency of the whole response.
+        """
+        delay = self._begin("generate_content", model)
+        response = self._content_response(contents, config)
+        text = response.text or ""
+        chunks = [text[i : i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        time.sleep(delay * 0.15)
+        for n, chunk in enumerate(chunks):
+            if n:
+                time.sleep(delay * 0.85 / (len(chunks) - 1))
+            yield types.GenerateContentResponse(
+                candidates=[
+                    types.Candidate(
+                        content=types.Content(
+                            role="model", parts=[types.Part(text=chunk)]
+                        )
+                    )
+                ],
+                # The usage is reported with the last chunk.
+                usage_metadata=(
+                    response.usage_metadata if n == len(chunks) - 1 else None
+                ),
+            )
+
+    def _images_response(self, config=None) -> types.GenerateImagesResponse:
+        number = (config.number_of_images if config is not None else None) or 1
+        return types.GenerateImagesResponse(
+            generated_images=[
+                types.GeneratedImage(
+                    image=types.Image(image_bytes=tiny_png(), mime_type="image/png")
+                )
+                for _ in range(number)
+            ]
+        )
+
+    def _start_operation(self) -> types.GenerateVideosOperation:
+        name = f"models/veo/operations/fake-{next(self._operation_ids)}"
+        with self._lock:
+            render = self.latency["video_render"].sample(self._rng)
+            self._operations[name] = time.monotonic() + render * self.latency_scale
+        return types.GenerateVideosOperation(name=name, done=False)
+
+    def _refresh_operation(self, operation) -> types.GenerateVideosOperation:
+        with self._lock:
+            ready_at = self._operations[operation.name]
+        if time.monotonic() < ready_at:
+            return types.GenerateVideosOperation(name=operation.name, done=False)
+        video = types.Video(
+            video_bytes=tiny_mp4(self.video_duration), mime_type="video/mp4"
+        )
+        return types.GenerateVideosOperation(
+            name=operation.name,
+            done=True,
+            response=types.GenerateVideosResponse(
+                generated_videos=[types.GeneratedVideo(video=video)]
+            ),
+        )
+
+    def _create_async_chat(self, model: str, config=None, history=None):
+        return _AsyncChat(self, model, config)
+
+    def _batch_entries(self, src) -> tuple[list[tuple], bool]:
+        """The (key, contents, config) of every request of a batch source."""
+        if isinstance(src, types.BatchJobSource):
+            src = src.file_name or src.inlined_requests
+        if isinstance(src, str):
+            entries = []
+            for line in self._files[src].decode("utf-8").splitlines():
+                if line.strip():
+                    item = json.loads(line)
+                    request = item["request"]
+                    config = request.get("generation_config")
+                    entries.append(
+                        (
+                            item.get("key"),
+                            request["contents"],
+                            types.GenerateContentConfig(**config) if config else None,
+                        )
+                    )
+            return entries, False
+        requests = [types.InlinedRequest.model_validate(r) for r in src]
+        return [
+            ((r.metadata or {}).get("key"), r.contents, r.config) for r in requests
+        ], True
+
+    def _create_batch(self, model: str, src, config=None) -> types.BatchJob:
+        entries, inline = self._batch_entries(src)
+        name = f"batches/fake-{next(self._operation_ids)}"
+        with self._lock:
+            turnaround = self.latency["batch_job"].sample(self._rng)
+            self._batches[name] = dict(
+                model=model,
+                entries=entries,
+                inline=inline,
+                ready_at=time.monotonic() + turnaround * self.latency_scale,
+                display_name=getattr(config, "display_name", None),
+                job=None,
+            )
+        return types.BatchJob(
+            name=name, model=model, state=types.JobState.JOB_STATE_PENDING
+        )
+
+    def _refresh_batch(self, name: str) -> types.BatchJob:
+        batch = self._batches[name]
+        if time.monotonic() < batch["ready_at"]:
+            return types.BatchJob(
+                name=name, model=batch["model"], state=types.JobState.JOB_STATE_RUNNING
+            )
+        if batch["job"] is None:
+            # Every entry fails on its own at the failure rate, like a 503 would.
+            outcomes = []
+            for key, contents, config in batch["entries"]:
+                with self._lock:
+                    failed = self._rng.random() < self.failure_rate
+                    self.requests[f"batch_entry:{batch['model']}"] += 1
+                if failed:
+                    outcomes.append((key, None))
+                else:
+                    outcomes.append((key, self._content_response(contents, config)))
+            if batch["inline"]:
+                dest = types.BatchJobDestination(
+                    inlined_responses=[
+                        types.InlinedResponse(
+                            metadata={"key": key} if key is not None else None,
+                            response=response,
+                            error=(
+                                types.JobError(code=503, message="fake")
+                                if response is None
+                                else None
+                            ),
+                        )
+                        for key, response in outcomes
+                    ]
+                )
+            else:
+                file_name = f"files/{name.split('/')[-1]}-results"
+                self._files[file_name] = "".join(
+                    json.dumps(
+                        {"key": key, "error": {"code": 503, "message": "fake"}}
+                        if response is None
+                        else {
+                            "key": key,
+                            "response": response.model_dump(
+                                mode="json", exclude_none=True, by_alias=True
+                            ),
+                        }
+                    )
+                    + "\n"
+                    for key, response in outcomes
+                ).encode("utf-8")
+                dest = types.BatchJobDestination(file_name=file_name)
+            batch["job"] = types.BatchJob(
+                name=name,
+                model=batch["model"],
+                display_name=batch["display_name"],
+                state=types.JobState.JOB_STATE_SUCCEEDED,
+                dest=dest,
+            )
+        return batch["job"]
+
+
+class _Models:
+    def __init__(self, fake: FakeClient):
+        self._fake = fake
+
+    def generate_content(self, model: str, contents: Any, config=None):
+        self._fake._call("generate_content", model)
+        return self._fake._content_response(contents, config)
+
+    def generate_content_stream(self, model: str, contents: Any, config=None):
+        return self._fake._stream_response(model, contents, config)
+
+    def generate_images(self, model: str, prompt: str, config=None):
+        self._fake._call("generate_images", model)
+        return self._fake._images_response(config)
+
+    def generate_videos(self, model: str, prompt: str = None, image=None, config=None):
+        self._fake._call("generate_videos", model)
+        return self._fake._start_operation()
+
+
+class _AsyncModels:
+    def __init__(self, fake: FakeClient):
+        self._fake = fake
+
+    async def generate_content(self, model: str, contents: Any, config=None):
+        await self._fake._call_async("generate_content", model)
+        return self._fake._content_response(contents, config)
+
+    async def generate_images(self, model: str, prompt: str, config=None):
+        await self._fake._call_async("generate_images", model)
+        return self._fake._images_response(config)
+
+    async def generate_videos(
+        self, model: str, prompt: str = None, image=None, config=None
+    ):
+        await self._fake._call_async("generate_videos", model)
+        return self._fake._start_operation()
+
+
+class _Operations:
+    def __init__(self, fake: FakeClient):
+        self._fake = fake
+
+    def get(self, operation):
+        self._fake._call("operations.get")
+        return self._fake._refresh_operation(operation)
+
+
+class _Batches:
+    def __init__(self, fake: FakeClient):
+        self._fake = fake
+
+    def create(self, model: str, src, config=None):
+        self._fake._call("batches.create", model)
+        return self._fake._create_batch(model, src, config)
+
+    def get(self, name: str, config=None):
+        self._fake._call("batches.get")
+        return self._fake._refresh_batch(name)
+
+
+class _Files:
+    def __init__(self, fake: FakeClient):
+        self._fake = fake
+
+    def upload(self, file, config=None):
+        self._fake._call("files.upload")
+        with open(file, "rb") as f:
+            data = f.read()
+        name = f"files/fake-{next(self._fake._operation_ids)}"
+        self._fake._files[name] = data
+        return types.File(
+            name=name,
+            display_name=getattr(config, "display_name", None),
+            mime_type=getattr(config, "mime_type", None),
+            size_bytes=len(data),
+        )
+
+    def download(self, file, config=None) -> bytes:
+        self._fake._call("files.download")
+        return self._fake._files[getattr(file, "name", file)]
+
+
+class _AsyncOperations:
+    def __init__(self, fake: FakeClient):
+        self._fake = fake
+
+    async def get(self, operation):
+        await self._fake._call_async("operations.get")
+        return self._fake._refresh_operation(operation)
+
+
+class _AsyncChat:
+    """A chat session that calls every MCP session in `config.tools` once per turn."""
+
+    def __init__(self, fake: FakeClient, model: str, config=None):
+        self._fake = fake
+        self._model = model
+        self._sessions = [
+            tool for tool in (getattr(config, "tools", None) or []) if _is_mcp(tool)
+        ]
+
+    async def _call_tools(self, message: str) -> list[types.Content]:
+        history = [types.Content(role="user", parts=[types.Part(text=message)])]
+        for session in self._sessions:
+            tools = (await session.list_tools()).tools
+            call = types.FunctionCall(name=tools[0].name, args={"query": message})
+            result = await session.call_tool(call.name, call.args)
+            history += [
+                types.Content(role="model", parts=[types.Part(function_call=call)]),
+                types.Content(
+                    role="user",
+                    parts=[
+                        types.Part(
+                            function_response=types.FunctionResponse(
+                                name=call.name, response={"result": result}
+                            )
+                        )
+                    ],
+                ),
+            ]
+        return history
+
+    async def send_message(self, message: str):
+        history = await self._call_tools(message)
+        await self._fake._call_async("chat", self._model)
+        return self._fake._content_response(message, history=history)
+
+    async def send_message_stream(self, message: str):
+        history = await self._call_tools(message)
+        await self._fake._call_async("chat", self._model)
+        response = self._fake._content_response(message, history=history)
+
+        async def chunks():
+            words = response.text.split(" ")
+            for n in range(0, len(words), 8):
+                await self._fake._call_async("stream_chunk")
+                yield types.GenerateContentResponse(
+                    candidates=[
+                        types.Candidate(
+                            content=types.Content(
+                                role="model",
+                                parts=[types.Part(text=" ".join(words[n : n + 8]))],
+                            )
+                        )
+                    ]
+                )
+
+        return chunks()
+
+
+def _is_mcp(tool) -> bool:
+    return hasattr(tool, "call_tool") and hasattr(tool, "list_tools")
+
+
+class FakeMCPSession:
+    """An MCP client session with one tool, answering with canned text.
+
+    Args:
+        fake: The fake client whose latency and counters are used.
+        tool_name: The name of the single tool the session offers.
+    """
+
+    def __init__(self, fake: FakeClient, tool_name: str = "ask_question"):
+        self._fake = fake
+        self._tool = pytypes.SimpleNamespace(
+            name=tool_name, description="Fake MCP tool", inputSchema={}
+        )
+
+    @property
+    def session(self) -> "FakeMCPSession":
+        """Lets the session also stand in for a fastmcp `Client`."""
+        return self
+
+    async def initialize(self):
+        return None
+
+    async def list_tools(self):
+        return pytypes.SimpleNamespace(tools=[self._tool])
+
+    async def call_tool(self, name: str, arguments: Optional[dict] = None, **kwargs):
+        await self._fake._call_async("mcp_tool", name)
+        return pytypes.SimpleNamespace(
+            content=[pytypes.SimpleNamespace(type="text", text=f"Fake {name} result")],
+            isError=False,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
@@ -0,0 +1,385 @@
+"""Runs many vlogs or image sets concurrently from an ideas file.
+
+Instead of looping over a hard-coded `ideas` list one at a time, this runner
+reads ideas from a JSONL or CSV file and processes them on a global worker
+pool. Every model additionally gets its own concurrency limit, so e.g. only a
+few Veo jobs run at once while the other workers keep writing scripts,
+rendering start images and editing images for the next ideas.
+
+Ideas files:
+    ideas.jsonl:  {"idea": "A cartoon for kids about addition", "number_of_scenes": 3}
+    ideas.csv:    idea,number_of_scenes
+                  A cartoon for kids about addition,3
+Extra keys/columns are passed on to `generate_vlog` or `generate`. Of the CSV
+columns only `number_of_scenes` (or `num_images` in images mode) is read as a
+number, the others stay text.
+
+With `--batch-api`, the scripts or image prompts of all ideas are expanded
+first with Gemini Batch API jobs (see `batch_jobs`), at half the price but
+with a turnaround of minutes to hours. They land in the response cache, so
+the pipelines find them there. Meant for overnight catalog runs.
+
+Run it from your terminal:
+    python en/scripts/gemini-batch-runner.py ideas.jsonl --mode vlog --workers 8 \
+        --limit "veo-3.0-*=4" --limit "gemini-2.5-pro=4"
+    python en/scripts/gemini-batch-runner.py catalog.jsonl --mode images --batch-api
+"""
+
+import argparse
+import asyncio
+import contextvars
+import csv
+import fnmatch
+import functools
+import importlib.util
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logging.basicConfig(
+    level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("batch-runner")
+logger.setLevel(logging.INFO)
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Script, entry point and the model behind every stage of the pipelines.
+MODES = {
+    "vlog": {
+        "script": "gemini-veo-meta.py",
+        "entry_point": "generate_vlog",
+        "stages": {
+            "generate_scenes": "gemini-2.5-pro",
+            "generate_scenes_stream": "gemini-2.5-pro",
+            "generate_image": "imagen-3.0-generate-002",
+            "edit_image": "gemini-2.0-flash-preview-image-generation",
+            "edit_image_async": "gemini-2.0-flash-preview-image-generation",
+            "generate_video": "veo-3.0-generate-preview",
+            "generate_video_async": "veo-3.0-generate-preview",
+        },
+        "output_stages": ("generate_video", "generate_video_async"),
+        "batch_stage": "generate_scenes_batch",
+        "count_field": "number_of_scenes",
+    },
+    "images": {
+        "script": "gemini-image-meta.py",
+        "entry_point": "generate",
+        "stages": {
+            "generate_json_from_idea": "gemini-2.5-pro",
+            "generate_json_from_idea_async": "gemini-2.5-pro",
+            "generate_images": "imagen-4.0-generate-preview-06-06",
+            "generate_images_async": "imagen-4.0-generate-preview-06-06",
+        },
+        "output_stages": ("generate_images", "generate_images_async"),
+        "batch_stage": "generate_json_from_ideas_batch",
+        "count_field": "num_images",
+    },
+}
+
+# Threads that wait for model slots on behalf of async stages. Not the event
+# loop's default executor: a stage holding a slot may need that one to finish.
+_slot_waiters = ThreadPoolExecutor(max_workers=64, thread_name_prefix="slot")
+
+# Default concurrency per model, matched with fnmatch patterns.
+DEFAULT_LIMITS = {
+    "gemini-2.5-pro": 4,
+    "imagen-*": 4,
+    "veo-3.0-*": 4,
+    "gemini-2.0-flash-preview-image-generation": 4,
+}
+
+
+def load_script(fname: str):
+    """Imports one of the sample scripts, whose file names are not valid module names."""
+    path = os.path.join(SCRIPTS_DIR, fname)
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(fname)[0].replace("-", "_"), path
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def read_ideas(path: str, count_field: str = "number_of_scenes") -> list[dict]:
+    """Reads ideas from a JSONL or CSV file.
+
+    Args:
+        path: The ideas file.
+        count_field: The column with the number of scenes or images, the
+            only one parsed as a number. Ideas such as "1984" stay text.
+    """
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    for row in rows:
+        if isinstance(row.get(count_field), str):
+            if row[count_field].strip():
+                row[count_field] = int(row[count_field])
+            else:
+                # An empty cell, the pipeline's default applies.
+                del row[count_field]
+    return rows
+
+
+async def acquire_async(semaphore: threading.Semaphore) -> None:
+    """Waits for a thread semaphore without blocking the event loop.
+
+    The wait happens on a thread of its own. If the caller is cancelled in
+    the meantime, the slot is given back as soon as that thread gets it.
+    """
+    acquired = _slot_waiters.submit(semaphore.acquire)
+    try:
+        await asyncio.shield(asyncio.wrap_future(acquired))
+    except asyncio.CancelledError:
+        acquired.add_done_callback(lambda _: semaphore.release())
+        raise
+
+
+class ModelLimits:
+    """One semaphore per model, sized by the first matching limit pattern."""
+
+    def __init__(self, limits: dict[str, int]):
+        self.limits = limits
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def semaphore(self, model: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if model not in self._semaphores:
+                limit = next(
+                    (n for p, n in self.limits.items() if fnmatch.fnmatch(model, p)),
+                    None,
+                )
+                if limit is None:
+                    raise ValueError(f"No concurrency limit configured for {model}")
+                self._semaphores[model] = threading.BoundedSemaphore(limit)
+            return self._semaphores[model]
+
+
+class BatchRunner:
+    """Processes ideas on a worker pool with per-model concurrency limits.
+
+    Args:
+        mode: "vlog" or "images", see MODES.
+        workers: The size of the global worker pool (ideas in flight).
+        limits: Concurrency per model pattern, see DEFAULT_LIMITS.
+        output_dir: The directory all ideas write their output to.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        workers: int = 8,
+        limits: dict[str, int] = DEFAULT_LIMITS,
+        output_dir: str = None,
+    ):
+        self.mode = MODES[mode]
+        self.workers = workers
+        self.output_dir = output_dir
+        self.limits = ModelLimits(limits)
+        self.module = load_script(self.mode["script"])
+        # The idea a stage runs for, also seen by its tasks and to_thread calls.
+        self._current = contextvars.ContextVar("idea_index", default=None)
+        self._lock = threading.Lock()
+        self.outputs: dict[int, int] = {}
+
+        for stage, model in self.mode["stages"].items():
+            setattr(
+                self.module,
+                stage,
+                self._limited(stage, model, getattr(self.module, stage)),
+            )
+        # A hedged request needs a slot of its own, see hedging.HedgePolicy.
+        hedge_policy = getattr(self.module, "hedge_policy", None)
+        if hedge_policy is not None:
+            hedge_policy.slots = self._hedge_slot
+
+    def _limited(self, stage: str, model: str, fn):
+        """Wraps a stage so it holds a slot of its model while it runs.
+
+        Async stages wait for the slot without blocking their event loop, and
+        generators (streamed scripts) hold it until the stream has ended.
+        """
+        semaphore = self.limits.semaphore(model)
+
+        if asyncio.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                # Every idea runs its own event loop, so the slots are shared
+                # through the thread semaphore.
+                await acquire_async(semaphore)
+                try:
+                    self._started(stage)
+                    result = await fn(*args, **kwargs)
+                finally:
+                    semaphore.release()
+                self._finished(stage)
+                return result
+
+            return async_wrapper
+
+        if inspect.isgeneratorfunction(fn):
+
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                with semaphore:
+                    self._started(stage)
+                    yield from fn(*args, **kwargs)
+                self._finished(stage)
+
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with semaphore:
+                self._started(stage)
+                result = fn(*args, **kwargs)
+            self._finished(stage)
+            return result
+
+        return wrapper
+
+    def _hedge_slot(self, key: str) -> threading.BoundedSemaphore:
+        """The semaphore of a hedged request's model, its key is "<method>:<model>"."""
+        return self.limits.semaphore(key.partition(":")[2])
+
+    def _started(self, stage: str) -> None:
+        logger.info(f"[idea {self._current.get()}] {stage} started")
+
+    def _finished(self, stage: str) -> None:
+        if stage in self.mode["output_stages"]:
+            index = self._current.get()
+            with self._lock:
+                self.outputs[index] = self.outputs.get(index, 0) + 1
+
+    def expand_prompts(self, ideas: list[dict], **options) -> int:
+        """Expands the prompts of all ideas with Batch API jobs up front.
+
+        Args:
+            ideas: The ideas, as passed to `run`.
+            **options: Passed on to `batch_jobs.run`, e.g. `source`.
+
+        Returns:
+            The number of ideas whose prompt failed. Their pipelines request
+            it again on the regular endpoint.
+        """
+        expand = getattr(self.module, self.mode["batch_stage"])
+        if self.mode["batch_stage"] == "generate_scenes_batch":
+            # 4 scenes is the default of generate_vlog.
+            prompts = expand(
+                [(idea["idea"], idea.get("number_of_scenes", 4)) for idea in ideas],
+                **options,
+            )
+        else:
+            prompts = expand([idea["idea"] for idea in ideas], **options)
+        return sum(prompt is None for prompt in prompts)
+
+    def _run_idea(self, index: int, idea: dict) -> float:
+        self._current.set(index)
+        kwargs = dict(idea)
+        if self.output_dir is not None:
+            kwargs["output_dir"] = self.output_dir
+        start = time.monotonic()
+        getattr(self.module, self.mode["entry_point"])(**kwargs)
+        return time.monotonic() - start
+
+    def run(self, ideas: list[dict]) -> dict:
+        """Runs all ideas and returns a throughput summary."""
+        start = time.monotonic()
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(self._run_idea, n, idea): n
+                for n, idea in enumerate(ideas)
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                n = futures[future]
+                try:
+                    elapsed = future.result()
+                    logger.info(
+                        f"[{done}/{len(ideas)}] idea {n} done in {elapsed:.0f}s "
+                        f"({self.outputs.get(n, 0)} outputs): {ideas[n]['idea'][:60]}"
+                    )
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"[{done}/{len(ideas)}] idea {n} failed: {e}")
+        # Scripts that write their files in the background.
+        writer = getattr(self.module, "artifact_writer", None)
+        if writer is not None:
+            writer.flush()
+
+        hours = (time.monotonic() - start) / 3600
+        outputs = sum(self.outputs.values())
+        return {
+            "ideas": len(ideas),
+            "failed": failed,
+            "seconds": round(hours * 3600, 1),
+            "ideas_per_hour": round((len(ideas) - failed) / hours, 1),
+            "outputs": outputs,
+            "outputs_per_hour": round(outputs / hours, 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("ideas", help="A .jsonl or .csv file with an 'idea' field")
+    parser.add_argument("--mode", choices=MODES, default="vlog")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--limit",
+        action="append",
+        default=[],
+        metavar="MODEL=N",
+        help="Concurrency limit per model, e.g. 'veo-3.0-*=4' (repeatable)",
+    )
+    parser.add_argument("--output-dir", default=None)
+    parser.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="Expand all prompts with Gemini Batch API jobs first",
+    )
+    parser.add_argument(
+        "--batch-source",
+        choices=["auto", "inline", "file"],
+        default="auto",
+        help="Send the batch requests inline or as an uploaded JSONL file",
+    )
+    args = parser.parse_args()
+
+    limits = {}
+    for limit in args.limit:
+        pattern, _, value = limit.partition("=")
+        limits[pattern] = int(value)
+    # Patterns are matched in order, so explicit limits go before the defaults.
+    limits.update({p: n for p, n in DEFAULT_LIMITS.items() if p not in limits})
+
+    runner = BatchRunner(
+        args.mode, workers=args.workers, limits=limits, output_dir=args.output_dir
+    )
+    ideas = read_ideas(args.ideas, MODES[args.mode]["count_field"])
+    if args.batch_api:
+        start = time.monotonic()
+        failed = runner.expand_prompts(ideas, source=args.batch_source)
+        logger.info(
+            f"Expanded {len(ideas) - failed}/{len(ideas)} prompts with the Batch "
+            f"API in {time.monotonic() - start:.0f}s"
+        )
+    summary = runner.run(ideas)
+    unit = "clips" if args.mode == "vlog" else "image sets"
+    print(
+        f"\nProcessed {summary['ideas']} ideas ({summary['failed']} failed) in "
+        f"{summary['seconds']}s: {summary['ideas_per_hour']} ideas/hour, "
+        f"{summary['outputs']} {unit} ({summary['outputs_per_hour']} {unit}/hour)"
+    )
+
+
+if __name__ == "__main__":
+    main()
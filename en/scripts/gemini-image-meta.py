@@ -1,15 +1,34 @@
+import asyncio
 import os
 import re
-from google import genai
+import time
+from concurrent.futures import Future
+from functools import partial
+from typing import Optional
 
-client = genai.Client()
+from google import genai
+from pydantic import BaseModel, Field
 
+import batch_jobs
+import structured_output
+import tracing
+from artifacts import ArtifactWriter
+from idea_index import IdeaIndex, Match, content_words
+from rate_limit import RateLimitedClient
+from response_cache import ResponseCache
+from schema_slim import json_schema
 
-def generate_json_from_idea(idea: str) -> str:
-    """Generates a detailed JSON prompt from a simple idea using a Gemini model."""
+client = RateLimitedClient(genai.Client())
+response_cache = ResponseCache()
+# Writes images and prompts in the background. Pass e.g. image_format="webp"
+# to store the images re-encoded, and fsync=True to sync them to disk.
+artifact_writer = ArtifactWriter(max_workers=4)
+# The prompts of ideas expanded so far, to reuse them for similar ideas.
+idea_index = IdeaIndex()
 
-    # The prompt template includes the desired JSON schema structure.
-    schema_template = """Convert the attached user idea into a detailed JSON object for generating an image. The output should only be the raw JSON object, without any markdown formatting like ```json ... ```.
+# The prompt template includes the desired JSON schema structure, used when
+# structured output is off (`structured=False`).
+SCHEMA_TEMPLATE = """Convert the attached user idea into a detailed JSON object for generating an image. The output should only be the raw JSON object, without any markdown formatting like ```json ... ```.
 
 Idea: "{idea}"
 
@@ -72,14 +91,506 @@ Schema:
     }}
 }}
 """
-    prompt = schema_template.format(idea=idea)
 
-    response = client.models.generate_content(
+
+class Meta(BaseModel):
+    styleName: str = Field(
+        ...,
+        description="A unique, descriptive name for this specific image style or preset. Examples: 'Ethereal Forest Magic', 'Cyberpunk Noir Alley'.",
+    )
+    aspectRatio: str = Field(
+        ...,
+        description="The proportional relationship between the width and height of the image. Examples: '16:9', '1:1', '4:5', '21:9'.",
+    )
+    promptPrefix: Optional[str] = Field(
+        None,
+        description="Optional text to prepend to a generated prompt, like a file name, a version number, or a specific trigger word.",
+    )
+
+
+class Camera(BaseModel):
+    model: str = Field(
+        ...,
+        description="Describes the camera, lens, or artistic medium used. Examples: 'DSLR', 'iPhone 15 Pro', '8x10 view camera', 'Watercolor on cold-press paper', '3D render in Blender'.",
+    )
+    focalLength: str = Field(
+        ...,
+        description="The lens's focal length, which affects the field of view and perspective distortion. Examples: '16mm wide-angle', '85mm portrait', '200mm telephoto', 'Isometric perspective'.",
+    )
+    angle: str = Field(
+        ...,
+        description="The camera's angle relative to the main subject or scene. Examples: 'eye-level', 'high-angle', 'dutch angle', 'drone shot', 'worm's-eye view'.",
+    )
+    type: str = Field(
+        ...,
+        description="The genre or type of photography or art style. Examples: 'macro photography', 'landscape', 'fantasy illustration', 'architectural rendering', 'abstract art'.",
+    )
+
+
+class Subject(BaseModel):
+    primary: str = Field(
+        ...,
+        description="The main focal point or subject of the image. Examples: 'a majestic mountain range', 'a lone wolf', 'an ancient wizard', 'a futuristic cityscape', 'an abstract shape'.",
+    )
+    emotion: str = Field(
+        ...,
+        description="The dominant emotion or mood conveyed by the subject or the overall scene. Examples: 'serene and peaceful', 'joyful', 'melancholy', 'menacing', 'awe-inspiring'.",
+    )
+    pose: str = Field(
+        ...,
+        description="The posture, action, or arrangement of the subject(s). Examples: 'running towards the camera', 'sitting in quiet contemplation', 'a winding river', 'a chaotic explosion'.",
+    )
+    gaze: str = Field(
+        ...,
+        description="The direction of the subject's gaze or the directional focus of the composition. Examples: 'looking off-camera', 'breaking the fourth wall', 'facing away from the viewer', 'pointing towards the horizon'.",
+    )
+
+
+class Character(BaseModel):
+    appearance: str = Field(
+        ...,
+        description="Detailed physical description of a character or key object. Examples: 'weathered face with a long white beard', 'sleek, chrome-plated robot', 'moss-covered ancient tree'.",
+    )
+    wardrobe: str = Field(
+        ...,
+        description="Clothing, armor, or any form of covering on the subject. Examples: 'ornate golden armor', 'tattered rags', 'a vibrant kimono', 'a car's glossy paint job'.",
+    )
+    accessories: str = Field(
+        ...,
+        description="Additional items worn by or associated with the subject. Examples: 'a magical amulet', 'cybernetic implants', 'a pair of glasses', 'a sword and shield'.",
+    )
+
+
+class Composition(BaseModel):
+    theory: str = Field(
+        ...,
+        description="The compositional rules or theories applied. Examples: 'rule of thirds', 'golden ratio', 'leading lines', 'symmetrical balance', 'negative space'.",
+    )
+    visualHierarchy: str = Field(
+        ...,
+        description="Describes the order in which the viewer's eye is drawn to different elements in the scene, from most to least prominent.",
+    )
+
+
+class Setting(BaseModel):
+    environment: str = Field(
+        ...,
+        description="The general environment or location of the scene. Examples: 'a mystical forest', 'a bustling cyberpunk city', 'a tranquil beach at sunset', 'a minimalist white room', 'the surface of Mars'.",
+    )
+    architecture: str = Field(
+        ...,
+        description="Describes any buildings, ruins, or significant natural structures. Examples: 'gothic cathedrals', 'brutalist architecture', 'alien monoliths', 'towering rock formations'.",
+    )
+    furniture: str = Field(
+        ...,
+        description="Key objects, props, or furniture within the setting that add context or detail. Examples: 'a single throne', 'scattered futuristic debris', 'a rustic wooden fence'.",
+    )
+
+
+class Lighting(BaseModel):
+    source: str = Field(
+        ...,
+        description="The primary source of light in the scene. Examples: 'dramatic moonlight', 'soft window light', 'flickering candlelight', 'neon signs', 'magical glow'.",
+    )
+    direction: str = Field(
+        ...,
+        description="The direction from which the light originates. Examples: 'backlighting', 'rim lighting', 'top-down light', 'light from below'.",
+    )
+    quality: str = Field(
+        ...,
+        description="The quality and characteristics of the light and shadows. Examples: 'soft and diffused', 'hard and high-contrast', 'dappled', 'volumetric light rays', 'caustic reflections'.",
+    )
+
+
+class Style(BaseModel):
+    artDirection: str = Field(
+        ...,
+        description="The overarching artistic style, movement, or influence. Examples: 'impressionism', 'art deco', 'cyberpunk', 'vaporwave', 'ghibli-inspired', 'cinematic'.",
+    )
+    mood: str = Field(
+        ...,
+        description="The overall mood, feeling, or atmosphere of the image. Examples: 'ethereal and dreamy', 'dystopian and gritty', 'whimsical and cheerful', 'epic and dramatic'.",
+    )
+
+
+class Rendering(BaseModel):
+    engine: str = Field(
+        ...,
+        description="The rendering engine, technique, or medium used to create the final image. Examples: 'Octane Render', 'oil painting', 'cross-hatching', 'pixel art', 'Unreal Engine 5'.",
+    )
+    fidelitySpec: str = Field(
+        ...,
+        description="Specific details about the image's texture and fidelity. Examples: 'heavy film grain', 'sharp digital focus', 'visible brushstrokes', 'chromatic aberration', 'lens flare'.",
+    )
+    postProcessing: str = Field(
+        ...,
+        description="Any post-processing or finishing effects applied. Examples: 'color grading with a teal and orange look', 'vignette', 'bloom and glare', 'a vintage photo filter'.",
+    )
+
+
+class Color(BaseModel):
+    name: str = Field(..., description="Examples: 'deep teal', 'burnt orange'.")
+    hex: str = Field(..., description="Examples: '#0F4C5C', '#E36414'.")
+    percentage: str = Field(
+        ..., description="Share of the image. Examples: '40%', '15%'."
+    )
+
+
+class ColorPalette(BaseModel):
+    primaryColors: list[Color] = Field(
+        ...,
+        description="The most dominant colors that define the overall color scheme of the image.",
+    )
+    accentColors: list[Color] = Field(
+        ...,
+        description="Complementary or contrasting colors used for emphasis, detail, or highlights.",
+    )
+
+
+class ImagePrompt(BaseModel):
+    """A detailed JSON prompt for Imagen, the structure of SCHEMA_TEMPLATE."""
+
+    meta: Meta
+    camera: Camera
+    subject: Subject
+    character: Character
+    composition: Composition
+    setting: Setting
+    lighting: Lighting
+    style: Style
+    rendering: Rendering
+    colorPalette: ColorPalette
+
+
+# With structured output the schema travels in the config, not the prompt.
+PROMPT_TEMPLATE = """Convert the attached user idea into a detailed JSON object for generating an image.
+
+Idea: "{idea}"
+"""
+
+# The examples of the field descriptions are cut off, see schema_slim.
+SCHEMA_VERBOSITY = "short"
+
+
+# Ideas at least this similar to an expanded one, with the same content
+# words, reuse its prompt as it is. Ideas at least ADAPT_SIMILARITY similar
+# have it adapted by a faster model, which is off by default: see idea_index,
+# rewordings of an idea are typically 0.4 to 0.6 similar, but so are (or
+# more) the same sentences about another subject, whose prompts would then
+# be adapted from the wrong one.
+REUSE_SIMILARITY = 0.9
+ADAPT_SIMILARITY: Optional[float] = None
+
+ADAPT_TEMPLATE = """Here is a detailed JSON object for generating an image of the idea "{similar}":
+
+{prompt}
+
+Adapt it to the idea "{idea}". Change only what differs between the two ideas and keep everything else.
+"""
+
+
+def _json_config(schema_verbosity: Optional[str] = None):
+    return genai.types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_json_schema=json_schema(
+            ImagePrompt, schema_verbosity or SCHEMA_VERBOSITY
+        ),
+    )
+
+
+def _json_request(
+    idea: str, structured: bool = True, schema_verbosity: Optional[str] = None
+) -> dict:
+    """Builds the generate_content arguments for the JSON prompt of an idea.
+
+    With `structured`, the schema is sent as `response_json_schema`, else
+    it is pasted into the prompt as SCHEMA_TEMPLATE.
+    """
+    if not structured:
+        return dict(model="gemini-2.5-pro", contents=SCHEMA_TEMPLATE.format(idea=idea))
+    return dict(
         model="gemini-2.5-pro",
-        contents=prompt,
+        contents=PROMPT_TEMPLATE.format(idea=idea),
+        config=_json_config(schema_verbosity),
+    )
+
+
+def _adapt_request(
+    idea: str, match: Match, schema_verbosity: Optional[str] = None
+) -> dict:
+    """Builds the generate_content arguments to adapt the prompt of a similar idea."""
+    return dict(
+        model="gemini-2.5-flash",
+        contents=ADAPT_TEMPLATE.format(
+            similar=match.idea, prompt=match.prompt, idea=idea
+        ),
+        config=_json_config(schema_verbosity),
+    )
+
+
+def _index_mode(structured: bool, schema_verbosity: Optional[str]) -> str:
+    """The idea index mode of a prompt, prompts of two modes are never mixed."""
+    if not structured:
+        return "template"
+    return f"structured-{schema_verbosity or SCHEMA_VERBOSITY}"
+
+
+def _lookup_json(
+    idea: str, bypass_cache: bool, structured: bool, schema_verbosity: Optional[str]
+) -> Optional[Match]:
+    """The most similar indexed idea, if it is similar enough to be used.
+
+    It may still be being expanded (see `Match.pending`), then the caller
+    waits for it rather than expanding a rewording of it at the same time.
+    """
+    if bypass_cache:
+        return None
+    match = idea_index.nearest(idea, _index_mode(structured, schema_verbosity))
+    if match is None or not (_reusable(idea, match) or _adaptable(match, structured)):
+        return None
+    if match.pending is not None:
+        tracing.annotate(waited=match.idea)
+    return match
+
+
+def _reusable(idea: str, match: Match) -> bool:
+    same_words = content_words(match.idea) == content_words(idea)
+    return match.similarity >= REUSE_SIMILARITY and same_words
+
+
+def _adaptable(match: Match, structured: bool) -> bool:
+    # Prompts are only adapted with structured output.
+    return (
+        structured
+        and ADAPT_SIMILARITY is not None
+        and match.similarity >= ADAPT_SIMILARITY
+    )
+
+
+def _plan_json(
+    idea: str,
+    match: Optional[Match],
+    structured: bool,
+    schema_verbosity: Optional[str],
+    waited: float = 0.0,
+) -> tuple[Optional[ImagePrompt], Optional[Match], dict]:
+    """Decides whether the prompt of a similar idea is reused, adapted or not used.
+
+    Unless it is reused, the idea is marked as being expanded in the index,
+    see `_index_json`. `waited` is how long the similar idea was waited for.
+
+    Returns:
+        The reused prompt (or None), the similar idea to adapt (or None) and
+        the request to make if nothing is reused.
+    """
+    if match is not None and _reusable(idea, match):
+        tracing.annotate(reused=match.idea, similarity=round(match.similarity, 2))
+        idea_index.record("reused", match.seconds - waited)
+        return ImagePrompt.model_validate_json(match.prompt), None, {}
+    idea_index.expanding(idea, _index_mode(structured, schema_verbosity))
+    if match is not None and _adaptable(match, structured):
+        tracing.annotate(adapted=match.idea, similarity=round(match.similarity, 2))
+        return None, match, _adapt_request(idea, match, schema_verbosity)
+    return None, None, _json_request(idea, structured, schema_verbosity)
+
+
+def _index_json(
+    idea: str,
+    prompt: Optional[ImagePrompt],
+    adapted: Optional[Match],
+    seconds: float,
+    mode: str,
+    waited: float = 0.0,
+) -> None:
+    """Records a new prompt in the idea index, or that there is none (None)."""
+    if prompt is None:
+        idea_index.discard(idea, mode)
+        return
+    if adapted is not None:
+        idea_index.record("adapted", adapted.seconds - seconds - waited)
+        # Reusing it later saves as much as reusing the original.
+        seconds = adapted.seconds
+    else:
+        idea_index.record("expanded")
+    idea_index.add(idea, prompt.model_dump_json(exclude_none=True), seconds, mode)
+
+
+@tracing.traced("generate_json_from_idea")
+def generate_json_from_idea(
+    idea: str,
+    bypass_cache: bool = False,
+    structured: bool = True,
+    schema_verbosity: Optional[str] = None,
+) -> ImagePrompt:
+    """Generates a detailed JSON prompt from a simple idea using a Gemini model.
+
+    Responses are cached on disk, pass `bypass_cache=True` to force a new one.
+    The prompts of near-identical ideas are reused, and those of similar
+    ideas adapted if ADAPT_SIMILARITY is set, see REUSE_SIMILARITY and
+    `idea_index`. If the similar idea
+    is still being expanded, e.g. by `generate_all_async`, its prompt is
+    waited for.
+
+    Args:
+        idea: The idea for the image.
+        bypass_cache: If True, always call the model and ignore similar ideas.
+        structured: If True, request structured output with the ImagePrompt
+            schema, else paste SCHEMA_TEMPLATE into the prompt.
+        schema_verbosity: The verbosity of the structured output schema
+            ("full", "short" or "types"), defaults to SCHEMA_VERBOSITY.
+
+    Returns:
+        The validated prompt.
+
+    Raises:
+        ValidationError: If the response does not match ImagePrompt, even
+            after cutting off a code fence. It is not cached.
+    """
+    match = _lookup_json(idea, bypass_cache, structured, schema_verbosity)
+    waited = time.perf_counter()
+    if match is not None:
+        match = match.wait()
+    waited = time.perf_counter() - waited
+    reused, match, request = _plan_json(
+        idea, match, structured, schema_verbosity, waited
+    )
+    if reused is not None:
+        return reused
+    start, prompt = time.perf_counter(), None
+    try:
+        text = response_cache.generate_text(
+            client,
+            **request,
+            bypass=bypass_cache,
+            validate=partial(structured_output.parse, ImagePrompt),
+        )
+        prompt = structured_output.parse(ImagePrompt, text)
+    finally:
+        _index_json(
+            idea,
+            prompt,
+            match,
+            time.perf_counter() - start,
+            _index_mode(structured, schema_verbosity),
+            waited,
+        )
+    return prompt
+
+
+@tracing.traced("generate_json_from_idea")
+async def generate_json_from_idea_async(
+    idea: str,
+    bypass_cache: bool = False,
+    structured: bool = True,
+    schema_verbosity: Optional[str] = None,
+) -> ImagePrompt:
+    """Async version of `generate_json_from_idea`, with `client.aio`."""
+    match = _lookup_json(idea, bypass_cache, structured, schema_verbosity)
+    waited = time.perf_counter()
+    if match is not None:
+        match = await match.wait_async()
+    waited = time.perf_counter() - waited
+    reused, match, request = _plan_json(
+        idea, match, structured, schema_verbosity, waited
+    )
+    if reused is not None:
+        return reused
+    start, prompt = time.perf_counter(), None
+    try:
+        text = await response_cache.generate_text_async(
+            client,
+            **request,
+            bypass=bypass_cache,
+            validate=partial(structured_output.parse, ImagePrompt),
+        )
+        prompt = structured_output.parse(ImagePrompt, text)
+    finally:
+        _index_json(
+            idea,
+            prompt,
+            match,
+            time.perf_counter() - start,
+            _index_mode(structured, schema_verbosity),
+            waited,
+        )
+    return prompt
+
+
+def generate_json_from_ideas_batch(
+    ideas: list[str],
+    bypass_cache: bool = False,
+    structured: bool = True,
+    schema_verbosity: Optional[str] = None,
+    **options,
+) -> list[Optional[ImagePrompt]]:
+    """Generates the JSON prompts of many ideas with Gemini Batch API jobs.
+
+    Meant for catalog runs, where half the price matters more than a
+    turnaround of minutes to hours. Ideas in the response cache are not
+    submitted, and the new prompts are stored there, so `generate` picks
+    them up without another call. See `batch_jobs`.
+
+    Args:
+        ideas: The ideas for the images.
+        bypass_cache: If True, submit every idea, even if it is cached.
+        structured: See `generate_json_from_idea`.
+        schema_verbosity: See `generate_json_from_idea`.
+        **options: Passed on to `batch_jobs.run`, e.g. `source="file"`,
+            `max_attempts` or the `poll` intervals.
+
+    Returns:
+        The prompt of every idea, in order, None where it failed.
+    """
+    results = batch_jobs.generate_texts(
+        client,
+        {
+            f"idea-{n}": _json_request(idea, structured, schema_verbosity)
+            for n, idea in enumerate(ideas)
+        },
+        cache=response_cache,
+        bypass=bypass_cache,
+        validate=partial(structured_output.parse, ImagePrompt),
+        display_name="image-prompts",
+        **options,
+    )
+    return [
+        structured_output.parse(ImagePrompt, result.text) if result.ok else None
+        for result in results.values()
+    ]
+
+
+def _images_request(prompt: str, aspectRatio: str, num_images: int) -> dict:
+    return dict(
+        model="imagen-4.0-generate-preview-06-06",
+        prompt=prompt,
+        config=genai.types.GenerateImagesConfig(
+            number_of_images=num_images,
+            aspect_ratio=aspectRatio,
+        ),
+    )
+
+
+def _save_images(idea: str, prompt: str, response, output_dir: str) -> None:
+    """Saves the generated images and the prompt they were generated from.
+
+    The files are written by `artifact_writer` in the background, so the next
+    request does not wait for them. `artifact_writer.flush()` does.
+    """
+    clean_idea = re.sub(r"[^a-zA-Z0-9\s]", "", idea[:30]).lower().replace(" ", "-")
+    artifact_writer.write(
+        os.path.join(output_dir, f"{clean_idea}.json"), prompt.encode("utf-8")
     )
+    for i, generated_image in enumerate(response.generated_images):
+        image_path = os.path.join(output_dir, f"{clean_idea}-{i+1}.png")
+        written = artifact_writer.write_image(
+            image_path, generated_image.image.image_bytes
+        )
+        written.add_done_callback(_report_saved)
 
-    return response.text
+
+def _report_saved(written: Future) -> None:
+    if written.exception() is None:
+        print(f"Saved image and prompt to {written.result()}")
 
 
 def generate_images(
@@ -94,23 +605,33 @@ def generate_images(
 
     try:
         response = client.models.generate_images(
-            model="imagen-4.0-generate-preview-06-06",
-            prompt=prompt,
-            config=genai.types.GenerateImagesConfig(
-                number_of_images=num_images,
-                aspect_ratio=aspectRatio,
-            ),
+            **_images_request(prompt, aspectRatio, num_images)
         )
+        _save_images(idea, prompt, response, output_dir)
 
-        for i, generated_image in enumerate(response.generated_images):
-            clean_idea = (
-                re.sub(r"[^a-zA-Z0-9\s]", "", idea[:30]).lower().replace(" ", "-")
-            )
-            image_path = os.path.join(output_dir, f"{clean_idea}-{i+1}.png")
-            generated_image.image.save(image_path)
-            with open(os.path.join(output_dir, f"{clean_idea}.json"), "w") as f:
-                f.write(prompt)
-            print(f"Saved image and prompt to {image_path}")
+    except Exception as e:
+        print(f"An error occurred during image generation: {e}")
+
+
+async def generate_images_async(
+    idea: str,
+    prompt: str,
+    aspectRatio: str = "1:1",
+    output_dir: str = "images",
+    num_images: int = 1,
+):
+    """Async version of `generate_images`.
+
+    Scheduling the writes blocks while the writer's queue is full, so it
+    happens off the loop.
+    """
+    print(f"Generating {num_images} images for {idea}")
+
+    try:
+        response = await client.aio.models.generate_images(
+            **_images_request(prompt, aspectRatio, num_images)
+        )
+        await asyncio.to_thread(_save_images, idea, prompt, response, output_dir)
 
     except Exception as e:
         print(f"An error occurred during image generation: {e}")
@@ -122,33 +643,88 @@ def generate(
     aspectRatio: str = "1:1",
     num_images: int = 2,
 ):
-    """Orchestrates the process of generating JSON and then generating images."""
+    """Orchestrates the process of generating JSON and then generating images.
+
+    The files are still being written when it returns, see `_save_images`.
+    """
     os.makedirs(output_dir, exist_ok=True)
 
     prompt_data = generate_json_from_idea(idea)
 
     generate_images(
         idea=idea,
-        prompt=prompt_data,
+        prompt=prompt_data.model_dump_json(indent=4, exclude_none=True),
         aspectRatio="3:4",
         output_dir=output_dir,
         num_images=num_images,
     )
 
 
+async def generate_all_async(
+    ideas: list[str],
+    output_dir: str = "images",
+    num_images: int = 2,
+    max_expansions: int = 10,
+    max_renders: int = 10,
+) -> None:
+    """Runs `generate` for many ideas at once on the async client.
+
+    Prompt expansion and image generation have their own semaphores, so
+    Gemini calls for later ideas overlap with Imagen calls for earlier ones,
+    and each idea's images are saved as soon as they arrive. An idea that
+    fails is reported and skipped, the others carry on.
+
+    Args:
+        ideas: The ideas to generate images for.
+        output_dir: The directory to save the images and prompts.
+        num_images: The number of images per idea.
+        max_expansions: The maximum number of Gemini calls at once.
+        max_renders: The maximum number of Imagen calls at once.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    expansions = asyncio.Semaphore(max_expansions)
+    renders = asyncio.Semaphore(max_renders)
+
+    async def run(idea: str) -> None:
+        # One failing idea must not cancel the others, as in `generate_images`.
+        try:
+            async with expansions:
+                prompt_data = await generate_json_from_idea_async(idea)
+        except Exception as e:
+            print(f"An error occurred during prompt generation for {idea}: {e}")
+            return
+        async with renders:
+            await generate_images_async(
+                idea=idea,
+                prompt=prompt_data.model_dump_json(indent=4, exclude_none=True),
+                aspectRatio="3:4",
+                output_dir=output_dir,
+                num_images=num_images,
+            )
+
+    try:
+        await asyncio.gather(*(run(idea) for idea in ideas))
+    finally:
+        # The images of the ideas that got this far.
+        await asyncio.to_thread(artifact_writer.flush)
+
+
+IDEAS = [
+    "A energy drink with water drops on it, ultra realistic, for a commercial.",
+    "Graffiti with the text 'JSON Schema' on a brick wall.",
+    "A LEGO knight fighting a huge, fire-breathing dragon on a castle wall.",
+    "A stylish woman sipping coffee at a Parisian cafe, with the Eiffel Tower in the background. Shot in golden hour.",
+    "An emotional, close-up portrait of an old fisherman.",
+    "A vast, alien landscape on a distant planet with two suns, strange, towering rock formations, and bioluminescent plants. Epic sci-fi concept art.",
+    "A whimsical illustration of a friendly fox reading a book in a cozy, cluttered library. The text 'The Midnight Reader' should be subtly integrated on a book spine.",
+    "A magical man with sparkling pink hair and large from an anime.",
+    "A cartoon robot waving happily, with a simple, bold outline and bright, flat colors. ",
+    "A full-body character sheet of a realistic pirate captain, showing front, back, and side views.",
+]
+
+
 if __name__ == "__main__":
-    ideas = [
-        "A energy drink with water drops on it, ultra realistic, for a commercial.",
-        "Graffiti with the text 'JSON Schema' on a brick wall.",
-        "A LEGO knight fighting a huge, fire-breathing dragon on a castle wall.",
-        "A stylish woman sipping coffee at a Parisian cafe, with the Eiffel Tower in the background. Shot in golden hour.",
-        "An emotional, close-up portrait of an old fisherman.",
-        "A vast, alien landscape on a distant planet with two suns, strange, towering rock formations, and bioluminescent plants. Epic sci-fi concept art.",
-        "A whimsical illustration of a friendly fox reading a book in a cozy, cluttered library. The text 'The Midnight Reader' should be subtly integrated on a book spine.",
-        "A magical man with sparkling pink hair and large from an anime.",
-        "A cartoon robot waving happily, with a simple, bold outline and bright, flat colors. ",
-        "A full-body character sheet of a realistic pirate captain, showing front, back, and side views.",
-    ]
+    asyncio.run(generate_all_async(IDEAS))
 
-    for idea in ideas:
-        generate(idea=idea)
+    print(f"Response cache: {response_cache.stats}")
+    print(f"Similar ideas: {idea_index.stats}")
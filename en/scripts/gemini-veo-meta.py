@@ -17,18 +17,42 @@ Then, run the script from your terminal:
 
 # pip install pillow google-genai pydantic moviepy
 
-from io import BytesIO
-import json
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+import contextvars
+from functools import partial
 import os
 import re
 import time
 from google import genai
 from google.genai import types
 from pydantic import BaseModel
-from moviepy import VideoFileClip, concatenate_videoclips
-from PIL import Image
 import logging
 
+import audio_ingest
+import batch_jobs
+import video_merge
+import video_preview
+from artifact_store import ArtifactStore
+from artifacts import ArtifactWriter
+from hedging import HedgePolicy, LatencyHistogram, hedged, hedged_async, hedged_call
+from json_stream import ArrayItemStream
+from operation_poller import OperationPoller
+from rate_limit import RateLimitedClient
+from response_cache import ResponseCache
+from scene_prompt import scene_prompt
+from schema_slim import json_schema
+import structured_output
+import tracing
+from video_download import (
+    DownloadError,
+    DownloadResult,
+    download_video,
+    generated_videos,
+)
+from vlog_manifest import VlogManifest
+
 # Configure logging to show info from this script, and warnings from others.
 logging.basicConfig(
     level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -39,10 +63,10 @@ logger.setLevel(logging.INFO)
 client = genai.Client()
 
 import pydantic
-from typing import List, Optional
+from typing import Any, Iterator, List, Optional
 
 # Basic types for validation
-from pydantic import BaseModel, Field, AnyUrl
+from pydantic import BaseModel, Field, AnyUrl, ValidationError
 
 
 class Shot(BaseModel):
@@ -297,37 +321,159 @@ class VideoSchema(BaseModel):
     )
     clips: List[Clip] = Field(
         ...,
+        min_length=1,
         description="An array containing definitions for each individual video segment or shot.",
     )
 
 
-client = genai.Client()
-
-
+client = RateLimitedClient(genai.Client())
+# How scene prompts are serialized: "json" (minified), "yaml" or "legacy"
+# (the full script JSON), see scene_prompt.ENCODINGS.
+PROMPT_ENCODING = "json"
+# How much of VideoSchema goes out with generate_scenes: "full", "short"
+# (descriptions without examples) or "types", see schema_slim.
+SCHEMA_VERBOSITY = "full"
+# One poller tracks every pending Veo operation of this process.
+poller = OperationPoller(client)
+response_cache = ResponseCache()
+# Generated images and videos, reused across runs and vlog directories.
+artifact_store = ArtifactStore()
+artifact_writer = ArtifactWriter()
+# Sends Veo and image requests that take longer than the p90 of earlier ones a
+# second time, see hedging. Off by default, the latencies are recorded anyway.
+hedge_policy = HedgePolicy(LatencyHistogram(), enabled=False)
+# Renders the proxy previews of generate_vlog(preview=True) next to the merge.
+preview_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview")
+# Fetches and converts the audio tracks of generate_vlog(ingest_audio=True).
+audio_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="audio")
+
+
+@tracing.traced("generate_scenes")
 def generate_scenes(
     idea: str,
     output_dir: str,
     number_of_scenes: int,
-) -> list[Scene]:
+    bypass_cache: bool = False,
+    schema_verbosity: Optional[str] = None,
+    max_attempts: int = 3,
+) -> VideoSchema:
     """Generates scene descriptions for a video based on an idea.
 
+    The response is validated against VideoSchema before anything else
+    happens with it. Output that does not validate, even after a cheap
+    repair (see `structured_output.parse`), is requested again with the
+    validation errors attached, so a malformed script never reaches the
+    costly image and video stages.
+
     Args:
         idea: The core concept or topic of the video.
-        character_description: A visual description of the main character.
-        character_characteristics: The personality traits of the character.
-        number_of_scenes: The number of scenes to generate.
-        video_type: The type of video (e.g., 'vlog', 'commercial').
-        video_characteristics: The overall style of the video.
-        camera_angle: The primary camera perspective.
         output_dir: The directory to save the generated scene descriptions.
+        number_of_scenes: The number of scenes to generate.
+        bypass_cache: If True, ignore the response cache and call the model.
+        schema_verbosity: How much of VideoSchema is sent as response schema
+            ("full", "short" or "types"), defaults to SCHEMA_VERBOSITY.
+        max_attempts: How often the script is requested before giving up.
 
     Returns:
-        A list of Scene objects, each containing a description for a scene.
+        The validated script, with at most `number_of_scenes` clips.
     """
     os.makedirs(output_dir, exist_ok=True)
     logger.info(f"Generating {number_of_scenes} scenes for the idea: '{idea}'")
 
-    response = client.models.generate_content(
+    request = _scenes_request(idea, number_of_scenes, schema_verbosity)
+    for attempt in range(1, max_attempts + 1):
+        try:
+            # The config carries the schema, so schema changes invalidate
+            # cached scripts as well. Invalid responses are not cached.
+            text = response_cache.generate_text(
+                client,
+                **request,
+                bypass=bypass_cache,
+                validate=partial(structured_output.parse, VideoSchema),
+            )
+            script = structured_output.parse(VideoSchema, text)
+            break
+        except ValidationError as e:
+            errors = structured_output.feedback(e)
+            tracing.annotate(rejected=attempt)
+            # Each scene costs a video, and all but the first an image edit.
+            logger.warning(
+                f"Invalid script (attempt {attempt}/{max_attempts}), rejected "
+                f"before {2 * number_of_scenes} image and video requests: {errors}"
+            )
+            if attempt == max_attempts:
+                raise
+            request[
+                "contents"
+            ] += f"\nYour previous answer did not match the schema: {errors}\n"
+
+    if len(script.clips) > number_of_scenes:
+        logger.warning(
+            f"Dropping {len(script.clips) - number_of_scenes} clips beyond "
+            f"the requested {number_of_scenes}"
+        )
+        script.clips = script.clips[:number_of_scenes]
+
+    text = script.model_dump_json(exclude_unset=True)
+    tracing.annotate(bytes=len(text))
+    with open(os.path.join(output_dir, "script.json"), "w") as f:
+        f.write(text)
+
+    return script
+
+
+def generate_scenes_batch(
+    ideas: list[tuple[str, int]],
+    bypass_cache: bool = False,
+    schema_verbosity: Optional[str] = None,
+    **options,
+) -> list[Optional[VideoSchema]]:
+    """Generates the scripts of many videos with Gemini Batch API jobs.
+
+    Meant for overnight catalog runs, where half the price matters more than
+    a turnaround of minutes to hours. Ideas in the response cache are not
+    submitted, and the new scripts are stored there under the key of
+    `generate_scenes`, so `generate_vlog` picks them up without another
+    call. Entries that fail or do not validate are resubmitted on their
+    own, see `batch_jobs`.
+
+    Args:
+        ideas: The idea and number of scenes of every video.
+        bypass_cache: If True, submit every idea, even if it is cached.
+        schema_verbosity: See `generate_scenes`.
+        **options: Passed on to `batch_jobs.run`, e.g. `source="file"`,
+            `max_attempts` or the `poll` intervals.
+
+    Returns:
+        The validated script of every idea, in order, None where it failed.
+    """
+    results = batch_jobs.generate_texts(
+        client,
+        {
+            f"idea-{n}": _scenes_request(idea, number_of_scenes, schema_verbosity)
+            for n, (idea, number_of_scenes) in enumerate(ideas)
+        },
+        cache=response_cache,
+        bypass=bypass_cache,
+        validate=partial(structured_output.parse, VideoSchema),
+        display_name="vlog-scripts",
+        **options,
+    )
+    scripts = []
+    for (_, number_of_scenes), result in zip(ideas, results.values()):
+        script = None
+        if result.ok:
+            script = structured_output.parse(VideoSchema, result.text)
+            script.clips = script.clips[:number_of_scenes]
+        scripts.append(script)
+    return scripts
+
+
+def _scenes_request(
+    idea: str, number_of_scenes: int, schema_verbosity: Optional[str] = None
+) -> dict:
+    """Builds the generate_content arguments for the script of a video."""
+    return dict(
         model="gemini-2.5-pro",
         contents=f"""
         {idea}
@@ -335,30 +481,123 @@ def generate_scenes(
         """,
         config=genai.types.GenerateContentConfig(
             response_mime_type="application/json",
-            response_json_schema=VideoSchema.model_json_schema(),
+            response_json_schema=json_schema(
+                VideoSchema, schema_verbosity or SCHEMA_VERBOSITY
+            ),
         ),
     )
 
-    video_schema = json.loads(response.text)
 
+def generate_scenes_stream(
+    idea: str,
+    output_dir: str,
+    number_of_scenes: int,
+    bypass_cache: bool = False,
+    schema_verbosity: Optional[str] = None,
+) -> Iterator[tuple[str, Optional[int], Any]]:
+    """Streams the script of `generate_scenes`, one character or clip at a time.
+
+    Shares the response cache with `generate_scenes`. Every item is validated
+    as soon as it is complete, and the complete script is validated and
+    written to `script.json` once the stream has ended. A stream cannot be
+    repaired or requested again half-way, so invalid output is raised.
+
+    Args:
+        idea: The core concept or topic of the video.
+        output_dir: The directory to save the script.
+        number_of_scenes: The number of scenes to generate.
+        bypass_cache: If True, ignore the response cache and call the model.
+        schema_verbosity: How much of VideoSchema is sent as response schema.
+
+    Yields:
+        ("clips", n, clip) with a `Clip` as soon as clip n is complete, and
+        ("characters", None, characters) with the `CharacterProfile` list
+        once all characters are. Clips beyond `number_of_scenes` are dropped.
+
+    Raises:
+        ValidationError: If an item or the complete script is invalid.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    logger.info(f"Streaming {number_of_scenes} scenes for the idea: '{idea}'")
+
+    parser = ArrayItemStream()
+    for chunk in response_cache.generate_text_stream(
+        client,
+        **_scenes_request(idea, number_of_scenes, schema_verbosity),
+        bypass=bypass_cache,
+        validate=partial(structured_output.parse, VideoSchema),
+    ):
+        for key, index, value in parser.feed(chunk):
+            if key == "characters" and index is None:
+                characters = structured_output.type_adapter(List[CharacterProfile])
+                yield key, index, characters.validate_python(value)
+            elif key == "clips" and index is not None and index < number_of_scenes:
+                yield key, index, Clip.model_validate(value)
+
+    script = structured_output.parse(VideoSchema, parser.text)
+    script.clips = script.clips[:number_of_scenes]
+    text = script.model_dump_json(exclude_unset=True)
+    tracing.annotate(bytes=len(text))
     with open(os.path.join(output_dir, "script.json"), "w") as f:
-        f.write(response.text)
+        f.write(text)
 
-    return video_schema
+
+def _generate_video_request(prompt: str, image: types.Image) -> dict:
+    """Builds the generate_videos arguments for a scene."""
+    return dict(
+        model="veo-3.0-generate-preview",
+        prompt=prompt,
+        image=image,
+        config=genai.types.GenerateVideosConfig(
+            aspect_ratio="16:9",  # currently only 16:9 is supported
+            # person_generation="allow_all",
+        ),
+    )
 
 
+def _trace_veo_wait(future, submitted: float) -> None:
+    """Records how long a Veo job was pending and how late it was noticed.
+
+    The API does not tell queueing and rendering apart, so `veo_pending`
+    covers both, `veo_poll_lag` is the time lost to the polling interval.
+    """
+    tracer = tracing.current_tracer()
+    if tracer is None:
+        return
+    timings = future.timings
+    tracer.record(
+        "veo_pending", submitted, timings["pending_seconds"], polls=timings["polls"]
+    )
+    tracer.record(
+        "veo_poll_lag",
+        submitted + timings["pending_seconds"],
+        timings["poll_lag_seconds"],
+    )
+
+
+def _download_video(video: types.Video, path: str) -> DownloadResult:
+    with tracing.span("download") as span:
+        result = download_video(video, path)
+        span.set(bytes=result.size)
+        return result
+
+
+@tracing.traced("generate_video")
 def generate_video(
     prompt: str,
-    image: Image,
+    image: types.Image,
     aspect_ratio: str = "16:9",
     output_dir: str = "videos",
     fname: str = "video.mp4",
 ) -> str:
     """Generates a single video clip from a text prompt.
 
+    A clip rendered before for the same prompt, image and config is taken
+    from the artifact store instead of starting a Veo job.
+
     Args:
         prompt: The text prompt describing the video content.
-        negative_prompt: A description of what to avoid in the video.
+        image: The starting image for the video.
         aspect_ratio: The aspect ratio of the video (e.g., "16:9").
         output_dir: The directory to save the generated video file.
         fname: The filename for the saved video.
@@ -371,71 +610,143 @@ def generate_video(
 
     # Generate video
     logger.info(f"Generating video in {aspect_ratio} from prompt: {prompt[:100]}...")
-    operation = client.models.generate_videos(
-        model="veo-3.0-generate-preview",
-        prompt=prompt,
-        image=image,
-        config=genai.types.GenerateVideosConfig(
-            aspect_ratio="16:9",  # currently only 16:9 is supported
-            # person_generation="allow_all",
-        ),
-    )
+    tracing.annotate(fname=fname, prompt_chars=len(prompt))
+    request = _generate_video_request(prompt, image)
+    key = artifact_store.key(**request)
+    if artifact_store.materialize(key, os.path.join(output_dir, fname)):
+        return os.path.join(output_dir, fname)
+
+    def submit():
+        with tracing.span("veo_submit"):
+            operation = client.models.generate_videos(**request)
+        future = poller.submit(operation)
+        future.submitted = time.time()
+        return future
+
     # Wait for videos to generate
-    while not operation.done:
-        logger.info("Waiting for video to generate...")
-        time.sleep(10)
-        operation = client.operations.get(operation)
+    logger.info("Waiting for video to generate...")
+    future = hedged(hedge_policy, f"generate_videos:{request['model']}", submit)
+    operation = future.result()
+    _trace_veo_wait(future, future.submitted)
 
-    if operation.response.generated_videos is None:
-        raise RuntimeError(operation.response)
+    for video in generated_videos(operation):
+        result = _download_video(video.video, os.path.join(output_dir, fname))
+    artifact_store.put_file(key, result.path, "video/mp4", digest=result.sha256)
+
+    return os.path.join(output_dir, fname)
 
-    for video in operation.response.generated_videos:
-        client.files.download(file=video.video)
-        video.video.save(os.path.join(output_dir, fname))
+
+@tracing.traced("generate_video")
+async def generate_video_async(
+    prompt: str,
+    image: types.Image,
+    aspect_ratio: str = "16:9",
+    output_dir: str = "videos",
+    fname: str = "video.mp4",
+) -> str:
+    """Generates a single video clip from a text prompt using the async client.
+
+    Same as `generate_video`, but waiting for the operation does not block
+    other scenes from being submitted and polled.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    logger.info(f"Generating video in {aspect_ratio} from prompt: {prompt[:100]}...")
+    tracing.annotate(fname=fname, prompt_chars=len(prompt))
+    request = _generate_video_request(prompt, image)
+    key = artifact_store.key(**request)
+    if artifact_store.materialize(key, os.path.join(output_dir, fname)):
+        return os.path.join(output_dir, fname)
+
+    async def submit():
+        with tracing.span("veo_submit"):
+            operation = await client.aio.models.generate_videos(**request)
+        submitted = time.time()
+        future = poller.submit(operation)
+        # Cancelling this task cancels the future, which stops its polling.
+        return await asyncio.wrap_future(future), future, submitted
+
+    logger.info(f"Waiting for video {fname} to generate...")
+    operation, future, submitted = await hedged_async(
+        hedge_policy, f"generate_videos:{request['model']}", submit
+    )
+    _trace_veo_wait(future, submitted)
+
+    for video in generated_videos(operation):
+        result = await asyncio.to_thread(
+            _download_video, video.video, os.path.join(output_dir, fname)
+        )
+    artifact_store.put_file(key, result.path, "video/mp4", digest=result.sha256)
 
     return os.path.join(output_dir, fname)
 
 
+@tracing.traced("generate_image")
 def generate_image(
     prompt: str,
     output_dir: str = "images",
     fname: str = "image.png",
-) -> Image:
-    """Generates an image from a text prompt."""
+) -> types.Image:
+    """Generates an image from a text prompt.
+
+    The image is returned in memory, writing it to `output_dir` happens in
+    the background. The same request made before is answered from the
+    artifact store.
+    """
     os.makedirs(output_dir, exist_ok=True)
     logger.info(f"Generating image with prompt: {prompt[:100]}...")
 
-    image = client.models.generate_images(
+    request = dict(
         model="imagen-3.0-generate-002",
         prompt=prompt,
         config=genai.types.GenerateImagesConfig(
             aspect_ratio="16:9",
         ),
     )
+    key = artifact_store.key(**request)
+    stored_image = _stored_image(key, output_dir, fname)
+    if stored_image is not None:
+        return stored_image
+
+    image = hedged_call(
+        hedge_policy,
+        f"generate_images:{request['model']}",
+        partial(client.models.generate_images, **request),
+    )
 
-    image.generated_images[0].image.save(os.path.join(output_dir, fname))
+    generated_image = image.generated_images[0].image
+    tracing.annotate(bytes=len(generated_image.image_bytes))
+    _write_image(key, generated_image, output_dir, fname)
 
-    return image.generated_images[0].image
+    return generated_image
 
 
-def edit_image(
-    image: Image,
-    prompt: str,
-    output_dir: str = "images",
-    fname: str = "edited_image.png",
-) -> types.Image:
-    """Edits an image with a text prompt."""
+def _stored_image(key: str, output_dir: str, fname: str) -> Optional[types.Image]:
+    """Places a stored image in `output_dir` and returns it, or None on a miss."""
+    path = os.path.join(output_dir, fname)
+    if not artifact_store.materialize(key, path):
+        return None
+    return types.Image.from_file(location=path)
 
-    prompt = f"Edit the image to fit the following prompt: {prompt}"
-    logger.info(f"Editing image with prompt: {prompt[:100]}...")
 
-    response = client.models.generate_content(
+def _write_image(key: str, image: types.Image, output_dir: str, fname: str) -> None:
+    """Writes an image in the background and adds it to the artifact store."""
+    path = os.path.join(output_dir, fname)
+    artifact_writer.write(path, image.image_bytes)
+    artifact_writer.when_written(
+        path, partial(artifact_store.put_file, key, path, image.mime_type)
+    )
+
+
+def _edit_image_request(image: types.Image, prompt: str) -> dict:
+    """Builds the generate_content arguments for an image edit."""
+    return dict(
         model="gemini-2.0-flash-preview-image-generation",
         contents=[
             {
                 "role": "user",
                 "parts": [
-                    {"text": prompt},
+                    {"text": f"Edit the image to fit the following prompt: {prompt}"},
                     {
                         "inline_data": {
                             "mime_type": image.mime_type,
@@ -450,18 +761,88 @@ def edit_image(
         ),
     )
 
+
+def _save_edited_image(
+    response: types.GenerateContentResponse, key: str, output_dir: str, fname: str
+) -> types.Image:
+    """Returns the image part of an edit response and saves it in the background."""
+    edited_image = None
     for part in response.candidates[0].content.parts:
         if part.text is not None:
             logger.info(part.text)
         elif part.inline_data is not None:
-            image = Image.open(BytesIO((part.inline_data.data)))
-            image.save(os.path.join(output_dir, fname))
+            # Hand the encoded bytes on as they are, no need to decode them.
+            edited_image = types.Image(
+                image_bytes=part.inline_data.data,
+                mime_type=part.inline_data.mime_type or "image/png",
+            )
+            _write_image(key, edited_image, output_dir, fname)
 
-    return types.Image.from_file(location=os.path.join(output_dir, fname))
+    if edited_image is None:
+        raise RuntimeError(f"The image edit returned no image: {response.text}")
+    tracing.annotate(bytes=len(edited_image.image_bytes))
+    return edited_image
 
 
+@tracing.traced("edit_image")
+def edit_image(
+    image: types.Image,
+    prompt: str,
+    output_dir: str = "images",
+    fname: str = "edited_image.png",
+) -> types.Image:
+    """Edits an image with a text prompt."""
+    logger.info(f"Editing image with prompt: {prompt[:100]}...")
+    tracing.annotate(prompt_chars=len(prompt))
+    request = _edit_image_request(image, prompt)
+    key = artifact_store.key(**request)
+    stored_image = _stored_image(key, output_dir, fname)
+    if stored_image is not None:
+        return stored_image
+
+    response = hedged_call(
+        hedge_policy,
+        f"edit_image:{request['model']}",
+        partial(client.models.generate_content, **request),
+    )
+    tracing.add_usage(response)
+
+    return _save_edited_image(response, key, output_dir, fname)
+
+
+@tracing.traced("edit_image")
+async def edit_image_async(
+    image: types.Image,
+    prompt: str,
+    output_dir: str = "images",
+    fname: str = "edited_image.png",
+) -> types.Image:
+    """Edits an image with a text prompt using the async client."""
+    logger.info(f"Editing image with prompt: {prompt[:100]}...")
+    tracing.annotate(prompt_chars=len(prompt))
+    request = _edit_image_request(image, prompt)
+    key = artifact_store.key(**request)
+    stored_image = _stored_image(key, output_dir, fname)
+    if stored_image is not None:
+        return stored_image
+
+    response = await hedged_async(
+        hedge_policy,
+        f"edit_image:{request['model']}",
+        partial(client.aio.models.generate_content, **request),
+    )
+    tracing.add_usage(response)
+
+    return _save_edited_image(response, key, output_dir, fname)
+
+
+@tracing.traced("merge_videos")
 def merge_videos(
-    video_files: list[str], output_file: str = "vlog.mp4", output_dir: str = "videos"
+    video_files: list[str],
+    output_file: str = "vlog.mp4",
+    output_dir: str = "videos",
+    normalizer: Optional[video_merge.ClipNormalizer] = None,
+    audio_files: Optional[list[Optional[str]]] = None,
 ) -> str:
     """Merges multiple video files into a single video.
 
@@ -469,27 +850,465 @@ def merge_videos(
         video_files: A list of paths to the video files to merge.
         output_file: The filename for the final merged video.
         output_dir: The directory to save the final video.
+        normalizer: The normalizer the videos were handed to as they were
+            rendered, see `video_merge.ClipNormalizer`.
+        audio_files: Per video, an audio file that replaces its audio, or
+            None to keep it, see `_scene_audio`.
 
     Returns:
         The file path of the merged video.
     """
     os.makedirs(output_dir, exist_ok=True)
     logger.info(f"Merging {len(video_files)} video files into {output_file}")
-    # Load each video clip
-    clips = [VideoFileClip(file) for file in video_files]
+    if audio_files and any(audio_files):
+        video_files = [
+            (
+                audio_ingest.mux(
+                    video, audio, f"{os.path.splitext(video)[0]}_audio.mp4"
+                )
+                if audio is not None
+                else video
+            )
+            for video, audio in zip(video_files, audio_files)
+        ]
+        # It probed the videos before their audio was replaced.
+        normalizer = None
+    # Stream copy when all clips share codec, resolution and frame rate,
+    # otherwise normalize them in parallel first.
+    output_path = video_merge.merge(
+        video_files, os.path.join(output_dir, output_file), normalizer=normalizer
+    )
+    tracing.annotate(bytes=os.path.getsize(output_path))
+    return output_path
 
-    # Concatenate the video clips
-    final_clip = concatenate_videoclips(clips)
 
-    # Write the final video file
-    output_path = os.path.join(output_dir, output_file)
-    final_clip.write_videofile(
-        output_path,
-        codec="libx264",
-        audio_codec="aac",
+@tracing.traced("ingest_audio")
+def _scene_audio(
+    script: VideoSchema, n: int, output_dir: str, manifest: VlogManifest
+) -> Optional[str]:
+    """Fetches the audio track of scene `n` and converts it for its video.
+
+    Returns:
+        The converted WAV file, or None if the clip has no audio of its own
+        or it could not be fetched or decoded, in which case the video keeps
+        the audio Veo generated.
+    """
+    track = script.clips[n].audio_track
+    if not (track.audio_base64 or track.wave_download_url):
+        return None
+    stage = f"scene_{n}_audio"
+    inputs_hash = manifest.hash(
+        track.audio_base64,
+        str(track.wave_download_url),
+        track.format,
+        track.sample_rate_hz,
+        track.channels,
     )
+    audio_path = manifest.completed(stage, inputs_hash)
+    if audio_path is not None:
+        return audio_path
+    try:
+        audio_path = audio_ingest.ingest(
+            track, os.path.join(output_dir, f"scene_{n}_audio")
+        )
+    except (audio_ingest.AudioIngestError, DownloadError) as e:
+        manifest.fail(stage, inputs_hash, e)
+        logger.warning(f"Keeping the generated audio of scene {n + 1}: {e}")
+        return None
+    manifest.complete(stage, inputs_hash, audio_path)
+    return audio_path
+
+
+def _ingest_audio(
+    script: VideoSchema, output_dir: str, manifest: VlogManifest
+) -> list[Future]:
+    """Starts ingesting the audio tracks of all scenes in the background."""
+    return [
+        audio_executor.submit(
+            contextvars.copy_context().run,
+            _scene_audio,
+            script,
+            n,
+            output_dir,
+            manifest,
+        )
+        for n in range(len(script.clips))
+    ]
+
+
+def _scene_prompt(script: VideoSchema, n: int) -> str:
+    """Returns the prompt for scene `n`: its characters plus that single clip.
+
+    Null fields, audio/clip fields left at their defaults and characters the
+    clip does not mention are left out, see `scene_prompt`.
+    """
+    return scene_prompt(
+        script,
+        n,
+        encoding=PROMPT_ENCODING,
+        clip_model=Clip,
+        drop_defaults=(Clip, AudioTrack, Performance),
+    )
+
+
+def render_scene(
+    script: VideoSchema,
+    n: int,
+    start_image: types.Image,
+    output_dir: str,
+    manifest: VlogManifest,
+    aspect_ratio: str = "16:9",
+    max_attempts: int = 3,
+) -> str:
+    """Edits the start image for scene `n` and renders its video.
 
-    return os.path.join(output_dir, output_file)
+    Stages already recorded in the manifest with matching inputs are reused,
+    and a failing scene is retried on its own up to `max_attempts` times.
+
+    Returns:
+        The file path of the scene's video.
+    """
+    prompt = _scene_prompt(script, n)
+    for attempt in range(1, max_attempts + 1):
+        stage, inputs_hash = None, None
+        try:
+            scene_image = start_image
+            if n > 0:
+                stage = f"scene_{n}_image"
+                inputs_hash = manifest.hash(prompt, start_image.image_bytes)
+                image_path = manifest.completed(stage, inputs_hash)
+                if image_path is not None:
+                    scene_image = types.Image.from_file(location=image_path)
+                else:
+                    logger.info(f"Editing image for scene {n + 1}")
+                    scene_image = edit_image(
+                        image=start_image,
+                        prompt=prompt,
+                        output_dir=output_dir,
+                        fname=f"scene_{n}_image.png",
+                    )
+                    # The edited image is still being written in the background.
+                    image_path = os.path.join(output_dir, f"scene_{n}_image.png")
+                    artifact_writer.when_written(
+                        image_path,
+                        partial(manifest.complete, stage, inputs_hash, image_path),
+                    )
+
+            stage = f"scene_{n}_video"
+            inputs_hash = manifest.hash(prompt, scene_image.image_bytes, aspect_ratio)
+            video_file = manifest.completed(stage, inputs_hash)
+            if video_file is None:
+                logger.info(f"Generating video for scene {n + 1}")
+                video_file = generate_video(
+                    prompt,
+                    scene_image,
+                    fname=f"video_{n}.mp4",
+                    output_dir=output_dir,
+                    aspect_ratio=aspect_ratio,
+                )
+                manifest.complete(stage, inputs_hash, video_file)
+            return video_file
+        except Exception as e:
+            if stage is not None:
+                manifest.fail(stage, inputs_hash, e)
+            if attempt == max_attempts:
+                raise
+            logger.warning(
+                f"Scene {n + 1} failed ({e}), retrying {attempt}/{max_attempts}"
+            )
+
+
+async def render_scene_async(
+    script: VideoSchema,
+    n: int,
+    start_image: types.Image,
+    output_dir: str,
+    manifest: VlogManifest,
+    aspect_ratio: str = "16:9",
+    max_attempts: int = 3,
+) -> str:
+    """Async version of `render_scene` using the async client."""
+    prompt = _scene_prompt(script, n)
+    for attempt in range(1, max_attempts + 1):
+        stage, inputs_hash = None, None
+        try:
+            scene_image = start_image
+            if n > 0:
+                stage = f"scene_{n}_image"
+                inputs_hash = manifest.hash(prompt, start_image.image_bytes)
+                image_path = manifest.completed(stage, inputs_hash)
+                if image_path is not None:
+                    scene_image = types.Image.from_file(location=image_path)
+                else:
+                    logger.info(f"Editing image for scene {n + 1}")
+                    scene_image = await edit_image_async(
+                        image=start_image,
+                        prompt=prompt,
+                        output_dir=output_dir,
+                        fname=f"scene_{n}_image.png",
+                    )
+                    # The edited image is still being written in the background.
+                    image_path = os.path.join(output_dir, f"scene_{n}_image.png")
+                    artifact_writer.when_written(
+                        image_path,
+                        partial(manifest.complete, stage, inputs_hash, image_path),
+                    )
+
+            stage = f"scene_{n}_video"
+            inputs_hash = manifest.hash(prompt, scene_image.image_bytes, aspect_ratio)
+            video_file = manifest.completed(stage, inputs_hash)
+            if video_file is None:
+                logger.info(f"Generating video for scene {n + 1}")
+                video_file = await generate_video_async(
+                    prompt,
+                    scene_image,
+                    fname=f"video_{n}.mp4",
+                    output_dir=output_dir,
+                    aspect_ratio=aspect_ratio,
+                )
+                manifest.complete(stage, inputs_hash, video_file)
+            return video_file
+        except Exception as e:
+            if stage is not None:
+                manifest.fail(stage, inputs_hash, e)
+            if attempt == max_attempts:
+                raise
+            logger.warning(
+                f"Scene {n + 1} failed ({e}), retrying {attempt}/{max_attempts}"
+            )
+
+
+async def render_scenes_async(
+    script: VideoSchema,
+    start_image: types.Image,
+    output_dir: str,
+    manifest: VlogManifest,
+    aspect_ratio: str = "16:9",
+    max_concurrency: int = 4,
+    max_attempts: int = 3,
+    normalizer: Optional[video_merge.ClipNormalizer] = None,
+) -> list[str]:
+    """Edits the start image and renders a video for every scene concurrently.
+
+    Each scene still edits its image before its video is generated, but all
+    scenes run at the same time, limited by `max_concurrency`.
+
+    Args:
+        script: The parsed video script returned by `generate_scenes`.
+        start_image: The image generated for the first scene.
+        output_dir: The directory to save the edited images and videos.
+        manifest: The manifest used to skip scenes that are already done.
+        aspect_ratio: The aspect ratio of the videos.
+        max_concurrency: The maximum number of scenes rendered at once.
+        max_attempts: How often a failing scene is tried before giving up.
+        normalizer: Gets every video as soon as it is rendered, so clips that
+            need to be normalized for the merge are transcoded right away.
+
+    Returns:
+        The video file paths, in scene order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    clips = script.clips
+
+    async def render(n: int) -> str:
+        async with semaphore:
+            logger.info(f"Processing scene {n + 1}/{len(clips)}")
+            video_file = await render_scene_async(
+                script,
+                n,
+                start_image,
+                output_dir=output_dir,
+                manifest=manifest,
+                aspect_ratio=aspect_ratio,
+                max_attempts=max_attempts,
+            )
+        if normalizer is not None:
+            normalizer.add(video_file)
+        return video_file
+
+    # gather keeps the results in scene order, whatever order they finish in.
+    # Named tasks also label the scenes' lanes in the Chrome trace.
+    return await asyncio.gather(
+        *(
+            asyncio.create_task(render(n), name=f"scene {n + 1}")
+            for n in range(len(clips))
+        )
+    )
+
+
+def _start_image(
+    script: VideoSchema, output_dir: str, manifest: VlogManifest
+) -> types.Image:
+    """Generates the image of the first scene, or reuses it from a previous run."""
+    start_prompt = _scene_prompt(script, 0)
+    start_hash = manifest.hash(start_prompt)
+    start_image_path = manifest.completed("start_image", start_hash)
+    if start_image_path is not None:
+        logger.info("Reusing start image from previous run")
+        return types.Image.from_file(location=start_image_path)
+
+    logger.info("Generating start image...")
+    start_image = generate_image(
+        prompt=start_prompt,
+        output_dir=output_dir,
+        fname="start_image.png",
+    )
+    start_image_path = os.path.join(output_dir, "start_image.png")
+    artifact_writer.when_written(
+        start_image_path,
+        partial(manifest.complete, "start_image", start_hash, start_image_path),
+    )
+    return start_image
+
+
+async def render_streamed_scenes_async(
+    idea: str,
+    number_of_scenes: int,
+    output_dir: str,
+    manifest: VlogManifest,
+    aspect_ratio: str = "16:9",
+    max_concurrency: int = 4,
+    max_attempts: int = 3,
+    normalizer: Optional[video_merge.ClipNormalizer] = None,
+) -> tuple[VideoSchema, list[str]]:
+    """Streams the script and renders every scene as soon as its clip is complete.
+
+    The start image is generated once the characters and the first clip have
+    arrived, and each scene starts once its clip and the start image are
+    there, so the first videos are submitted while the model is still
+    writing the last clips.
+
+    Args:
+        idea: The core concept for the vlog.
+        number_of_scenes: The number of scenes in the vlog.
+        output_dir: The directory to save the script, images and videos.
+        manifest: The manifest used to skip scenes that are already done.
+        aspect_ratio: The aspect ratio of the videos.
+        max_concurrency: The maximum number of scenes rendered at once.
+        max_attempts: How often a failing scene is tried before giving up.
+        normalizer: Gets every video as soon as it is rendered, so clips that
+            need to be normalized for the merge are transcoded right away.
+
+    Returns:
+        The script and the video file paths, in scene order.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def stream() -> None:
+        # Runs in a thread, the stream is read with the blocking client.
+        try:
+            with tracing.span("generate_scenes", streamed=True):
+                for event in generate_scenes_stream(
+                    idea, output_dir=output_dir, number_of_scenes=number_of_scenes
+                ):
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+        except Exception as e:
+            loop.call_soon_threadsafe(events.put_nowait, e)
+        else:
+            loop.call_soon_threadsafe(events.put_nowait, done)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # Filled in as the items arrive, each of them already validated.
+    script = VideoSchema.model_construct(characters=[], clips=[])
+    characters_known = False
+    start_image: Optional[asyncio.Task] = None
+    tasks: list[asyncio.Task] = []
+
+    async def render(n: int) -> str:
+        image = await start_image
+        async with semaphore:
+            logger.info(f"Processing scene {n + 1} while the script is streamed")
+            video_file = await render_scene_async(
+                script,
+                n,
+                image,
+                output_dir=output_dir,
+                manifest=manifest,
+                aspect_ratio=aspect_ratio,
+                max_attempts=max_attempts,
+            )
+        if normalizer is not None:
+            normalizer.add(video_file)
+        return video_file
+
+    producer = asyncio.create_task(asyncio.to_thread(stream), name="script")
+    try:
+        while (event := await events.get()) is not done:
+            if isinstance(event, Exception):
+                raise event
+            key, index, value = event
+            if key == "characters":
+                script.characters, characters_known = value, True
+            else:
+                script.clips.append(value)
+            # Clips are only rendered once all characters they may mention are known.
+            if not characters_known or not script.clips:
+                continue
+            if start_image is None:
+                # A copy, the thread must not see the clips list grow.
+                first_scene = VideoSchema.model_construct(
+                    characters=script.characters, clips=script.clips[:1]
+                )
+                start_image = asyncio.create_task(
+                    asyncio.to_thread(_start_image, first_scene, output_dir, manifest),
+                    name="start image",
+                )
+            for n in range(len(tasks), len(script.clips)):
+                tasks.append(asyncio.create_task(render(n), name=f"scene {n + 1}"))
+        await producer
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return script, await asyncio.gather(*tasks)
+
+
+def _render_scenes(
+    script: VideoSchema,
+    output_dir: str,
+    manifest: VlogManifest,
+    concurrent: bool = False,
+    aspect_ratio: str = "16:9",
+    max_concurrency: int = 4,
+    max_attempts: int = 3,
+    normalizer: Optional[video_merge.ClipNormalizer] = None,
+) -> list[str]:
+    """Renders the start image and every scene of a complete script."""
+    start_image = _start_image(script, output_dir, manifest)
+
+    if concurrent:
+        video_files = asyncio.run(
+            render_scenes_async(
+                script,
+                start_image,
+                output_dir=output_dir,
+                manifest=manifest,
+                aspect_ratio=aspect_ratio,
+                max_concurrency=max_concurrency,
+                max_attempts=max_attempts,
+                normalizer=normalizer,
+            )
+        )
+    else:
+        video_files = []
+        for n in range(len(script.clips)):
+            logger.info(f"Processing scene {n + 1}/{len(script.clips)}")
+            video_files.append(
+                render_scene(
+                    script,
+                    n,
+                    start_image,
+                    output_dir=output_dir,
+                    manifest=manifest,
+                    aspect_ratio=aspect_ratio,
+                    max_attempts=max_attempts,
+                )
+            )
+            if normalizer is not None:
+                normalizer.add(video_files[-1])
+    return video_files
 
 
 def generate_vlog(
@@ -497,6 +1316,14 @@ def generate_vlog(
     number_of_scenes: int = 4,
     aspect_ratio: str = "16:9",
     output_dir: str = "videos",
+    concurrent: bool = False,
+    max_concurrency: int = 4,
+    max_attempts: int = 3,
+    trace: Optional[str] = None,
+    stream_script: bool = False,
+    preview: bool = False,
+    defer_merge: bool = False,
+    ingest_audio: bool = False,
 ) -> None:
     """Generates a complete vlog with multiple scenes.
 
@@ -505,16 +1332,34 @@ def generate_vlog(
     2. Generates a video for each scene.
     3. Merges the videos into a final vlog.
 
+    Every stage is recorded in a `manifest.json` in the vlog directory, so
+    calling this again after a failure resumes where the last run stopped.
+
     Args:
         idea: The core concept for the vlog.
-        character_description: A description of the main character.
-        character_characteristics: The personality of the character.
-        video_type: The type of video to create.
-        video_characteristics: The visual style of the vlog.
-        camera_angle: The camera angles to use.
         aspect_ratio: The aspect ratio of the final video.
         number_of_scenes: The number of scenes in the vlog.
         output_dir: The directory to save all generated files (scenes and videos).
+        concurrent: If True, render all scenes at the same time with the async
+            client instead of one after another.
+        max_concurrency: The maximum number of scenes rendered at once when
+            `concurrent` is True.
+        max_attempts: How often a failing scene is tried before giving up.
+        trace: "jsonl" to write the timing of every stage to `trace.jsonl`
+            in the vlog directory, "chrome" to also write a Chrome trace
+            (`trace.json`). Defaults to the `GENAI_TRACE` environment variable.
+        stream_script: If True, stream the script and start rendering each
+            scene as soon as its clip is complete, concurrently. Only applies
+            when the script is not reused from a previous run.
+        preview: If True, also render a low-resolution proxy of the vlog with
+            a contact sheet and an index entry per scene into `preview/`,
+            while the final merge runs, see `video_preview`.
+        defer_merge: If True, skip the final merge, e.g. until the preview
+            has been reviewed. Calling this again without it merges.
+        ingest_audio: If True, the `audio_base64` or `wave_download_url` of
+            a clip's audio track replaces the audio of its video, see
+            `audio_ingest`. Meant for scripts edited by hand, the model has
+            no real audio to point to.
     """
     # Create a unique subdirectory for this vlog
     vlog_subdir_name = re.sub(r"[^a-z0-9]+", "-", idea.lower()).strip("-")[:35]
@@ -522,49 +1367,110 @@ def generate_vlog(
     os.makedirs(vlog_output_dir, exist_ok=True)
     logger.info(f"Starting vlog generation for idea: '{idea}'")
     logger.info(f"Output will be saved to '{vlog_output_dir}'")
-
-    script = generate_scenes(
-        idea=idea,
-        output_dir=vlog_output_dir,
-        number_of_scenes=number_of_scenes,
-    )
-
-    video_files = []
-
-    logger.info("Generating start image...")
-    start_image = generate_image(
-        prompt=json.dumps(
-            {"characters": script["characters"], "clips": [script["clips"][0]]}
-        ),
-        output_dir=vlog_output_dir,
-        fname="start_image.png",
-    )
-
-    for n, scene in enumerate(script["clips"]):
-        logger.info(f"Processing scene {n + 1}/{len(script['clips'])}")
-        scene_object = {"characters": script["characters"], "clips": [scene]}
-
-        if n > 0:
-            logger.info(f"Editing image for scene {n + 1}")
-            scene_image = edit_image(
-                image=start_image,
-                prompt=json.dumps(scene_object),
-                output_dir=vlog_output_dir,
-                fname=f"scene_{n}_image.png",
+    with tracing.trace(vlog_output_dir, mode=trace) as tracer:
+        with tracing.span("generate_vlog", idea=idea), ExitStack() as stack:
+            manifest = VlogManifest(vlog_output_dir)
+            # Probes every video as it is rendered and, if the videos differ,
+            # transcodes them to a common format ahead of the merge. Without
+            # a merge in this run its transcodes would only be waited for.
+            # Closed on the way out, also when a stage fails.
+            normalizer = None
+            if not defer_merge:
+                normalizer = stack.enter_context(
+                    video_merge.ClipNormalizer(
+                        # The first scene sets the format, whichever finishes first.
+                        reference=os.path.join(vlog_output_dir, "video_0.mp4"),
+                        max_workers=number_of_scenes,
+                    )
+                )
+
+            script_hash = manifest.hash(
+                idea, number_of_scenes, json_schema(VideoSchema, SCHEMA_VERBOSITY)
             )
-        else:
-            scene_image = start_image
-
-        logger.info(f"Generating video for scene {n + 1}")
-        video_file = generate_video(
-            json.dumps(scene_object),
-            scene_image,
-            fname=f"video_{n}.mp4",
-            output_dir=vlog_output_dir,
-            aspect_ratio=aspect_ratio,
-        )
-        video_files.append(video_file)
-    merge_videos(video_files, "vlog.mp4", output_dir=vlog_output_dir)
+            script_path = manifest.completed("script", script_hash)
+            audio_futures: list[Future] = []
+            if script_path is None and stream_script:
+                script, video_files = asyncio.run(
+                    render_streamed_scenes_async(
+                        idea,
+                        number_of_scenes,
+                        output_dir=vlog_output_dir,
+                        manifest=manifest,
+                        aspect_ratio=aspect_ratio,
+                        max_concurrency=max_concurrency,
+                        max_attempts=max_attempts,
+                        normalizer=normalizer,
+                    )
+                )
+                manifest.complete(
+                    "script", script_hash, os.path.join(vlog_output_dir, "script.json")
+                )
+                if ingest_audio:
+                    audio_futures = _ingest_audio(script, vlog_output_dir, manifest)
+            else:
+                if script_path is not None:
+                    logger.info("Reusing script from previous run")
+                    with open(script_path) as f:
+                        script = structured_output.parse(VideoSchema, f.read())
+                else:
+                    script = generate_scenes(
+                        idea=idea,
+                        output_dir=vlog_output_dir,
+                        number_of_scenes=number_of_scenes,
+                    )
+                    manifest.complete(
+                        "script",
+                        script_hash,
+                        os.path.join(vlog_output_dir, "script.json"),
+                    )
+                if ingest_audio:
+                    # Fetched and converted while the videos are rendered.
+                    audio_futures = _ingest_audio(script, vlog_output_dir, manifest)
+                video_files = _render_scenes(
+                    script,
+                    vlog_output_dir,
+                    manifest,
+                    concurrent=concurrent,
+                    aspect_ratio=aspect_ratio,
+                    max_concurrency=max_concurrency,
+                    max_attempts=max_attempts,
+                    normalizer=normalizer,
+                )
+
+            # Make sure every image is on disk before the run is reported as done.
+            artifact_writer.flush()
+
+            audio_files = [future.result() for future in audio_futures]
+            merge_hash = manifest.hash(
+                *(manifest.file_hash(f) for f in video_files),
+                *(manifest.file_hash(f) for f in audio_files if f is not None),
+            )
+            preview_future = None
+            if preview and manifest.completed("preview", merge_hash) is None:
+                # Cheap next to the final merge, so it is ready long before.
+                preview_future = preview_executor.submit(
+                    contextvars.copy_context().run,
+                    video_preview.render_preview,
+                    vlog_output_dir,
+                    video_files,
+                )
+            if defer_merge:
+                logger.info("Deferring the final merge")
+            elif manifest.completed("merge", merge_hash) is None:
+                vlog_file = merge_videos(
+                    video_files,
+                    "vlog.mp4",
+                    output_dir=vlog_output_dir,
+                    normalizer=normalizer,
+                    audio_files=audio_files,
+                )
+                manifest.complete("merge", merge_hash, vlog_file)
+            if preview_future is not None:
+                manifest.complete("preview", merge_hash, preview_future.result().path)
+
+        if tracer is not None:
+            for name, totals in tracer.summary().items():
+                logger.info(f"Trace {name}: {totals}")
 
 
 if __name__ == "__main__":
@@ -584,8 +1490,13 @@ if __name__ == "__main__":
                 number_of_scenes=number_of_scenes,
             )
         except Exception as e:
-            print("Rerunning...")
+            # Completed stages are recorded in the manifest, so this resumes.
+            print(f"Resuming after error: {e}")
             generate_vlog(
                 idea=idea,
                 number_of_scenes=number_of_scenes,
             )
+
+    logger.info(f"Response cache: {response_cache.stats}")
+    logger.info(f"Artifact store: {artifact_store.stats}")
+    logger.info(f"Hedged requests: {hedge_policy.stats}")
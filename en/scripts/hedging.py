@@ -0,0 +1,382 @@
+"""Hedged requests against the long latency tail of Veo and image generation.
+
+A vlog is only done when its slowest clip is, and Veo operations now and then
+take several times longer than usual. With hedging, a request that has not
+finished after a percentile of the latencies observed so far (p90 by
+default) is sent a second time, the first result wins and the other request
+is cancelled, or ignored where it cannot be.
+
+Two pieces:
+    LatencyHistogram  log-spaced latency buckets per request kind, persisted
+                      across runs, so hedging starts with a good estimate.
+    HedgePolicy       when to hedge and how much: at most `budget` extra
+                      requests per request made.
+
+Example:
+    policy = HedgePolicy(LatencyHistogram())
+    future = hedged(
+        policy,
+        "generate_videos:veo-3.0-generate-preview",
+        lambda: poller.submit(client.models.generate_videos(**request)),
+    )
+    operation = future.result()
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Runs blocking calls that are hedged, see `hedged_call`.
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedged")
+
+DEFAULT_HISTOGRAM_PATH = os.path.join(
+    os.environ.get("GENAI_CACHE_DIR", os.path.expanduser("~/.cache/gemini-samples")),
+    "latency-histogram.json",
+)
+
+
+class LatencyHistogram:
+    """Latency counts in log-spaced buckets per key, saved to a JSON file.
+
+    Bucket `i` holds latencies up to `min_seconds * growth**i`, so
+    percentiles are accurate to `growth` (10%) over any range. Once a key has
+    `max_count` samples all its counts are halved, so old runs fade out.
+
+    Args:
+        path: The JSON file. None keeps the histogram in memory only.
+        min_seconds: The upper bound of the first bucket.
+        growth: The ratio between the bounds of two buckets.
+        max_count: The sample count at which a key's counts are halved.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_HISTOGRAM_PATH,
+        min_seconds: float = 0.01,
+        growth: float = 1.1,
+        max_count: int = 1000,
+    ):
+        self.path = path
+        self.min_seconds = min_seconds
+        self.growth = growth
+        self.max_count = max_count
+        self._lock = threading.Lock()
+        self._buckets: dict[str, dict[int, float]] = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self._buckets = {
+                    key: {int(i): count for i, count in buckets.items()}
+                    for key, buckets in json.load(f).items()
+                }
+
+    def _bucket(self, seconds: float) -> int:
+        if seconds <= self.min_seconds:
+            return 0
+        return math.ceil(math.log(seconds / self.min_seconds, self.growth))
+
+    def record(self, key: str, seconds: float) -> None:
+        """Adds an observed latency and saves the histogram."""
+        with self._lock:
+            buckets = self._buckets.setdefault(key, {})
+            bucket = self._bucket(seconds)
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+            self._decay(buckets)
+            self._save()
+
+    def record_censored(self, key: str, seconds: float) -> None:
+        """Adds a latency only known to be longer than `seconds` and saves.
+
+        That is a request cancelled after `seconds`, e.g. the loser of a
+        hedge. Its sample is spread over the buckets above in proportion to
+        their counts, or goes into the bucket of `seconds` if there are none.
+        Dropping it instead would make the tail look shorter than it is.
+        """
+        with self._lock:
+            buckets = self._buckets.setdefault(key, {})
+            bucket = self._bucket(seconds)
+            above = {i: count for i, count in buckets.items() if i > bucket}
+            total = sum(above.values())
+            if total:
+                for i, count in above.items():
+                    buckets[i] += count / total
+            else:
+                buckets[bucket] = buckets.get(bucket, 0) + 1
+            self._decay(buckets)
+            self._save()
+
+    def _decay(self, buckets: dict[int, float]) -> None:
+        if sum(buckets.values()) >= self.max_count:
+            for i in buckets:
+                buckets[i] /= 2
+
+    def count(self, key: str) -> float:
+        """The (decayed) number of samples of `key`."""
+        with self._lock:
+            return sum(self._buckets.get(key, {}).values())
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """The latency below which a share `q` of the samples fall, or None."""
+        with self._lock:
+            buckets = self._buckets.get(key)
+            if not buckets:
+                return None
+            target = q * sum(buckets.values())
+            seen = 0.0
+            for i in sorted(buckets):
+                seen += buckets[i]
+                if seen >= target:
+                    return self.min_seconds * self.growth**i
+            return self.min_seconds * self.growth ** max(buckets)
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._buckets, f)
+        os.replace(tmp_path, self.path)
+
+
+class HedgePolicy:
+    """Decides when a request is hedged, within a budget of extra requests.
+
+    Latencies are recorded whether hedging is enabled or not, so it can be
+    turned on with a warm histogram.
+
+    Args:
+        histogram: The observed latencies.
+        percentile: The share of requests expected to have finished when a
+            request is hedged, e.g. 0.9 to hedge after the p90 latency.
+        budget: Extra requests allowed per request made, e.g. 0.1 for at
+            most one hedge per ten requests.
+        min_samples: Samples a key needs before its requests are hedged.
+        enabled: If False, requests are only timed, never hedged.
+        slots: Returns the semaphore that limits the concurrent requests of a
+            key, or None if they are not limited. A hedge is only sent if it
+            can take a slot without waiting, and holds it until it finishes,
+            so hedging never exceeds a concurrency limit.
+    """
+
+    def __init__(
+        self,
+        histogram: LatencyHistogram,
+        percentile: float = 0.9,
+        budget: float = 0.1,
+        min_samples: int = 10,
+        enabled: bool = True,
+        slots: Optional[Callable[[str], Optional[threading.Semaphore]]] = None,
+    ):
+        self.histogram = histogram
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.enabled = enabled
+        self.slots = slots
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def delay(self, key: str) -> Optional[float]:
+        """Seconds after which a request of `key` is hedged, None to never hedge."""
+        if not self.enabled or self.histogram.count(key) < self.min_samples:
+            return None
+        return self.histogram.percentile(key, self.percentile)
+
+    def _start(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def _acquire(self, key: str) -> bool:
+        """Takes a hedge from the budget and a slot, False if either is used up.
+
+        A hedge that was acquired must be given back with `_release`.
+        """
+        slot = self.slots(key) if self.slots is not None else None
+        if slot is not None and not slot.acquire(blocking=False):
+            return False
+        with self._lock:
+            if self.hedges + 1 <= self.budget * self.requests:
+                self.hedges += 1
+                return True
+        if slot is not None:
+            slot.release()
+        return False
+
+    def _release(self, key: str) -> None:
+        """Gives back the slot of a hedge that finished."""
+        slot = self.slots(key) if self.slots is not None else None
+        if slot is not None:
+            slot.release()
+
+    def _finish(
+        self,
+        key: str,
+        seconds: Optional[float],
+        hedge_won: bool,
+        cancelled: tuple[float, ...] = (),
+    ) -> None:
+        """Records a finished request.
+
+        Args:
+            key: The kind of request.
+            seconds: The latency of the first attempt if it won, else None.
+            hedge_won: Whether the hedge finished first.
+            cancelled: How long each losing attempt ran before it was
+                cancelled, recorded as censored latencies.
+        """
+        if seconds is not None:
+            self.histogram.record(key, seconds)
+        for elapsed in cancelled:
+            self.histogram.record_censored(key, elapsed)
+        if hedge_won:
+            with self._lock:
+                self.hedge_wins += 1
+            tracing.annotate(hedge_won=True)
+
+    @property
+    def stats(self) -> dict:
+        """Request, hedge and win counters of this process."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "extra_ratio": self.hedges / self.requests if self.requests else 0.0,
+            }
+
+
+def hedged(policy: HedgePolicy, key: str, start: Callable[[], Future]) -> Future:
+    """Runs a request, hedged once by `policy`, and returns the winning future.
+
+    Args:
+        policy: The hedge policy.
+        key: The kind of request, e.g. "generate_videos:<model>".
+        start: Sends the request and returns a future of its result. It is
+            called a second time for the hedge. The losing future is
+            cancelled, which e.g. stops `OperationPoller` from polling it.
+
+    Returns:
+        The first future that succeeded, or the last one that failed.
+    """
+    policy._start()
+    futures = {start(): time.monotonic()}
+    delay = policy.delay(key)
+    if delay is not None:
+        done, _ = wait(futures, timeout=delay)
+        if not done and policy._acquire(key):
+            logger.info(f"Hedging {key} after {delay:.1f}s")
+            tracing.annotate(hedged=True)
+            try:
+                hedge = start()
+            except Exception as e:
+                # The first request is still running, keep waiting for it.
+                logger.warning(f"Hedging {key} failed: {e}")
+                policy._release(key)
+            else:
+                hedge.add_done_callback(lambda _: policy._release(key))
+                futures[hedge] = time.monotonic()
+
+    pending, winner = set(futures), None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = next(iter(done))
+        if winner.exception() is None:
+            break
+    for future in pending:
+        future.cancel()
+    if winner.exception() is None:
+        _record_latencies(policy, key, futures, winner, pending)
+    return winner
+
+
+def _record_latencies(
+    policy: HedgePolicy, key: str, starts: dict, winner, losers
+) -> None:
+    """Records the latencies of a hedged request, timed from each attempt's start.
+
+    When the hedge wins, the straggler it replaced is recorded as censored
+    at the time since the first attempt started, and the hedge itself is not
+    recorded: it only won because it was fast, and timing it alone would
+    make the histogram, and with it the hedge delay, drift low. A hedge that
+    lost is recorded as censored too.
+    """
+    now = time.monotonic()
+    first = next(iter(starts))
+    hedge_won = winner is not first
+    policy._finish(
+        key,
+        None if hedge_won else now - starts[first],
+        hedge_won,
+        cancelled=tuple(now - starts[loser] for loser in losers),
+    )
+
+
+def hedged_call(policy: HedgePolicy, key: str, fn: Callable[[], T]) -> T:
+    """Calls a blocking function, hedged by `policy`, and returns the first result.
+
+    The calls run on a thread pool; a call that lost cannot be interrupted,
+    its result is dropped once it returns.
+    """
+    if policy.delay(key) is None:
+        # Nothing to hedge, only time the call.
+        policy._start()
+        started = time.monotonic()
+        result = fn()
+        policy._finish(key, time.monotonic() - started, hedge_won=False)
+        return result
+    return hedged(
+        policy, key, lambda: _executor.submit(contextvars.copy_context().run, fn)
+    ).result()
+
+
+async def hedged_async(
+    policy: HedgePolicy, key: str, start: Callable[[], Awaitable[T]]
+) -> T:
+    """Async version of `hedged`, `start` returns a new awaitable every call.
+
+    The losing request's task is cancelled, and so are all of them if the
+    caller is. Returns the first result, or raises the last error if every
+    request failed.
+    """
+    policy._start()
+    tasks = {asyncio.ensure_future(start()): time.monotonic()}
+    try:
+        delay = policy.delay(key)
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and policy._acquire(key):
+                logger.info(f"Hedging {key} after {delay:.1f}s")
+                tracing.annotate(hedged=True)
+                hedge = asyncio.ensure_future(start())
+                hedge.add_done_callback(lambda _: policy._release(key))
+                tasks[hedge] = time.monotonic()
+
+        pending, winner = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            winner = next(iter(done))
+            if winner.exception() is None:
+                break
+        if winner.exception() is None:
+            _record_latencies(policy, key, tasks, winner, pending)
+        return winner.result()
+    finally:
+        for task in tasks:
+            task.cancel()
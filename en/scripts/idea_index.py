@@ -0,0 +1,353 @@
+"""A local similarity index of expanded ideas, to reuse their prompts.
+
+Idea lists are full of small rewordings of one concept ("A cartoon robot
+waving happily" and "Cartoon robot happily waving hello"), and each of them
+pays for a full prompt expansion. `IdeaIndex` keeps the expanded prompt of
+every idea together with a MinHash signature of its character shingles.
+`nearest` compares a new idea with all of them at once: the signatures are
+rows of a NumPy matrix, and the share of slots equal to the new signature
+estimates the Jaccard similarity of the shingle sets.
+
+Lexical similarity cannot tell a rewording from the same sentence about
+another subject: "A cartoon robot waving happily, ..." and "A cartoon dragon
+waving happily, ..." are 0.84 similar, most rewordings only 0.4 to 0.6. So
+a prompt should only be reused as it is for an idea with the same
+`content_words`, and adapting the prompt of a merely similar idea risks
+carrying over the wrong subject.
+
+Entries are appended to a JSONL file next to the response cache, so the
+index grows across runs, up to `max_entries` ideas. Ideas that are still
+being expanded are matched too, so a rewording of an idea in the same
+batch can wait for its prompt.
+
+Example:
+    index = IdeaIndex()
+    match = index.nearest("A cartoon robot waving hello", mode="short")
+    if match is not None:
+        match = match.wait()
+    if match is not None and content_words(match.idea) == content_words(idea):
+        prompt = match.prompt
+        index.record("reused", match.seconds)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(
+    os.environ.get("GENAI_CACHE_DIR", os.path.expanduser("~/.cache/gemini-samples")),
+    "ideas.jsonl",
+)
+
+# Hashes are taken modulo the Mersenne prime 2**31 - 1, so the products of
+# the permutations fit into 64 bits.
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+def normalize(text: str) -> str:
+    """Lowercases `text` and reduces it to words separated by single spaces."""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+# Words that do not change what an idea is about.
+STOP_WORDS = frozenset(
+    "a an and at by for from in into is it its of on or the to with".split()
+)
+
+
+def content_words(text: str) -> frozenset[str]:
+    """The words of the normalized text, without STOP_WORDS."""
+    return frozenset(normalize(text).split()) - STOP_WORDS
+
+
+def shingles(text: str, size: int = 4) -> set[str]:
+    """The character `size`-grams of the normalized text, word boundaries included."""
+    text = f" {normalize(text)} "
+    return {text[i : i + size] for i in range(max(len(text) - size + 1, 1))}
+
+
+@dataclass
+class Match:
+    """The most similar indexed idea.
+
+    Attributes:
+        idea: The indexed idea.
+        prompt: Its expanded prompt, empty while it is `pending`.
+        similarity: The estimated Jaccard similarity of the shingles, 0 to 1.
+        seconds: How long the expansion of the indexed idea took.
+        pending: Set while the idea is still being expanded (see
+            `IdeaIndex.expanding`). It resolves to the Match with the prompt,
+            or to None if the expansion failed.
+    """
+
+    idea: str
+    prompt: str
+    similarity: float
+    seconds: float
+    pending: Optional[Future] = None
+
+    def wait(self) -> Optional["Match"]:
+        """Waits until a pending match is expanded, None if that failed."""
+        if self.pending is None:
+            return self
+        return self._completed(self.pending.result())
+
+    async def wait_async(self) -> Optional["Match"]:
+        """Async version of `wait`."""
+        if self.pending is None:
+            return self
+        # Shielded, a cancelled waiter must not cancel the expansion's future.
+        return self._completed(await asyncio.shield(asyncio.wrap_future(self.pending)))
+
+    def _completed(self, match: Optional["Match"]) -> Optional["Match"]:
+        return None if match is None else replace(match, similarity=self.similarity)
+
+
+class IdeaIndex:
+    """MinHash index of ideas and their expanded prompts, safe to share.
+
+    Every entry belongs to a mode, the way its prompt was expanded (e.g.
+    the response schema), and only ideas of the same mode are matched. Once
+    the index holds `max_entries` ideas, the oldest ones are dropped.
+
+    Args:
+        path: The JSONL file the entries are kept in, None for an index
+            that only lives in memory.
+        num_perm: The number of hash permutations of a signature. The error
+            of the estimated similarity is about 1 / sqrt(num_perm).
+        shingle_size: The length of the character shingles.
+        max_entries: The number of ideas kept.
+        enabled: If False, `nearest` never finds anything and `add` does not
+            store anything.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_INDEX_PATH,
+        num_perm: int = 128,
+        shingle_size: int = 4,
+        max_entries: int = 10_000,
+        enabled: bool = True,
+    ):
+        self.path = path
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.enabled = enabled
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        # A ring of entries: once full, `_next` is the oldest, replaced next.
+        self._entries: list[dict] = []
+        self._next = 0
+        self._positions: dict[tuple[str, str], int] = {}
+        # Rows of the entries, allocated in chunks, see `_grow`.
+        self._signatures = np.empty((0, num_perm), dtype=np.uint64)
+        self._modes = np.empty(0, dtype=np.int32)
+        self._mode_ids: dict[str, int] = {}
+        # Ideas being expanded: (mode, idea) -> (idea, signature, future).
+        self._pending: dict[tuple[str, str], tuple[str, np.ndarray, Future]] = {}
+        self.outcomes = {"reused": 0, "adapted": 0, "expanded": 0}
+        self.seconds_saved = 0.0
+        # Lines in the file, which is rewritten once most are dropped entries.
+        self._lines = 0
+
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    self._lines += 1
+                    entry = json.loads(line) if line.strip() else {}
+                    # Entries of older versions have no mode to be matched in.
+                    if "mode" in entry:
+                        self._insert(entry)
+            if self._lines > len(self._entries):
+                self._compact()
+            logger.info(f"Loaded {len(self._entries)} ideas from {path}")
+
+    def signature(self, text: str) -> np.ndarray:
+        """The MinHash signature of the shingles of `text`."""
+        hashes = np.array(
+            [
+                int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest())
+                for s in shingles(text, self.shingle_size)
+            ],
+            dtype=np.uint64,
+        )
+        hashes %= _PRIME
+        # One row per permutation, the minimum over all shingles.
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+    def _grow(self, rows: int) -> None:
+        """Makes room for `rows` rows, doubling the matrix so appends stay cheap."""
+        capacity = len(self._signatures)
+        if rows <= capacity:
+            return
+        capacity = min(max(rows, 2 * capacity, 256), self.max_entries)
+        signatures = np.empty((capacity, self._signatures.shape[1]), np.uint64)
+        signatures[: len(self._entries)] = self._signatures[: len(self._entries)]
+        modes = np.empty(capacity, dtype=np.int32)
+        modes[: len(self._entries)] = self._modes[: len(self._entries)]
+        self._signatures, self._modes = signatures, modes
+
+    def _insert(self, entry: dict) -> bool:
+        """Adds or replaces the entry of an idea, returns False if it was known."""
+        key = (entry["mode"], normalize(entry["idea"]))
+        position = self._positions.get(key)
+        if position is not None:
+            if self._entries[position]["prompt"] == entry["prompt"]:
+                return False
+            self._entries[position] = entry
+            return True
+        if len(self._entries) < self.max_entries:
+            position = len(self._entries)
+            self._grow(position + 1)
+            self._entries.append(entry)
+        else:
+            position = self._next
+            self._next = (position + 1) % self.max_entries
+            oldest = self._entries[position]
+            del self._positions[(oldest["mode"], normalize(oldest["idea"]))]
+            self._entries[position] = entry
+        self._positions[key] = position
+        self._signatures[position] = self.signature(entry["idea"])
+        self._modes[position] = self._mode_ids.setdefault(
+            entry["mode"], len(self._mode_ids)
+        )
+        return True
+
+    def _compact(self) -> None:
+        """Rewrites the file with the entries kept, dropping the replaced ones."""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            # Oldest first, so the next load drops the same ones first.
+            for entry in self._entries[self._next :] + self._entries[: self._next]:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+        self._lines = len(self._entries)
+
+    def add(self, idea: str, prompt: str, seconds: float = 0.0, mode: str = "") -> None:
+        """Indexes the expanded `prompt` of an idea.
+
+        Args:
+            idea: The idea.
+            prompt: Its expanded prompt.
+            seconds: How long the expansion took, to report the time saved
+                when the prompt is reused.
+            mode: How the prompt was expanded, only ideas of the same mode
+                are matched.
+
+        An idea already indexed with the same prompt is left as it is. Ideas
+        waiting for this one (see `expanding`) get its prompt.
+        """
+        if not self.enabled:
+            return
+        entry = {
+            "idea": idea,
+            "mode": mode,
+            "prompt": prompt,
+            "seconds": round(seconds, 3),
+        }
+        with self._lock:
+            pending = self._pending.pop((mode, normalize(idea)), None)
+            if self._insert(entry) and self.path is not None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+                self._lines += 1
+                if self._lines > 2 * self.max_entries:
+                    self._compact()
+        if pending is not None:
+            pending[2].set_result(
+                Match(idea=idea, prompt=prompt, similarity=1.0, seconds=seconds)
+            )
+
+    def expanding(self, idea: str, mode: str = "") -> None:
+        """Marks an idea as being expanded until `add` or `discard` is called.
+
+        `nearest` matches it in the meantime, so a similar idea looked up
+        while it is expanded can wait for its prompt instead of being
+        expanded as well.
+        """
+        if not self.enabled:
+            return
+        signature = self.signature(idea)
+        with self._lock:
+            self._pending.setdefault(
+                (mode, normalize(idea)), (idea, signature, Future())
+            )
+
+    def discard(self, idea: str, mode: str = "") -> None:
+        """Ends an expansion marked with `expanding` that failed."""
+        with self._lock:
+            pending = self._pending.pop((mode, normalize(idea)), None)
+        if pending is not None:
+            pending[2].set_result(None)
+
+    def nearest(self, idea: str, mode: str = "") -> Optional[Match]:
+        """The most similar idea of `mode`, or None if there is none.
+
+        Ideas still being expanded are matched too, see `Match.pending`.
+        """
+        if not self.enabled:
+            return None
+        signature = self.signature(idea)
+        with self._lock:
+            best = None
+            mode_id = self._mode_ids.get(mode)
+            if mode_id is not None:
+                rows = len(self._entries)
+                similarities = (self._signatures[:rows] == signature).mean(axis=1)
+                similarities[self._modes[:rows] != mode_id] = -1.0
+                position = int(similarities.argmax())
+                if similarities[position] >= 0:
+                    entry = self._entries[position]
+                    best = Match(
+                        idea=entry["idea"],
+                        prompt=entry["prompt"],
+                        similarity=float(similarities[position]),
+                        seconds=entry["seconds"],
+                    )
+            for key, (other, other_signature, future) in self._pending.items():
+                if key[0] != mode:
+                    continue
+                similarity = float((other_signature == signature).mean())
+                if best is None or similarity > best.similarity:
+                    best = Match(
+                        idea=other,
+                        prompt="",
+                        similarity=similarity,
+                        seconds=0.0,
+                        pending=future,
+                    )
+        return best
+
+    def record(self, outcome: str, seconds_saved: float = 0.0) -> None:
+        """Counts a lookup's outcome: "reused", "adapted" or "expanded"."""
+        with self._lock:
+            self.outcomes[outcome] += 1
+            self.seconds_saved += max(seconds_saved, 0.0)
+
+    @property
+    def stats(self) -> dict:
+        """Outcomes, the share of lookups that avoided an expansion and the time saved."""
+        with self._lock:
+            total = sum(self.outcomes.values())
+            hits = self.outcomes["reused"] + self.outcomes["adapted"]
+            return {
+                "ideas": len(self._entries),
+                **self.outcomes,
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+                "seconds_saved": round(self.seconds_saved, 1),
+            }
@@ -0,0 +1,120 @@
+"""Incremental parsing of a streamed JSON object, one array item at a time.
+
+Structured output streamed with `generate_content_stream` arrives as text
+chunks that are not valid JSON until the very end. `ArrayItemStream` scans
+the chunks as they come in and reports every item of the object's top-level
+arrays as soon as the item is closed, plus the whole array once the array is
+closed, e.g. for `{"characters": [...], "clips": [{...}, {...}]}`:
+
+    ("characters", 0, {...})
+    ("characters", None, [{...}])   # the complete array
+    ("clips", 0, {...})
+    ("clips", 1, {...})
+    ("clips", None, [{...}, {...}])
+
+Example:
+    parser = ArrayItemStream()
+    for chunk in client.models.generate_content_stream(...):
+        for key, index, value in parser.feed(chunk.text):
+            ...
+    data = parser.result()
+"""
+
+import json
+from typing import Any, Optional
+
+
+class ArrayItemStream:
+    """Reports the items of a JSON object's top-level arrays as they close."""
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._item_start: Optional[int] = None
+        self._items: dict[str, list] = {}
+
+    @property
+    def text(self) -> str:
+        """All text fed so far."""
+        return self._buffer
+
+    def feed(self, text: str) -> list[tuple[str, Optional[int], Any]]:
+        """Consumes a chunk and returns the events it completed.
+
+        Returns:
+            (key, index, item) for every closed item of the array at `key`,
+            and (key, None, items) when the array itself is closed.
+        """
+        self._buffer += text
+        events = []
+        buffer, stack = self._buffer, self._stack
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(stack) == 1 and self._expect_key:
+                        self._key = json.loads(buffer[self._string_start : pos + 1])
+                        self._expect_key = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+                if len(stack) == 2 and stack[1] == "[" and self._item_start is None:
+                    self._item_start = pos
+            elif char in "{[":
+                stack.append(char)
+                if len(stack) == 1:
+                    self._expect_key = True
+                elif len(stack) == 2 and char == "[":
+                    self._items[self._key] = []
+                elif len(stack) == 3 and stack[1] == "[":
+                    self._item_start = pos
+            elif char in "}]":
+                stack.pop()
+                if len(stack) == 2 and stack[1] == "[":
+                    events.append(self._close_item(pos))
+                elif len(stack) == 1 and char == "]":
+                    if self._item_start is not None:
+                        # A scalar item directly before the closing bracket.
+                        events.append(self._close_item(pos - 1))
+                    events.append((self._key, None, self._items[self._key]))
+            elif char == ",":
+                if len(stack) == 1:
+                    self._expect_key = True
+                elif (
+                    len(stack) == 2 and stack[1] == "[" and self._item_start is not None
+                ):
+                    events.append(self._close_item(pos - 1))
+            elif (
+                not char.isspace()
+                and len(stack) == 2
+                and stack[1] == "["
+                and self._item_start is None
+            ):
+                # The start of a number, true, false or null item.
+                self._item_start = pos
+        self._pos = len(buffer)
+        return events
+
+    def _close_item(self, end: int) -> tuple[str, int, Any]:
+        value = json.loads(self._buffer[self._item_start : end + 1])
+        self._item_start = None
+        items = self._items[self._key]
+        items.append(value)
+        return self._key, len(items) - 1, value
+
+    def result(self) -> Any:
+        """Parses the complete text, raises if it is not valid JSON."""
+        return json.loads(self._buffer)
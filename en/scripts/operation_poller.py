@@ -0,0 +1,272 @@
+"""Shared poller for long-running genai operations such as Veo video jobs.
+
+Instead of every clip blocking its own thread with
+`while not operation.done: time.sleep(10)`, a single `OperationPoller` keeps
+track of many operations at once from one background thread. Each operation
+is polled on its own adaptive schedule (jittered exponential backoff, with an
+optional hint of how long the job is expected to take) and resolves a
+`concurrent.futures.Future`, which async code can await with `wait_async`.
+
+Example:
+    poller = OperationPoller(client)
+    operation = client.models.generate_videos(...)
+    operation = poller.submit(operation, timeout=600).result()
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _TrackedOperation:
+    operation: Any
+    future: Future
+    deadline: Optional[float]
+    attempt: int = 0
+    errors: int = 0
+    polls: int = 0
+    submitted_at: float = field(default_factory=time.monotonic)
+    # When a poll last found the operation still running.
+    last_pending_at: Optional[float] = None
+
+
+class OperationPoller:
+    """Polls many long-running operations from a single background thread.
+
+    Args:
+        client: The genai client used to refresh operations
+            (`client.operations.get`).
+        initial_interval: Seconds to wait before the first poll.
+        max_interval: Upper bound for the interval between two polls.
+        multiplier: Factor the interval grows by after every unfinished poll.
+        jitter: Relative random jitter applied to every interval (0.2 = ±20%),
+            so that many jobs submitted together are not polled in lockstep.
+        hint_fraction: When an `expected_duration` is given, the first poll
+            happens after this fraction of it, then the backoff starts over
+            from `initial_interval`.
+        max_errors: How many consecutive failed polls of one operation are
+            tolerated before its future fails with the last error.
+    """
+
+    def __init__(
+        self,
+        client,
+        initial_interval: float = 1.0,
+        max_interval: float = 5.0,
+        multiplier: float = 1.5,
+        jitter: float = 0.2,
+        hint_fraction: float = 0.75,
+        max_errors: int = 3,
+    ):
+        self.client = client
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.hint_fraction = hint_fraction
+        self.max_errors = max_errors
+
+        self._queue: list[tuple[float, int, _TrackedOperation]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(
+        self,
+        operation,
+        timeout: Optional[float] = None,
+        expected_duration: Optional[float] = None,
+    ) -> Future:
+        """Starts tracking an operation.
+
+        Args:
+            operation: The operation returned by e.g. `generate_videos`.
+            timeout: Seconds after which the future fails with `TimeoutError`.
+            expected_duration: Roughly how long the job is expected to take,
+                used to skip pointless early polls.
+
+        Returns:
+            A future resolved with the finished operation. Cancelling the
+            future stops polling the operation. Once resolved, its `timings`
+            attribute holds the number of polls, `pending_seconds` (from
+            submitting until the last poll that found the job running) and
+            `poll_lag_seconds` (from that poll until the job was seen done,
+            an upper bound of the time lost to the polling interval).
+        """
+        future = Future()
+        if operation.done:
+            future.timings = {
+                "polls": 0,
+                "pending_seconds": 0.0,
+                "poll_lag_seconds": 0.0,
+            }
+            future.set_result(operation)
+            return future
+
+        now = time.monotonic()
+        tracked = _TrackedOperation(
+            operation=operation,
+            future=future,
+            deadline=now + timeout if timeout is not None else None,
+            submitted_at=now,
+        )
+        if expected_duration:
+            first_poll = now + expected_duration * self.hint_fraction
+        else:
+            first_poll = now + self._next_interval(tracked)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("OperationPoller is closed")
+            self._schedule(tracked, first_poll)
+            self._ensure_thread()
+        return future
+
+    async def wait_async(
+        self,
+        operation,
+        timeout: Optional[float] = None,
+        expected_duration: Optional[float] = None,
+    ):
+        """Awaitable version of `submit(...).result()`."""
+        return await asyncio.wrap_future(
+            self.submit(operation, timeout=timeout, expected_duration=expected_duration)
+        )
+
+    def wait(
+        self,
+        operation,
+        timeout: Optional[float] = None,
+        expected_duration: Optional[float] = None,
+    ):
+        """Blocks until the operation is done and returns the finished operation."""
+        return self.submit(
+            operation, timeout=timeout, expected_duration=expected_duration
+        ).result()
+
+    @property
+    def pending(self) -> int:
+        """The number of operations that are still being polled."""
+        with self._condition:
+            return sum(1 for _, _, t in self._queue if not t.future.done())
+
+    def close(self) -> None:
+        """Stops the poller and cancels every operation still pending."""
+        with self._condition:
+            self._closed = True
+            for _, _, tracked in self._queue:
+                tracked.future.cancel()
+            self._queue.clear()
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _next_interval(self, tracked: _TrackedOperation) -> float:
+        interval = min(
+            self.max_interval,
+            self.initial_interval * self.multiplier**tracked.attempt,
+        )
+        tracked.attempt += 1
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _schedule(self, tracked: _TrackedOperation, at: float) -> None:
+        if tracked.deadline is not None:
+            at = min(at, tracked.deadline)
+        heapq.heappush(self._queue, (at, next(self._counter), tracked))
+        self._condition.notify()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="operation-poller", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed and (
+                    not self._queue or self._queue[0][0] > time.monotonic()
+                ):
+                    timeout = (
+                        self._queue[0][0] - time.monotonic() if self._queue else None
+                    )
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+                _, _, tracked = heapq.heappop(self._queue)
+
+            # Poll outside of the lock so new operations can be submitted.
+            self._poll(tracked)
+
+    def _poll(self, tracked: _TrackedOperation) -> None:
+        if tracked.future.done():
+            return
+        now = time.monotonic()
+        if tracked.deadline is not None and now >= tracked.deadline:
+            self._resolve(
+                tracked,
+                error=TimeoutError(
+                    f"Operation {tracked.operation.name} did not finish within "
+                    f"{tracked.deadline - tracked.submitted_at:g}s"
+                ),
+            )
+            return
+
+        try:
+            tracked.operation = self.client.operations.get(tracked.operation)
+            tracked.polls += 1
+            tracked.errors = 0
+        except Exception as e:
+            tracked.errors += 1
+            if tracked.errors >= self.max_errors:
+                self._resolve(tracked, error=e)
+                return
+            logger.warning(f"Polling {tracked.operation.name} failed, retrying: {e}")
+        else:
+            if tracked.operation.done:
+                logger.info(
+                    f"Operation {tracked.operation.name} finished after "
+                    f"{time.monotonic() - tracked.submitted_at:.1f}s"
+                )
+                self._resolve(tracked)
+                return
+            tracked.last_pending_at = time.monotonic()
+
+        with self._condition:
+            if not self._closed:
+                self._schedule(tracked, time.monotonic() + self._next_interval(tracked))
+
+    @staticmethod
+    def _resolve(tracked: _TrackedOperation, error: Optional[BaseException] = None):
+        now = time.monotonic()
+        last_pending_at = tracked.last_pending_at or tracked.submitted_at
+        tracked.future.timings = {
+            "polls": tracked.polls,
+            "pending_seconds": last_pending_at - tracked.submitted_at,
+            "poll_lag_seconds": now - last_pending_at,
+        }
+        # The future may have been cancelled by the caller while we polled.
+        try:
+            if error is not None:
+                tracked.future.set_exception(error)
+            else:
+                tracked.future.set_result(tracked.operation)
+        except InvalidStateError:
+            pass
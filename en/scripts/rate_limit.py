@@ -0,0 +1,344 @@
+"""Per-model rate limiting and retries for the genai client.
+
+`RateLimitedClient` wraps a `genai.Client` and paces `models.generate_content`,
+`models.generate_images`, `models.generate_videos`, the start of
+`models.generate_content_stream` and `operations.get` (sync
+and `client.aio`) with a requests-per-minute token bucket per model. Retriable
+errors (429, 408 and 5xx responses, network errors) are retried with jittered
+exponential backoff, and a retry delay sent by the API pauses the whole bucket
+of that model, so parallel callers back off together instead of hammering the
+API. `generate_images` and `generate_videos` create billed outputs, a timeout
+or 5xx may arrive after they did, so they are only retried after a 429 or a
+failed connection. Everything else, e.g. the `files` API, is passed through
+unchanged.
+
+Example:
+    client = RateLimitedClient(genai.Client(), rpm={"veo-3.0-*": 10})
+    client.models.generate_videos(model="veo-3.0-generate-preview", ...)
+    print(client.stats)
+"""
+
+import asyncio
+import fnmatch
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Optional
+
+import httpx
+from google.genai import errors
+
+logger = logging.getLogger(__name__)
+
+# Requests per minute, matched with fnmatch patterns against the model name.
+# `operations` is the bucket shared by all `operations.get` polls. Adjust these
+# to the quota of your project.
+DEFAULT_RPM = {
+    "gemini-2.5-pro": 150,
+    "gemini-2.5-flash": 1000,
+    "gemini-2.0-flash-preview-image-generation": 100,
+    "imagen-*": 20,
+    "veo-*": 10,
+    "operations": 300,
+}
+
+RETRIABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Errors that leave no doubt that the request was not processed.
+CONNECTION_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class TokenBucket:
+    """A thread-safe token bucket refilled at `rpm` tokens per minute.
+
+    Implemented as a schedule of send slots: every caller reserves the next
+    free slot and sleeps until it, so waiting callers are served in order
+    and the rate never exceeds the ceiling, even right after a pause.
+
+    Args:
+        rpm: Requests per minute.
+        burst: How many requests may be sent back to back after idling.
+    """
+
+    def __init__(self, rpm: float, burst: int = 1):
+        self.interval = 60 / rpm
+        self.burst = burst
+        self._next_slot = time.monotonic()
+        self._paused_until = 0.0
+        self._pauses = 0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> tuple[float, int]:
+        """Takes the next free slot.
+
+        Returns:
+            How many seconds to wait for the slot, and the pause counter at
+            the time of the reservation.
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now - (self.burst - 1) * self.interval)
+            self._next_slot = slot + self.interval
+            return max(0.0, slot - now), self._pauses
+
+    def pause(self, seconds: float) -> None:
+        """Holds back every request of this bucket for `seconds`.
+
+        Callers that reserved a slot before the pause reserve a new one after
+        it, so requests are spread out again instead of all firing at once.
+        """
+        with self._lock:
+            # Slots handed out so far are void, the schedule restarts after
+            # the (longest) pause.
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._next_slot = self._paused_until
+            self._pauses += 1
+
+    def acquire(self) -> float:
+        """Blocks until the caller may send a request, returns the time waited."""
+        waited = 0.0
+        while True:
+            wait, pauses = self.reserve()
+            time.sleep(wait)
+            waited += wait
+            if pauses == self._pauses:
+                return waited
+
+    async def acquire_async(self) -> float:
+        """Async version of `acquire`."""
+        waited = 0.0
+        while True:
+            wait, pauses = self.reserve()
+            await asyncio.sleep(wait)
+            waited += wait
+            if pauses == self._pauses:
+                return waited
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Returns the retry delay the API asked for, if any.
+
+    Looks at the `Retry-After` header and at the `RetryInfo.retryDelay`
+    (e.g. "17s") in the error details that Gemini sends with 429 responses.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    header = headers.get("retry-after")
+    if header is not None and re.fullmatch(r"\d+(\.\d+)?", header.strip()):
+        return float(header)
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []) or []:
+            if str(detail.get("@type", "")).endswith("RetryInfo"):
+                match = re.fullmatch(r"([\d.]+)s", str(detail.get("retryDelay", "")))
+                if match:
+                    return float(match[1])
+    return None
+
+
+def is_retriable(error: Exception) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code in RETRIABLE_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+def is_retriable_create(error: Exception) -> bool:
+    """Whether a request that creates images or a video job may be sent again.
+
+    Only if it was rate limited or never reached the server, so a retry
+    cannot create (and bill) the same output twice.
+    """
+    if isinstance(error, errors.APIError):
+        return error.code == 429
+    return isinstance(error, CONNECTION_ERRORS)
+
+
+class RateLimitedClient:
+    """Wraps a genai client with per-model rate limits and retries.
+
+    Args:
+        client: The `genai.Client` to wrap.
+        rpm: Requests per minute per model pattern. Models without a matching
+            pattern are not rate limited but still retried.
+        max_attempts: How often a request is tried before the error is raised.
+        base_delay: The first backoff delay in seconds, doubled every retry.
+        max_delay: Upper bound of a single backoff delay.
+    """
+
+    def __init__(
+        self,
+        client,
+        rpm: dict[str, float] = DEFAULT_RPM,
+        max_attempts: int = 6,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+    ):
+        self._client = client
+        self.rpm = rpm
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._buckets: dict[str, Optional[TokenBucket]] = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            name: Counter()
+            for name in ("requests", "retries", "rate_limited", "failures")
+        }
+        self.throttled_seconds = Counter()
+
+        self.models = _Models(self, client.models, is_async=False)
+        self.operations = _Operations(self, client.operations, is_async=False)
+        self.aio = _Aio(self, client.aio)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    @property
+    def stats(self) -> dict:
+        """Per-model counters of requests, retries, 429s, failures and waiting time."""
+        with self._lock:
+            stats = {name: dict(counter) for name, counter in self.counters.items()}
+            stats["throttled_seconds"] = {
+                k: round(v, 2) for k, v in self.throttled_seconds.items()
+            }
+        return stats
+
+    def bucket(self, key: str) -> Optional[TokenBucket]:
+        with self._lock:
+            if key not in self._buckets:
+                rpm = next(
+                    (n for p, n in self.rpm.items() if fnmatch.fnmatch(key, p)), None
+                )
+                self._buckets[key] = TokenBucket(rpm) if rpm else None
+            return self._buckets[key]
+
+    def _count(self, name: str, key: str, value: float = 1) -> None:
+        with self._lock:
+            if name == "throttled_seconds":
+                self.throttled_seconds[key] += value
+            else:
+                self.counters[name][key] += value
+
+    def _backoff(
+        self, key: str, error: Exception, attempt: int, retriable=is_retriable
+    ) -> Optional[float]:
+        """Returns the delay before the next attempt, or None to give up."""
+        if not retriable(error) or attempt >= self.max_attempts:
+            self._count("failures", key)
+            return None
+        self._count("retries", key)
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay *= random.uniform(0.5, 1.5)
+        if getattr(error, "code", None) == 429:
+            self._count("rate_limited", key)
+            hint = retry_after(error)
+            if hint is not None:
+                delay = hint * random.uniform(1.0, 1.2)
+                bucket = self.bucket(key)
+                if bucket is not None:
+                    bucket.pause(delay)
+        logger.warning(f"{key} request failed ({error}), retrying in {delay:.1f}s")
+        return delay
+
+    def call(self, key: str, fn, *args, retriable=is_retriable, **kwargs):
+        """Calls `fn` paced by the bucket of `key`, retrying `retriable` errors."""
+        bucket = self.bucket(key)
+        for attempt in range(1, self.max_attempts + 1):
+            if bucket is not None:
+                self._count("throttled_seconds", key, bucket.acquire())
+            self._count("requests", key)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._backoff(key, e, attempt, retriable)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def call_async(self, key: str, fn, *args, retriable=is_retriable, **kwargs):
+        """Async version of `call`."""
+        bucket = self.bucket(key)
+        for attempt in range(1, self.max_attempts + 1):
+            if bucket is not None:
+                self._count("throttled_seconds", key, await bucket.acquire_async())
+            self._count("requests", key)
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._backoff(key, e, attempt, retriable)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+
+class _Wrapped:
+    """Base for the wrapped client sections, passing unknown attributes on."""
+
+    def __init__(self, limiter: RateLimitedClient, wrapped, is_async: bool):
+        self._limiter = limiter
+        self._wrapped = wrapped
+        self._is_async = is_async
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._wrapped, name)
+
+    def _call(self, key: str, method: str, *args, retriable=is_retriable, **kwargs):
+        fn = getattr(self._wrapped, method)
+        if self._is_async:
+            return self._limiter.call_async(
+                key, fn, *args, retriable=retriable, **kwargs
+            )
+        return self._limiter.call(key, fn, *args, retriable=retriable, **kwargs)
+
+
+class _Models(_Wrapped):
+    def _model_call(self, method: str, *args, retriable=is_retriable, **kwargs):
+        model = kwargs.get("model", args[0] if args else "unknown")
+        return self._call(model, method, *args, retriable=retriable, **kwargs)
+
+    def generate_content(self, *args, **kwargs):
+        return self._model_call("generate_content", *args, **kwargs)
+
+    def generate_images(self, *args, **kwargs):
+        return self._model_call(
+            "generate_images", *args, retriable=is_retriable_create, **kwargs
+        )
+
+    def generate_videos(self, *args, **kwargs):
+        return self._model_call(
+            "generate_videos", *args, retriable=is_retriable_create, **kwargs
+        )
+
+    def generate_content_stream(self, *args, **kwargs):
+        """Paces the stream request and retries it until the first chunk.
+
+        Once chunks were handed out, a failure is raised to the caller: the
+        stream cannot be resumed where it broke off.
+        """
+        if self._is_async:
+            # The async stream is passed through without pacing.
+            return self._wrapped.generate_content_stream(*args, **kwargs)
+
+        def start():
+            stream = iter(self._wrapped.generate_content_stream(*args, **kwargs))
+            first = next(stream, None)
+            return itertools.chain([] if first is None else [first], stream)
+
+        model = kwargs.get("model", args[0] if args else "unknown")
+        return self._limiter.call(model, start)
+
+
+class _Operations(_Wrapped):
+    def get(self, *args, **kwargs):
+        return self._call("operations", "get", *args, **kwargs)
+
+
+class _Aio(_Wrapped):
+    def __init__(self, limiter: RateLimitedClient, aio):
+        super().__init__(limiter, aio, is_async=True)
+        self.models = _Models(limiter, aio.models, is_async=True)
+        self.operations = _Operations(limiter, aio.operations, is_async=True)
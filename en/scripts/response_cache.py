@@ -0,0 +1,296 @@
+"""Persistent, content-addressed cache for Gemini text responses.
+
+Prompt-expansion calls such as `generate_scenes` or `generate_json_from_idea`
+are the slowest and most expensive step of the sample pipelines, and they are
+re-run with the exact same inputs while the downstream stages are tuned. The
+cache stores the response text in a small sqlite database keyed by a hash of
+the model, the prompt and the full generation config (which includes the
+`response_json_schema`), so an unchanged request is answered locally.
+
+Example:
+    cache = ResponseCache()
+    text = cache.generate_text(
+        client, model="gemini-2.5-pro", contents=prompt, config=config
+    )
+    print(cache.stats)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get("GENAI_CACHE_DIR", os.path.expanduser("~/.cache/gemini-samples")),
+    "responses.sqlite",
+)
+
+
+def _canonical(value: Any) -> Any:
+    """Converts pydantic objects (e.g. GenerateContentConfig) into plain JSON data."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+class ResponseCache:
+    """An on-disk cache of response texts with TTL and LRU eviction.
+
+    Args:
+        path: The sqlite database file. The parent directory is created.
+        ttl: Seconds an entry stays valid. None keeps entries forever.
+        max_bytes: Size cap of all stored responses. The least recently used
+            entries are evicted once it is exceeded.
+        enabled: If False, every lookup is a miss and nothing is stored.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl: Optional[float] = 7 * 24 * 3600,
+        max_bytes: int = 256 * 1024 * 1024,
+        enabled: bool = True,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses(accessed_at)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(model: str, contents: Any, config: Any = None, **extra: Any) -> str:
+        """Returns the cache key of a request.
+
+        Args:
+            model: The model name.
+            contents: The prompt contents.
+            config: The generation config, including any response schema.
+            **extra: Additional inputs that should invalidate the entry when
+                they change (e.g. a schema that is not part of the config).
+        """
+        payload = json.dumps(
+            _canonical(
+                {"model": model, "contents": contents, "config": config, **extra}
+            ),
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached value for `key`, or None on a miss."""
+        if not self.enabled:
+            self.misses += 1
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        """Stores `value` under `key` and evicts old entries above the size cap."""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def generate_text(
+        self,
+        client,
+        model: str,
+        contents: Any,
+        config: Any = None,
+        bypass: bool = False,
+        validate: Optional[Callable[[str], Any]] = None,
+    ) -> str:
+        """Returns `client.models.generate_content(...).text`, cached.
+
+        Args:
+            client: The genai client.
+            model: The model name.
+            contents: The prompt contents.
+            config: The generation config.
+            bypass: If True, always call the model and refresh the cache entry.
+            validate: Called with a fresh response text before it is stored.
+                If it raises, the response is not cached and the error is
+                propagated, so malformed output is never replayed.
+        """
+        key = self.key(model, contents, config)
+        if not bypass:
+            text = self.get(key)
+            if text is not None:
+                logger.info(f"Response cache hit for {model} ({key[:12]})")
+                tracing.annotate(cached=True)
+                return text
+
+        response = client.models.generate_content(
+            model=model, contents=contents, config=config
+        )
+        tracing.add_usage(response)
+        if response.text:
+            if validate is not None:
+                validate(response.text)
+            self.set(key, response.text)
+        return response.text
+
+    async def generate_text_async(
+        self,
+        client,
+        model: str,
+        contents: Any,
+        config: Any = None,
+        bypass: bool = False,
+        validate: Optional[Callable[[str], Any]] = None,
+    ) -> str:
+        """Async version of `generate_text`, with `client.aio`."""
+        key = self.key(model, contents, config)
+        if not bypass:
+            text = self.get(key)
+            if text is not None:
+                logger.info(f"Response cache hit for {model} ({key[:12]})")
+                tracing.annotate(cached=True)
+                return text
+
+        response = await client.aio.models.generate_content(
+            model=model, contents=contents, config=config
+        )
+        tracing.add_usage(response)
+        if response.text:
+            if validate is not None:
+                validate(response.text)
+            self.set(key, response.text)
+        return response.text
+
+    def generate_text_stream(
+        self,
+        client,
+        model: str,
+        contents: Any,
+        config: Any = None,
+        bypass: bool = False,
+        validate: Optional[Callable[[str], Any]] = None,
+    ) -> Iterator[str]:
+        """Yields the text chunks of `client.models.generate_content_stream`, cached.
+
+        A cached response is yielded as a single chunk. A streamed response
+        is only stored once it is complete (and valid), with the same key as
+        `generate_text`, so both share their entries.
+        """
+        key = self.key(model, contents, config)
+        if not bypass:
+            text = self.get(key)
+            if text is not None:
+                logger.info(f"Response cache hit for {model} ({key[:12]})")
+                tracing.annotate(cached=True)
+                yield text
+                return
+
+        chunks = []
+        for chunk in client.models.generate_content_stream(
+            model=model, contents=contents, config=config
+        ):
+            tracing.add_usage(chunk)
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
+        text = "".join(chunks)
+        if text:
+            if validate is not None:
+                validate(text)
+            self.set(key, text)
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    @property
+    def stats(self) -> dict:
+        """Hit/miss counters of this process and the current size of the cache."""
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def _evict(self) -> None:
+        if self.ttl is not None:
+            self.evictions += self._db.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+        (size,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if size <= self.max_bytes:
+            return
+        # Drop the least recently used entries until we are below the cap.
+        for key, entry_size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall():
+            if size <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            size -= entry_size
+            self.evictions += 1
@@ -0,0 +1,167 @@
+"""Compact per-scene prompts for the image edit and Veo requests.
+
+Every scene used to be sent as `json.dumps({"characters": ..., "clips": [clip]})`:
+the full profile of every character, null fields and default values such as
+`"format": "wav", "sample_rate_hz": 48000`. `scene_prompt` drops null and
+empty values, drops fields of the given models that still have their default
+value, keeps only the characters the clip mentions and serializes the result
+in one of these encodings:
+
+    legacy  the original prompt, for comparison
+    json    minified JSON
+    yaml    indented `key: value` lines without quotes or braces
+
+Example:
+    prompt = scene_prompt(script, 0, encoding="yaml", drop_defaults=(Clip, AudioTrack))
+"""
+
+import functools
+import json
+import re
+from typing import Any, Iterable, Optional, Union
+
+from pydantic import BaseModel
+
+ENCODINGS = ("legacy", "json", "yaml")
+
+
+@functools.cache
+def model_defaults(model: type[BaseModel]) -> dict[str, Any]:
+    """The default values of a model's fields that have one other than None."""
+    return {
+        name: field.default
+        for name, field in model.model_fields.items()
+        if not field.is_required() and field.default is not None
+    }
+
+
+def _nested_models(model: type[BaseModel]) -> dict[str, type[BaseModel]]:
+    return {
+        name: field.annotation
+        for name, field in model.model_fields.items()
+        if isinstance(field.annotation, type)
+        and issubclass(field.annotation, BaseModel)
+    }
+
+
+def prune(value: Any, model: Optional[type[BaseModel]], drop_defaults=()) -> Any:
+    """Removes None and empty values, and defaults of the `drop_defaults` models.
+
+    Args:
+        value: A JSON value, e.g. a clip of the script.
+        model: The model `value` was generated from, used to find the models
+            of nested objects.
+        drop_defaults: Models whose fields are dropped when they equal the
+            field's default.
+    """
+    if isinstance(value, list):
+        return [prune(item, model, drop_defaults) for item in value]
+    if not isinstance(value, dict):
+        return value
+
+    nested = _nested_models(model) if model is not None else {}
+    defaults = model_defaults(model) if model in drop_defaults else {}
+    pruned = {}
+    for key, item in value.items():
+        item = prune(item, nested.get(key), drop_defaults)
+        if item is None or item == {} or item == [] or item == "":
+            continue
+        if key in defaults and item == defaults[key]:
+            continue
+        pruned[key] = item
+    return pruned
+
+
+# Name tokens that say nothing about which character is meant.
+NAME_STOP_WORDS = frozenset("a an and dr mr mrs ms miss of prof sir the".split())
+
+
+def _name_tokens(name: str) -> set[str]:
+    tokens = set(re.findall(r"\w+", name.lower()))
+    return tokens - NAME_STOP_WORDS or tokens
+
+
+def referenced_characters(characters: list[dict], clip: dict) -> list[dict]:
+    """The characters the clip mentions, or all if it mentions none.
+
+    A character is mentioned by any whole word of its name, so "Sarah" and
+    "Chen" both refer to "Dr. Sarah Chen" and "Kaelen" to "Kaelen the
+    Shadowmancer", but "Al" is not found in "also".
+    """
+    words = set(re.findall(r"\w+", json.dumps(clip, ensure_ascii=False).lower()))
+    referenced = [
+        c for c in characters if c.get("name") and _name_tokens(c["name"]) & words
+    ]
+    return referenced or characters
+
+
+def to_yaml(value: Any, indent: int = 0) -> str:
+    """Serializes JSON data as YAML-like `key: value` lines for a prompt."""
+    pad = "  " * indent
+    if isinstance(value, dict):
+        lines = []
+        for key, item in value.items():
+            if isinstance(item, (dict, list)) and item:
+                lines.append(f"{pad}{key}:\n{to_yaml(item, indent + 1)}")
+            else:
+                lines.append(f"{pad}{key}: {_scalar(item)}")
+        return "\n".join(lines)
+    if isinstance(value, list):
+        lines = []
+        for item in value:
+            if isinstance(item, dict) and item:
+                # The first key goes on the dash line, the rest is aligned to it.
+                nested = to_yaml(item, indent + 1)
+                lines.append(f"{pad}- {nested.lstrip()}")
+            else:
+                lines.append(f"{pad}- {_scalar(item)}")
+        return "\n".join(lines)
+    return f"{pad}{_scalar(value)}"
+
+
+def _scalar(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "null"
+    return " ".join(str(value).split())
+
+
+def scene_prompt(
+    script: Union[dict, BaseModel],
+    n: int,
+    encoding: str = "json",
+    clip_model: Optional[type[BaseModel]] = None,
+    drop_defaults: Iterable[type[BaseModel]] = (),
+) -> str:
+    """Returns the prompt for scene `n`: its characters plus that single clip.
+
+    Args:
+        script: The video script with `characters` and `clips`, as JSON data
+            or as the validated model (fields it was not given are left out).
+        n: The index of the clip.
+        encoding: One of ENCODINGS.
+        clip_model: The model of a clip, used to find nested models.
+        drop_defaults: Models whose fields are left out at their default.
+    """
+    if isinstance(script, BaseModel):
+        script = script.model_dump(mode="json", exclude_unset=True)
+    clip = script["clips"][n]
+    if encoding == "legacy":
+        return json.dumps({"characters": script["characters"], "clips": [clip]})
+
+    clip = prune(clip, clip_model, tuple(drop_defaults))
+    data = {
+        "characters": prune(referenced_characters(script["characters"], clip), None),
+        "clips": [clip],
+    }
+    if encoding == "json":
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    if encoding == "yaml":
+        return to_yaml(data)
+    raise ValueError(f"Unknown prompt encoding {encoding!r}, use one of {ENCODINGS}")
+
+
+def estimate_tokens(text: str) -> int:
+    """A rough token count (about four characters per token) for offline reports."""
+    return len(text) // 4 + 1
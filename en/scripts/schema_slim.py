@@ -0,0 +1,75 @@
+"""Slimmed JSON schemas for structured output.
+
+`model_json_schema()` includes every field description, and the descriptions
+of `VideoSchema` carry long lists of examples. The schema is sent with every
+request as `response_json_schema` and counts as input tokens. `json_schema`
+returns the schema of a model at one of these verbosity levels, generated
+once per process:
+
+    full   the schema as pydantic generates it
+    short  descriptions without their examples, no titles
+    types  only the structure: types, required fields, enums and references
+
+Example:
+    config = types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_json_schema=json_schema(VideoSchema, "short"),
+    )
+"""
+
+import functools
+from typing import Any
+
+from pydantic import BaseModel
+
+VERBOSITY_LEVELS = ("full", "short", "types")
+
+# Keywords that only describe a schema, everything else constrains it.
+_ANNOTATIONS = {
+    "short": {"title", "examples"},
+    "types": {"title", "examples", "description", "default"},
+}
+
+
+@functools.cache
+def json_schema(model: type[BaseModel], verbosity: str = "full") -> dict:
+    """Returns the JSON schema of `model` at a verbosity level.
+
+    The result is cached, treat it as read-only.
+    """
+    if verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(
+            f"Unknown schema verbosity {verbosity!r}, use one of {VERBOSITY_LEVELS}"
+        )
+    schema = model.model_json_schema()
+    if verbosity == "full":
+        return schema
+    return _slim(schema, verbosity)
+
+
+def short_description(description: str) -> str:
+    """Cuts the examples off a description, keeping its instructions."""
+    return description.split("Examples:")[0].strip()
+
+
+def _slim(schema: Any, verbosity: str) -> Any:
+    if isinstance(schema, list):
+        return [_slim(item, verbosity) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+
+    slim = {}
+    for key, value in schema.items():
+        if key in _ANNOTATIONS[verbosity]:
+            continue
+        if key == "description":
+            value = short_description(value)
+            if not value:
+                continue
+        elif key in ("properties", "$defs"):
+            # Keys of these are names, not keywords.
+            value = {name: _slim(sub, verbosity) for name, sub in value.items()}
+        else:
+            value = _slim(value, verbosity)
+        slim[key] = value
+    return slim
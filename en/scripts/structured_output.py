@@ -0,0 +1,79 @@
+"""Validation and cheap repair of structured model output.
+
+Structured output is usually valid JSON, but now and then the model wraps it
+in a Markdown code fence, adds a sentence before or after it, or misses a
+required field. `parse` validates the text against a pydantic model in one
+pass with `model_validate_json` and, only if that fails, retries once on the
+text with the fence and the surrounding prose cut off. What still does not
+validate is raised, and `feedback` summarizes the errors for a follow-up
+request.
+
+Example:
+    try:
+        script = parse(VideoSchema, response.text)
+    except ValidationError as e:
+        contents += f"\nYour previous answer was invalid: {feedback(e)}"
+"""
+
+import functools
+import re
+from typing import Any
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+
+
+@functools.cache
+def type_adapter(tp: Any) -> TypeAdapter:
+    """A TypeAdapter for `tp`, e.g. `list[Clip]`, built once per process."""
+    return TypeAdapter(tp)
+
+
+def repair_json(text: str) -> str:
+    """Cuts a JSON object out of a code fence and the prose around it."""
+    match = _FENCE.search(text)
+    if match:
+        text = match[1]
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        return text
+    return text[start : end + 1]
+
+
+def parse(model: Any, text: str) -> Any:
+    """Validates JSON `text` against a pydantic model or any other type.
+
+    Args:
+        model: A pydantic model, or a type such as `list[Clip]` that is
+            validated with a cached TypeAdapter.
+        text: The response text.
+
+    Returns:
+        The validated object.
+
+    Raises:
+        ValidationError: If the text is not valid, not even after repair.
+    """
+    if isinstance(model, type) and issubclass(model, BaseModel):
+        validate_json = model.model_validate_json
+    else:
+        validate_json = type_adapter(model).validate_json
+    try:
+        return validate_json(text)
+    except ValidationError:
+        repaired = repair_json(text)
+        if repaired == text:
+            raise
+    return validate_json(repaired)
+
+
+def feedback(error: ValidationError, max_errors: int = 10) -> str:
+    """A compact list of validation errors, to send back to the model."""
+    lines = [
+        f"{'.'.join(str(part) for part in e['loc']) or 'root'}: {e['msg']}"
+        for e in error.errors()[:max_errors]
+    ]
+    if error.error_count() > max_errors:
+        lines.append(f"... and {error.error_count() - max_errors} more errors")
+    return "; ".join(lines)
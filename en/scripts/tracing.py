@@ -0,0 +1,357 @@
+"""Lightweight stage-level tracing for the generation pipelines.
+
+Spans record the wall time of a stage plus attributes such as bytes written
+and the token counts from `usage_metadata`. While a `Tracer` is active (see
+`trace`), every finished span is appended to `trace.jsonl` in the output
+directory, and optionally all spans of the run are written as a Chrome trace
+(`trace.json`, open it in chrome://tracing or https://ui.perfetto.dev).
+
+Tracing is off unless `trace` is given a mode or `GENAI_TRACE` is set to
+"jsonl" or "chrome". When it is off, `span` returns a shared no-op object and
+`traced` functions only pay for one context variable lookup.
+
+Example:
+    @tracing.traced("generate_image")
+    def generate_image(prompt):
+        response = client.models.generate_images(...)
+        tracing.annotate(bytes=len(response.generated_images[0].image.image_bytes))
+
+    with tracing.trace("videos/my-vlog", mode="chrome") as tracer:
+        generate_image("A cat")
+    print(tracer.summary())
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ("jsonl", "chrome")
+
+# usage_metadata fields recorded on spans, under shorter names.
+USAGE_FIELDS = {
+    "prompt_token_count": "prompt_tokens",
+    "candidates_token_count": "output_tokens",
+    "thoughts_token_count": "thinking_tokens",
+    "cached_content_token_count": "cached_tokens",
+    "total_token_count": "total_tokens",
+}
+
+_tracer: contextvars.ContextVar[Optional["Tracer"]] = contextvars.ContextVar(
+    "tracer", default=None
+)
+_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "span", default=None
+)
+
+
+class Span:
+    """A timed stage. Use it as a context manager, usually through `span`."""
+
+    __slots__ = (
+        "tracer",
+        "name",
+        "id",
+        "parent",
+        "attrs",
+        "start",
+        "seconds",
+        "_perf_start",
+        "_token",
+    )
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.id = next(tracer._ids)
+        self.parent = None
+        self.attrs = attrs
+        self.start = 0.0
+        self.seconds = 0.0
+
+    def set(self, **attrs) -> None:
+        """Sets attributes of the span."""
+        self.attrs.update(attrs)
+
+    def add(self, **values: float) -> None:
+        """Adds to numeric attributes, e.g. `span.add(bytes=len(data))`."""
+        for key, value in values.items():
+            self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def add_usage(self, response) -> None:
+        """Adds the token counts of a response's `usage_metadata`."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        self.add(
+            **{
+                name: getattr(usage, field)
+                for field, name in USAGE_FIELDS.items()
+                if getattr(usage, field, None)
+            }
+        )
+
+    def __enter__(self) -> "Span":
+        parent = _span.get()
+        self.parent = parent.id if parent is not None else None
+        self._token = _span.set(self)
+        self.start = time.time()
+        self._perf_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.seconds = time.perf_counter() - self._perf_start
+        _span.reset(self._token)
+        if exc is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._record(self)
+
+
+class _NoopSpan:
+    """Stands in for a span while tracing is off."""
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def add(self, **values) -> None:
+        pass
+
+    def add_usage(self, response) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Collects the spans of one run and writes them to `output_dir`.
+
+    Args:
+        output_dir: The directory to write `trace.jsonl` (and `trace.json`) to.
+        chrome: If True, also write all spans as a Chrome trace on `close`.
+    """
+
+    def __init__(self, output_dir: str, chrome: bool = False):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.chrome = chrome
+        self.run_id = uuid.uuid4().hex[:12]
+        self.spans: list[dict] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._file = open(os.path.join(output_dir, "trace.jsonl"), "a")
+
+    def span(self, name: str, **attrs) -> Span:
+        return Span(self, name, attrs)
+
+    def record(self, name: str, start: float, seconds: float, **attrs) -> None:
+        """Records a span measured elsewhere, e.g. by the operation poller.
+
+        Args:
+            name: The span name.
+            start: The start as a `time.time()` timestamp.
+            seconds: The duration.
+        """
+        parent = _span.get()
+        self._write(
+            {
+                "name": name,
+                "id": next(self._ids),
+                "parent": parent.id if parent is not None else None,
+                "start": start,
+                "seconds": seconds,
+                **attrs,
+            }
+        )
+
+    def _record(self, span: Span) -> None:
+        self._write(
+            {
+                "name": span.name,
+                "id": span.id,
+                "parent": span.parent,
+                "start": span.start,
+                "seconds": span.seconds,
+                **span.attrs,
+            }
+        )
+
+    def _write(self, record: dict) -> None:
+        # Concurrent scenes run as asyncio tasks on one thread, give every
+        # task its own lane so their spans do not overlap in the Chrome trace.
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        lane = task.get_name() if task is not None else threading.current_thread().name
+        record = {"run": self.run_id, "lane": lane, **record}
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self.spans.append(record)
+            self._file.write(line + "\n")
+
+    def summary(self) -> dict[str, dict]:
+        """Count, total seconds and summed numeric attributes per span name."""
+        totals = defaultdict(lambda: defaultdict(float))
+        with self._lock:
+            spans = list(self.spans)
+        for record in spans:
+            total = totals[record["name"]]
+            total["count"] += 1
+            for key, value in record.items():
+                if key in ("id", "parent", "start"):
+                    continue
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    total[key] += value
+        return {
+            name: {k: round(v, 3) for k, v in total.items()}
+            for name, total in totals.items()
+        }
+
+    def chrome_trace(self) -> dict:
+        """Returns the spans in the Chrome trace event format."""
+        with self._lock:
+            spans = list(self.spans)
+        origin = min((s["start"] for s in spans), default=0.0)
+        lanes = {}
+        events = []
+        for record in spans:
+            tid = lanes.setdefault(record["lane"], len(lanes) + 1)
+            events.append(
+                {
+                    "name": record["name"],
+                    "ph": "X",
+                    "pid": 1,
+                    "tid": tid,
+                    "ts": (record["start"] - origin) * 1e6,
+                    "dur": record["seconds"] * 1e6,
+                    "args": {
+                        k: v
+                        for k, v in record.items()
+                        if k not in ("name", "start", "seconds", "lane")
+                    },
+                }
+            )
+        events.extend(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": 1,
+                "tid": tid,
+                "args": {"name": lane},
+            }
+            for lane, tid in lanes.items()
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+        if self.chrome:
+            path = os.path.join(self.output_dir, "trace.json")
+            with open(path + ".tmp", "w") as f:
+                json.dump(self.chrome_trace(), f, default=str)
+            os.replace(path + ".tmp", path)
+
+
+@contextlib.contextmanager
+def trace(output_dir: str, mode: Optional[str] = None):
+    """Activates a `Tracer` for `output_dir` in the current context.
+
+    Args:
+        output_dir: The directory to write the trace files to.
+        mode: "jsonl", "chrome" (JSONL plus Chrome trace) or None to read
+            the `GENAI_TRACE` environment variable. Anything else turns
+            tracing off.
+
+    Yields:
+        The tracer, or None if tracing is off.
+    """
+    if mode is None:
+        mode = os.environ.get("GENAI_TRACE", "").lower()
+    if mode not in MODES:
+        yield None
+        return
+
+    tracer = Tracer(output_dir, chrome=mode == "chrome")
+    token = _tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _tracer.reset(token)
+        tracer.close()
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _tracer.get()
+
+
+def span(name: str, **attrs):
+    """Returns a span to use as context manager, or a no-op if tracing is off."""
+    tracer = _tracer.get()
+    if tracer is None:
+        return NOOP_SPAN
+    return Span(tracer, name, attrs)
+
+
+def current_span():
+    """The innermost open span, or a no-op if there is none."""
+    return _span.get() or NOOP_SPAN
+
+
+def annotate(**attrs) -> None:
+    """Sets attributes of the innermost open span."""
+    current = _span.get()
+    if current is not None:
+        current.set(**attrs)
+
+
+def add_usage(response) -> None:
+    """Adds the token usage of a response to the innermost open span."""
+    current = _span.get()
+    if current is not None:
+        current.add_usage(response)
+
+
+def traced(name: str):
+    """Decorator that runs a (sync or async) function in a span called `name`."""
+
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if _tracer.get() is None:
+                    return await fn(*args, **kwargs)
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _tracer.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
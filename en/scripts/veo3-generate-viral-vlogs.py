@@ -17,12 +17,18 @@ Then, run the script from your terminal:
 """
 
 import os
-import time
 from google import genai
 from pydantic import BaseModel
-from moviepy import VideoFileClip, concatenate_videoclips
 
-client = genai.Client()
+import video_merge
+from operation_poller import OperationPoller
+from rate_limit import RateLimitedClient
+from response_cache import ResponseCache
+from video_download import download_video, generated_videos
+
+client = RateLimitedClient(genai.Client())
+poller = OperationPoller(client)
+response_cache = ResponseCache()
 
 
 class Scene(BaseModel):
@@ -43,6 +49,7 @@ def generate_scenes(
     video_characteristics: str = "vlogging, realistic, 4k, cinematic",
     camera_angle: str = "front",
     output_dir: str = "scenes",
+    bypass_cache: bool = False,
 ) -> list[Scene]:
     """Generates scene descriptions for a video based on an idea.
 
@@ -55,6 +62,7 @@ def generate_scenes(
         video_characteristics: The overall style of the video.
         camera_angle: The primary camera perspective.
         output_dir: The directory to save the generated scene descriptions.
+        bypass_cache: If True, ignore the response cache and call the model.
 
     Returns:
         A list of Scene objects, each containing a description for a scene.
@@ -151,15 +159,18 @@ Provide the output as a single, valid JSON object. The object must contain a sin
         video_characteristics=video_characteristics,
     )
 
-    response = client.models.generate_content(
+    text = response_cache.generate_text(
+        client,
         model="gemini-2.5-pro",
         contents=prompt,
         config=genai.types.GenerateContentConfig(
             response_mime_type="application/json",
             response_json_schema=SceneResponse.model_json_schema(),
         ),
+        bypass=bypass_cache,
+        validate=SceneResponse.model_validate_json,
     )
-    scenes = SceneResponse.model_validate_json(response.text).scenes
+    scenes = SceneResponse.model_validate_json(text).scenes
 
     with open(os.path.join(output_dir, "scenes.md"), "w") as f:
         for n, scene in enumerate(scenes):
@@ -209,14 +220,11 @@ def generate_video(
         ),
     )
     # Wait for videos to generate
-    while not operation.done:
-        print("Waiting for video to generate...")
-        time.sleep(10)
-        operation = client.operations.get(operation)
+    print("Waiting for video to generate...")
+    operation = poller.wait(operation)
 
-    for video in operation.response.generated_videos:
-        client.files.download(file=video.video)
-        video.video.save(path)
+    for video in generated_videos(operation):
+        download_video(video.video, path)
 
     return path
 
@@ -235,20 +243,9 @@ def merge_videos(
         The file path of the merged video.
     """
     os.makedirs(output_dir, exist_ok=True)
-    # Load each video clip
-    clips = [VideoFileClip(file) for file in video_files]
-
-    # Concatenate the video clips
-    final_clip = concatenate_videoclips(clips)
-
-    # Write the final video file
-    final_clip.write_videofile(
-        os.path.join(output_dir, output_file),
-        codec="libx264",
-        audio_codec="aac",
-    )
-
-    return os.path.join(output_dir, output_file)
+    # Stream copy when all clips share codec, resolution and frame rate,
+    # otherwise re-encode with MoviePy.
+    return video_merge.merge(video_files, os.path.join(output_dir, output_file))
 
 
 def generate_vlog(
@@ -0,0 +1,265 @@
+"""Chunked, resumable download of generated videos with integrity checks.
+
+`client.files.download(file=video)` buffers the whole MP4 in memory and
+`video.save(path)` then writes it in one go, so a failure halfway leaves a
+truncated `video_N.mp4` that later breaks the merge. `download` streams the
+file in bounded chunks to `<path>.part` while hashing it, resumes interrupted
+transfers with HTTP range requests, verifies the size (and optionally the
+sha256) and only then renames the file to its final name.
+
+A `<path>.part.json` next to the partial file records the URL and the ETag
+(or Last-Modified) it came from. A partial file is only resumed for the same
+URL, with an `If-Range` header, so a server whose file changed answers with
+the whole file. Anything else starts over.
+
+Example:
+    for video in generated_videos(operation):
+        download_video(video.video, "videos/video_0.mp4")
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class DownloadError(Exception):
+    """Raised when a file could not be downloaded completely and intact."""
+
+
+@dataclass
+class DownloadResult:
+    path: str
+    size: int
+    sha256: str
+    attempts: int
+
+
+def _hash_file(path: str) -> "hashlib._Hash":
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest
+
+
+def _total_size(response: httpx.Response) -> Optional[int]:
+    if response.status_code == 206:
+        content_range = response.headers.get("content-range", "")
+        total = content_range.rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get("content-length")
+    return int(length) if length is not None else None
+
+
+def _validator(response: httpx.Response) -> Optional[str]:
+    """The ETag, or else the Last-Modified date, that `If-Range` can check."""
+    etag = response.headers.get("etag")
+    if etag is not None and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("last-modified")
+
+
+def _resumable(part_path: str, url: str, resumed_here: bool) -> Optional[dict]:
+    """The source of the partial file if it can be resumed, else removes it.
+
+    A partial file written by an earlier call is only resumed if it came from
+    `url` and the server gave a validator for `If-Range`.
+    """
+    meta_path = part_path + ".json"
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    if os.path.exists(part_path):
+        if meta is not None and meta.get("url") == url:
+            if resumed_here or meta.get("validator") is not None:
+                return meta
+        logger.info(f"Discarding {part_path}, it is not from {url}")
+    _remove_part(part_path)
+    return None
+
+
+def _remove_part(part_path: str) -> None:
+    for stale in (part_path, part_path + ".json"):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+
+def _content_range_start(response: httpx.Response) -> Optional[int]:
+    start = response.headers.get("content-range", "").partition(" ")[2]
+    start = start.partition("-")[0]
+    return int(start) if start.isdigit() else None
+
+
+def download(
+    url: str,
+    path: str,
+    headers: Optional[dict] = None,
+    expected_sha256: Optional[str] = None,
+    chunk_size: int = CHUNK_SIZE,
+    max_attempts: int = 5,
+    backoff: float = 1.0,
+    timeout: float = 60.0,
+) -> DownloadResult:
+    """Streams `url` to `path`, resuming and retrying interrupted transfers.
+
+    Args:
+        url: The URL to download.
+        path: The final file path. Data is written to `<path>.part` first.
+        headers: Additional request headers, e.g. the API key.
+        expected_sha256: If given, the downloaded file must have this hash.
+        chunk_size: The size of the chunks read from the response.
+        max_attempts: How many requests are made before giving up.
+        backoff: Base delay in seconds between attempts, doubled every time.
+        timeout: Network timeout in seconds of a single read.
+
+    Returns:
+        The final path, size and sha256 of the file.
+
+    Raises:
+        DownloadError: If the file could not be downloaded intact.
+    """
+    part_path = path + ".part"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    last_error = None
+    # Whether this call wrote the partial file, which it may then resume
+    # even if the server has no validator.
+    resumed_here = False
+
+    for attempt in range(1, max_attempts + 1):
+        meta = _resumable(part_path, url, resumed_here)
+        offset = os.path.getsize(part_path) if meta is not None else 0
+        request_headers = dict(headers or {})
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+            if meta.get("validator") is not None:
+                request_headers["If-Range"] = meta["validator"]
+
+        try:
+            with httpx.stream(
+                "GET",
+                url,
+                headers=request_headers,
+                timeout=timeout,
+                follow_redirects=True,
+            ) as response:
+                if response.status_code == 416:
+                    # Our partial file does not fit the remote file any more.
+                    _remove_part(part_path)
+                    raise DownloadError("Range not satisfiable, restarting")
+                response.raise_for_status()
+
+                if response.status_code == 206:
+                    if _content_range_start(response) != offset:
+                        _remove_part(part_path)
+                        raise DownloadError("Unexpected range, restarting")
+                    digest = _hash_file(part_path)
+                    mode = "ab"
+                else:
+                    # A 200 is the whole file, e.g. because If-Range failed.
+                    digest, offset, mode = hashlib.sha256(), 0, "wb"
+                    with open(part_path + ".json", "w") as f:
+                        json.dump({"url": url, "validator": _validator(response)}, f)
+                resumed_here = True
+                total = _total_size(response)
+
+                received = offset
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_bytes(chunk_size):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        received += len(chunk)
+
+            if total is not None and received != total:
+                raise DownloadError(f"Received {received} of {total} bytes")
+        except (httpx.TransportError, httpx.HTTPStatusError, DownloadError) as e:
+            last_error = e
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status is not None and 400 <= status < 500 and status not in (408, 429):
+                raise DownloadError(f"Download of {url} failed: {e}") from e
+            if attempt < max_attempts:
+                delay = backoff * 2 ** (attempt - 1) * random.uniform(0.8, 1.2)
+                logger.warning(
+                    f"Download interrupted ({e}), resuming from "
+                    f"{os.path.getsize(part_path) if os.path.exists(part_path) else 0}"
+                    f" bytes in {delay:.1f}s"
+                )
+                time.sleep(delay)
+            continue
+
+        sha256 = digest.hexdigest()
+        if expected_sha256 is not None and sha256 != expected_sha256:
+            _remove_part(part_path)
+            last_error = DownloadError(f"sha256 mismatch: {sha256}")
+            continue
+
+        os.replace(part_path, path)
+        _remove_part(part_path)
+        return DownloadResult(path=path, size=received, sha256=sha256, attempts=attempt)
+
+    raise DownloadError(
+        f"Download of {url} failed after {max_attempts} attempts: {last_error}"
+    )
+
+
+def download_video(video, path: str, api_key: Optional[str] = None) -> DownloadResult:
+    """Downloads a generated `types.Video` to `path`.
+
+    Videos that already carry their bytes (e.g. on Vertex AI) are written
+    atomically, videos with a `uri` are streamed with `download`.
+
+    Args:
+        video: The `types.Video` of a generated video.
+        path: The file path to save the video to.
+        api_key: The Gemini API key. Defaults to the same environment
+            variables `genai.Client()` reads.
+    """
+    if video.video_bytes:
+        part_path = path + ".part"
+        with open(part_path, "wb") as f:
+            f.write(video.video_bytes)
+        os.replace(part_path, path)
+        return DownloadResult(
+            path=path,
+            size=len(video.video_bytes),
+            sha256=hashlib.sha256(video.video_bytes).hexdigest(),
+            attempts=1,
+        )
+
+    api_key = (
+        api_key or os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
+    )
+    headers = {"x-goog-api-key": api_key} if api_key else None
+    return download(video.uri, path, headers=headers)
+
+
+def generated_videos(operation) -> list:
+    """The `types.GeneratedVideo`s of a finished Veo operation.
+
+    Raises:
+        RuntimeError: If the operation failed, has no response or all of its
+            videos were filtered.
+    """
+    if operation.error:
+        raise RuntimeError(f"Veo operation {operation.name} failed: {operation.error}")
+    response = operation.response
+    if response is None:
+        raise RuntimeError(f"Veo operation {operation.name} has no response")
+    if not response.generated_videos:
+        # An empty list means that every output was filtered.
+        raise RuntimeError(
+            f"Veo returned no videos ({response.rai_media_filtered_count} "
+            f"filtered: {response.rai_media_filtered_reasons})"
+        )
+    return response.generated_videos
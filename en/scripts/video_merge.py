@@ -0,0 +1,435 @@
+"""Merges video clips, without re-encoding when the clips allow it.
+
+Veo clips of one run share codec, resolution, frame rate and audio format, so
+they can be concatenated with ffmpeg's concat demuxer and stream copy, which
+only rewrites the container and takes a fraction of a second. Re-encoding the
+whole vlog with MoviePy (`concatenate_videoclips` + `write_videofile`) is only
+used as a last resort.
+
+When the clips differ, e.g. 16:9 and 9:16 clips or clips with different
+audio sample rates, a `ClipNormalizer` transcodes every clip to one common
+format in parallel, one ffmpeg process per clip, as soon as the clip is
+there. The merge itself is then a stream copy again, so its wall time
+depends on the number of cores rather than on the number of clips.
+
+Example:
+    merge(["video_0.mp4", "video_1.mp4"], "vlog.mp4")
+
+    with ClipNormalizer(reference="video_0.mp4", max_workers=len(scenes)) as normalizer:
+        for path in render_scenes():  # in the order they finish
+            normalizer.add(path)
+        merge(video_files, "vlog.mp4", normalizer=normalizer)
+"""
+
+import contextvars
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from moviepy import VideoFileClip, concatenate_videoclips
+from moviepy.config import FFMPEG_BINARY
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+_VIDEO_STREAM = re.compile(r"Stream #\d+:\d+.*?: Video: (?P<desc>.*)")
+_AUDIO_STREAM = re.compile(r"Stream #\d+:\d+.*?: Audio: (?P<desc>.*)")
+_DURATION = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def probe_streams(path: str) -> dict:
+    """Returns the stream parameters that must match for a stream copy.
+
+    Parses the stream description that `ffmpeg -i` prints, e.g.
+    `Video: h264 (High) (avc1 / 0x31637661), yuv420p(progressive), 1280x720,
+    ..., 24 fps` and `Audio: aac (LC) (mp4a / 0x6134706D), 48000 Hz, stereo`.
+    """
+    result = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-i", path],
+        capture_output=True,
+        text=True,
+    )
+    info = {"video": None, "audio": None}
+    for line in result.stderr.splitlines():
+        if match := _VIDEO_STREAM.search(line):
+            desc = match["desc"]
+            size = re.search(r", (\d+)x(\d+)", desc)
+            fps = re.search(r"([\d.]+) fps", desc)
+            pix_fmt = re.search(r"\b((?:yuvj?|rgb|bgr|nv|gray)\w*)", desc)
+            info["video"] = {
+                "codec": desc.split(" ", 1)[0].rstrip(","),
+                "profile": (re.match(r"\w+ \(([^)]*)\)", desc) or [None, None])[1],
+                "pix_fmt": pix_fmt[1] if pix_fmt else None,
+                "size": (int(size[1]), int(size[2])) if size else None,
+                "fps": float(fps[1]) if fps else None,
+            }
+        elif match := _AUDIO_STREAM.search(line):
+            desc = match["desc"]
+            sample_rate = re.search(r"(\d+) Hz", desc)
+            layout = re.search(r"Hz, ([^,]+)", desc)
+            info["audio"] = {
+                "codec": desc.split(" ", 1)[0].rstrip(","),
+                "sample_rate": int(sample_rate[1]) if sample_rate else None,
+                "channels": layout[1].strip() if layout else None,
+            }
+    if info["video"] is None:
+        raise ValueError(f"No video stream found in {path}")
+    return info
+
+
+def duration(path: str) -> float:
+    """The duration of a media file in seconds, as printed by `ffmpeg -i`."""
+    result = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-i", path], capture_output=True, text=True
+    )
+    match = _DURATION.search(result.stderr)
+    if match is None:
+        raise ValueError(f"No duration found in {path}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+@dataclass(frozen=True)
+class StreamFormat:
+    """The format every clip is normalized to, see `normalize_clip`."""
+
+    width: int
+    height: int
+    fps: float
+    sample_rate: int = 48000
+    channels: int = 2
+
+    @classmethod
+    def from_probe(cls, info: dict) -> "StreamFormat":
+        """The format of a clip probed with `probe_streams`."""
+        video, audio = info["video"], info["audio"] or {}
+        width, height = video["size"] or (1280, 720)
+        return cls(
+            width=width,
+            height=height,
+            fps=video["fps"] or 24.0,
+            sample_rate=audio.get("sample_rate") or 48000,
+            channels=1 if audio.get("channels") == "mono" else 2,
+        )
+
+
+@tracing.traced("normalize_clip")
+def normalize_clip(
+    path: str,
+    output_path: str,
+    target: StreamFormat,
+    has_audio: bool = True,
+    threads: int = 0,
+) -> str:
+    """Transcodes a clip to h264/aac in the `target` format.
+
+    The video is scaled to fit and padded (letterboxed) to the target size, so
+    clips of another aspect ratio are not distorted. A clip without audio
+    gets a silent track, so all clips have the same streams.
+
+    Args:
+        path: The clip.
+        output_path: The path of the normalized clip.
+        target: The common format.
+        has_audio: Whether the clip has an audio stream.
+        threads: The encoder threads, 0 lets ffmpeg decide.
+
+    Returns:
+        `output_path`.
+    """
+    w, h = target.width, target.height
+    layout = "mono" if target.channels == 1 else "stereo"
+    command = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y", "-i", path]
+    if has_audio:
+        # Padded with silence and cut with -t, so the audio of every clip ends
+        # with its video and the concatenated clips stay in sync.
+        command += ["-map", "0:v:0", "-map", "0:a:0", "-af", "apad"]
+    else:
+        command += [
+            "-f",
+            "lavfi",
+            "-i",
+            f"anullsrc=r={target.sample_rate}:cl={layout}",
+            "-map",
+            "0:v:0",
+            "-map",
+            "1:a:0",
+        ]
+    command += [
+        "-vf",
+        f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+        f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={target.fps:g},format=yuv420p",
+        "-c:v",
+        "libx264",
+        "-c:a",
+        "aac",
+        "-ar",
+        str(target.sample_rate),
+        "-ac",
+        str(target.channels),
+        "-threads",
+        str(threads),
+        # -shortest would overshoot by the muxer's buffering.
+        "-t",
+        f"{duration(path):.3f}",
+        # Same time base in every clip, the concat demuxer needs it.
+        "-video_track_timescale",
+        "90000",
+        output_path,
+    ]
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    subprocess.run(command, check=True, capture_output=True)
+    return output_path
+
+
+class ClipNormalizer:
+    """Normalizes clips to a common format in parallel, as they arrive.
+
+    Every clip handed to `add` is probed in the background. As long as all
+    clips share their stream parameters nothing else happens and they are
+    merged with a stream copy. Once a clip differs, every clip seen so far
+    and every later one is transcoded to the format of the `reference` clip
+    (or `target`), each in its own ffmpeg process. Normalized clips are
+    written to a `normalized` directory next to the clip.
+
+    The clips are compared with the reference, not with the clip that
+    happened to finish first, so the format of the vlog does not depend on
+    the order the scenes were rendered in.
+
+    Args:
+        reference: The clip the others are compared with, usually the first
+            scene's. Defaults to the first clip passed to `result`, and then
+            nothing is transcoded before `result` is called.
+        target: The common format, defaults to that of the reference clip.
+        max_workers: The number of clips transcoded at once, defaults to the
+            number of cores. The cores are split between them, so fewer
+            clips than cores still use every core.
+    """
+
+    def __init__(
+        self,
+        reference: Optional[str] = None,
+        target: Optional[StreamFormat] = None,
+        max_workers: Optional[int] = None,
+    ):
+        cores = os.cpu_count() or 1
+        max_workers = max(1, min(max_workers or cores, cores))
+        self.reference = reference
+        self.target = target
+        self._threads = max(1, cores // max_workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="normalize"
+        )
+        self._lock = threading.Lock()
+        self._probes: dict[str, Future] = {}
+        self._infos: dict[str, dict] = {}
+        self._normalized: dict[str, Future] = {}
+        self._first: Optional[dict] = None
+        self._differ = False
+
+    def add(self, path: str) -> None:
+        """Hands over a finished clip; returns at once."""
+        with self._lock:
+            if path not in self._probes:
+                # The copied context carries the trace into the workers.
+                self._probes[path] = self._executor.submit(
+                    contextvars.copy_context().run, self._probe, path
+                )
+
+    def _probe(self, path: str) -> None:
+        info = probe_streams(path)
+        with self._lock:
+            self._infos[path] = info
+            self._compare()
+
+    def _compare(self) -> None:
+        """Starts the transcodes once a clip differs from the reference."""
+        if self._first is None:
+            if self.reference not in self._infos:
+                return
+            self._first = self._infos[self.reference]
+            if self.target is None:
+                self.target = StreamFormat.from_probe(self._first)
+        if not self._differ:
+            differing = [p for p, i in self._infos.items() if i != self._first]
+            if not differing:
+                return
+            logger.info(
+                f"{os.path.basename(differing[0])} differs from "
+                f"{os.path.basename(self.reference)}, normalizing all clips"
+            )
+            self._differ = True
+        for seen in self._infos:
+            self._submit(seen)
+
+    def _submit(self, path: str) -> None:
+        if path in self._normalized:
+            return
+        output_path = os.path.join(
+            os.path.dirname(path), "normalized", os.path.basename(path)
+        )
+        self._normalized[path] = self._executor.submit(
+            contextvars.copy_context().run,
+            normalize_clip,
+            path,
+            output_path,
+            self.target,
+            has_audio=self._infos[path]["audio"] is not None,
+            threads=self._threads,
+        )
+
+    def result(self, video_files: list[str]) -> Optional[list[str]]:
+        """Waits for the clips and returns them normalized, in order.
+
+        Returns:
+            None if all clips share their stream parameters and can be merged
+            as they are, else the normalized clips.
+
+        Raises:
+            ValueError: If a clip could not be probed.
+            subprocess.CalledProcessError: If a clip could not be normalized.
+        """
+        for path in video_files:
+            self.add(path)
+        for path in video_files:
+            self._probes[path].result()
+        with self._lock:
+            if self.reference not in self._infos:
+                self.reference = video_files[0]
+                self._compare()
+            if not self._differ:
+                return None
+            futures = [self._normalized[path] for path in video_files]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Stops the worker threads, after the running transcodes are done."""
+        self._executor.shutdown(cancel_futures=True)
+
+    def __enter__(self) -> "ClipNormalizer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def can_stream_copy(video_files: list[str]) -> bool:
+    """Returns True if all clips have identical stream parameters."""
+    first, *rest = [probe_streams(f) for f in video_files]
+    return all(info == first for info in rest)
+
+
+def concat_stream_copy(video_files: list[str], output_path: str) -> str:
+    """Concatenates clips with the concat demuxer, without re-encoding."""
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".txt", delete=False, dir=os.path.dirname(output_path) or "."
+    ) as f:
+        for video_file in video_files:
+            escaped = os.path.abspath(video_file).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+        list_file = f.name
+    try:
+        subprocess.run(
+            [
+                FFMPEG_BINARY,
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-y",
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                list_file,
+                "-c",
+                "copy",
+                "-movflags",
+                "+faststart",
+                output_path,
+            ],
+            check=True,
+            capture_output=True,
+        )
+    finally:
+        os.remove(list_file)
+    return output_path
+
+
+def concat_reencode(video_files: list[str], output_path: str) -> str:
+    """Concatenates clips with MoviePy and re-encodes them with libx264/aac."""
+    clips = [VideoFileClip(file) for file in video_files]
+    try:
+        final_clip = concatenate_videoclips(clips)
+        final_clip.write_videofile(
+            output_path,
+            codec="libx264",
+            audio_codec="aac",
+        )
+    finally:
+        for clip in clips:
+            clip.close()
+    return output_path
+
+
+def merge(
+    video_files: list[str],
+    output_path: str,
+    force_reencode: bool = False,
+    normalizer: Optional[ClipNormalizer] = None,
+) -> str:
+    """Merges clips into one video, using stream copy whenever possible.
+
+    Args:
+        video_files: The clips to merge, in order.
+        output_path: The path of the merged video.
+        force_reencode: If True, always re-encode with MoviePy.
+        normalizer: The normalizer the clips were handed to as they were
+            rendered. Without one, the clips are probed (and normalized if
+            they differ) here, all in parallel.
+
+    Returns:
+        The path of the merged video.
+    """
+    if force_reencode:
+        tracing.annotate(method="reencode")
+        return concat_reencode(video_files, output_path)
+
+    own_normalizer = normalizer is None
+    if own_normalizer:
+        normalizer = ClipNormalizer(
+            reference=video_files[0], max_workers=len(video_files)
+        )
+    try:
+        normalized = normalizer.result(video_files)
+    except (subprocess.CalledProcessError, ValueError) as e:
+        # ValueError: probe_streams could not read a clip.
+        detail = e.stderr if isinstance(e, subprocess.CalledProcessError) else e
+        logger.warning(f"Normalizing failed, re-encoding with MoviePy: {detail}")
+        tracing.annotate(method="reencode")
+        return concat_reencode(video_files, output_path)
+    finally:
+        if own_normalizer:
+            normalizer.close()
+
+    if normalized is None:
+        logger.info("Clips share stream parameters, merging with stream copy")
+        method = "stream_copy"
+    else:
+        logger.info(f"Normalized {len(normalized)} clips, merging with stream copy")
+        method = "normalize"
+    try:
+        output_path = concat_stream_copy(normalized or video_files, output_path)
+        tracing.annotate(method=method)
+        return output_path
+    except subprocess.CalledProcessError as e:
+        logger.warning(f"Stream copy failed, re-encoding instead: {e.stderr}")
+    tracing.annotate(method="reencode")
+    return concat_reencode(video_files, output_path)
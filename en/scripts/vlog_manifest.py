@@ -0,0 +1,106 @@
+"""Per-stage manifest that makes vlog generation resumable.
+
+Every vlog output directory keeps a `manifest.json` that records, for each
+stage (script, start image, per-scene edited image, per-scene video, merge),
+a hash of the stage inputs, the output path, the status and the number of
+attempts. When a run is repeated, a stage whose output still exists and whose
+inputs hash matches is skipped, so a failure in one scene no longer forces the
+script, the start image and all other videos to be generated again.
+
+Example:
+    manifest = VlogManifest("videos/my-vlog")
+    inputs = manifest.hash(prompt, image.image_bytes)
+    path = manifest.completed("scene_1_video", inputs)
+    if path is None:
+        path = generate_video(...)
+        manifest.complete("scene_1_video", inputs, path)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+
+
+class VlogManifest:
+    """Tracks the status of every stage of one vlog in a JSON file.
+
+    Args:
+        output_dir: The vlog output directory holding the manifest.
+        fname: The manifest file name.
+    """
+
+    def __init__(self, output_dir: str, fname: str = "manifest.json"):
+        self.path = os.path.join(output_dir, fname)
+        self._lock = threading.Lock()
+        self.stages: dict[str, dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.stages = json.load(f).get("stages", {})
+
+    @staticmethod
+    def hash(*parts: Any) -> str:
+        """Hashes stage inputs. Bytes are hashed as-is, anything else as JSON."""
+        digest = hashlib.sha256()
+        for part in parts:
+            if not isinstance(part, bytes):
+                part = json.dumps(part, sort_keys=True, default=str).encode("utf-8")
+            digest.update(hashlib.sha256(part).digest())
+        return digest.hexdigest()
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        """Returns the sha256 of a file's content."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def completed(self, stage: str, inputs_hash: str) -> Optional[str]:
+        """Returns the output path of a stage if it can be reused, else None."""
+        entry = self.stages.get(stage)
+        if (
+            entry is not None
+            and entry["status"] == "done"
+            and entry["inputs_hash"] == inputs_hash
+            and os.path.exists(entry["output"])
+        ):
+            return entry["output"]
+        return None
+
+    def complete(self, stage: str, inputs_hash: str, output: str) -> None:
+        """Marks a stage as done."""
+        self._update(stage, inputs_hash, status="done", output=output, error=None)
+
+    def fail(self, stage: str, inputs_hash: str, error: BaseException) -> int:
+        """Marks a stage as failed and returns how often it has been attempted."""
+        entry = self._update(stage, inputs_hash, status="failed", error=repr(error))
+        return entry["attempts"]
+
+    def _update(self, stage: str, inputs_hash: str, **fields: Any) -> dict:
+        with self._lock:
+            previous = self.stages.get(stage, {})
+            attempts = previous.get("attempts", 0)
+            if previous.get("inputs_hash") != inputs_hash:
+                attempts = 0
+            entry = {
+                "output": previous.get("output"),
+                **fields,
+                "inputs_hash": inputs_hash,
+                "attempts": attempts + 1,
+                "updated_at": time.time(),
+            }
+            self.stages[stage] = entry
+            self._save()
+            return entry
+
+    def _save(self) -> None:
+        # Write to a temporary file first so an interrupted run never leaves
+        # a truncated manifest behind.
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"stages": self.stages}, f, indent=2)
+        os.replace(tmp_path, self.path)